@@ -0,0 +1,266 @@
+"""
+End-to-end load test of every endpoint of weather_api/urls.py against local stand-ins for Meteomatics and Nominatim
+(weather_api.tests.stub_servers), which can add latency and 503 errors to every upstream call. The application is
+served by a threaded WSGI server on a throwaway test database, each endpoint is driven in turn at the requested
+concurrency after the in-memory and cache backend tiers are emptied, and its p50/p95/p99 latency, throughput, errors
+and upstream calls are printed and saved as JSON, so that runs can be compared over time with --compare.
+
+    python benchmarks/load_test.py [--requests 200] [--concurrency 16] [--latency 0.05] [--error-rate 0]
+                                   [--endpoints search-weather ...] [--output results.json] [--compare old.json]
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import NamedTuple
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'weather_app_django.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+import numpy as np  # noqa: E402
+import requests  # noqa: E402
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.core.cache import caches  # noqa: E402
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler  # noqa: E402
+from django.core.wsgi import get_wsgi_application  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import override_settings  # noqa: E402
+from django.urls import reverse  # noqa: E402
+from rest_framework.authtoken.models import Token  # noqa: E402
+
+from weather_api.geocoding_cache import get_geocoding_cache  # noqa: E402
+from weather_api.tests.stub_servers import DEFAULT_PLACES, StubUpstreamServer  # noqa: E402
+from weather_api.urls import urlpatterns  # noqa: E402
+from weather_api.weather_cache import get_weather_cache  # noqa: E402
+
+
+USERNAME = 'load-test'
+PASSWORD = 'load-test-password'
+PLACES = [name.title() for name in DEFAULT_PLACES]
+DEFAULT_OUTPUT_DIR = BASE_DIR / 'benchmarks' / 'results'
+
+
+class Scenario(NamedTuple):
+    """
+    How to call an endpoint: the HTTP method, a function returning the keyword arguments of the i-th request
+    ('params' or 'json') and whether the request sends the token of the load test user.
+     """
+    method: str
+    request: callable
+    authenticated: bool = True
+
+
+def build_scenarios(run_id: str) -> dict:
+    """
+    Return the Scenario of every URL name of weather_api/urls.py. Location queries cycle through the places known by
+    the Nominatim stand-in, so repeated locations exercise the caches like real traffic does.
+     """
+    now = datetime.now(timezone.utc)
+    history_range = {'start': (now - timedelta(days=1)).isoformat(), 'end': (now + timedelta(days=2)).isoformat()}
+
+    def place(i):
+        return PLACES[i % len(PLACES)]
+
+    return {
+        'register': Scenario('post', lambda i: {'json': {'username': f'load-{run_id}-{i}', 'password': PASSWORD}},
+                             authenticated=False),
+        'login': Scenario('post', lambda i: {'json': {'username': USERNAME, 'password': PASSWORD}},
+                          authenticated=False),
+        'current-weather': Scenario('get', lambda i: {}),
+        'search-weather': Scenario('get', lambda i: {'params': {'location': place(i)}}),
+        'forcast-weather': Scenario('get', lambda i: {'params': {'location': place(i)}}),
+        'batch-weather': Scenario('post', lambda i: {'json': {'locations': [place(i + j) for j in range(4)]}}),
+        'history-weather': Scenario('get', lambda i: {'params': {'location': place(i), 'resolution': 'hour',
+                                                                 **history_range}}),
+        'suggest-locations': Scenario('get', lambda i: {'params': {'q': place(i)[:3]}}),
+        'async-current-weather': Scenario('get', lambda i: {}),
+        'async-search-weather': Scenario('get', lambda i: {'params': {'location': place(i)}}),
+        'async-forcast-weather': Scenario('get', lambda i: {'params': {'location': place(i)}}),
+    }
+
+
+class _QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@contextlib.contextmanager
+def application_server():
+    """
+    Serve the Django application on a free local port in a background thread, yielding its base URL.
+     """
+    server = ThreadedWSGIServer(('127.0.0.1', 0), _QuietRequestHandler, allow_reuse_address=False)
+    server.set_app(get_wsgi_application())
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f'http://127.0.0.1:{server.server_address[1]}'
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+def drive(url: str, scenario: Scenario, token: str, count: int, concurrency: int) -> dict:
+    """
+    Send 'count' requests of a scenario with 'concurrency' workers, each with its own keep-alive session, and
+    return the latency percentiles in milliseconds, the throughput in requests per second and the errors.
+     """
+    sessions = threading.local()
+    headers = {'Authorization': f'Token {token}'} if scenario.authenticated else {}
+
+    def call(i):
+        if not hasattr(sessions, 'session'):
+            sessions.session = requests.Session()
+
+        start = time.perf_counter()
+        try:
+            response = sessions.session.request(scenario.method, url, headers=headers, timeout=60,
+                                                 **scenario.request(i))
+            ok = response.status_code < 400
+        except requests.RequestException:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(call, range(count)))
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array([latency for latency, _ in results]) * 1000
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        'requests': count,
+        'errors': sum(not ok for _, ok in results),
+        'p50_ms': round(float(p50), 2),
+        'p95_ms': round(float(p95), 2),
+        'p99_ms': round(float(p99), 2),
+        'mean_ms': round(float(latencies.mean()), 2),
+        'throughput_rps': round(count / elapsed, 1),
+    }
+
+
+def clear_caches():
+    caches['default'].clear()
+    get_geocoding_cache().clear()
+    get_weather_cache().clear()
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(options) -> dict:
+    started_at = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+    scenarios = build_scenarios(uuid.uuid4().hex[:8])
+    names = [pattern.name for pattern in urlpatterns if pattern.name]
+    missing = [name for name in names if name not in scenarios]
+    if missing:
+        print(f'no scenario for: {", ".join(missing)}', file=sys.stderr)
+    names = [name for name in names if name in scenarios and (not options.endpoints or name in options.endpoints)]
+
+    stub = StubUpstreamServer(latency=options.latency, error_rate=options.error_rate).start()
+    old_database_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            # The load test client connects from the loopback address, located in Chisinau.
+            ip_table = Path(directory) / 'ip-city.csv'
+            ip_table.write_text('"127.0.0.0","127.255.255.255","EU","MD","","","47.0245","28.8323"\n')
+
+            with override_settings(ALLOWED_HOSTS=['127.0.0.1'], DEBUG=False,
+                                   METEOMATICS_BASE_URL=stub.meteomatics_url, METEOMATICS_USERNAME='stub',
+                                   METEOMATICS_PASSWORD='stub', NOMINATIM_BASE_URL=stub.nominatim_url,
+                                   IP_GEOLOCATION_DATABASE=str(ip_table), IP_GEOLOCATION_FALLBACK=False):
+                user = User.objects.create_user(username=USERNAME, password=PASSWORD)
+                token = Token.objects.create(user=user).key
+
+                endpoints = {}
+                if not options.verbose:
+                    logging.disable(logging.CRITICAL)
+                with application_server() as base_url:
+                    for name in names:
+                        clear_caches()
+                        stub.reset()
+                        result = drive(base_url + reverse(name), scenarios[name], token, options.requests,
+                                       options.concurrency)
+                        result['upstream_calls'] = dict(stub.calls)
+                        endpoints[name] = result
+                        print_result(name, result)
+    finally:
+        connection.creation.destroy_test_db(old_database_name, verbosity=0)
+        stub.stop()
+
+    return {
+        'started_at': started_at,
+        'revision': git_revision(),
+        'options': {'requests': options.requests, 'concurrency': options.concurrency, 'latency': options.latency,
+                    'error_rate': options.error_rate},
+        'endpoints': endpoints,
+    }
+
+
+def print_result(name: str, result: dict):
+    upstream_calls = ', '.join(f'{upstream} {calls}' for upstream, calls in sorted(result['upstream_calls'].items()))
+    print(f'{name:<22} p50 {result["p50_ms"]:8.1f} ms  p95 {result["p95_ms"]:8.1f} ms  p99 {result["p99_ms"]:8.1f} ms'
+          f'  {result["throughput_rps"]:8.1f} req/s  errors {result["errors"]:<4}  upstream: {upstream_calls or "-"}')
+
+
+def print_comparison(results: dict, previous: dict):
+    print(f'\ncompared with {previous.get("revision") or "previous run"} ({previous.get("started_at")}):')
+    for name, result in results['endpoints'].items():
+        before = previous.get('endpoints', {}).get(name)
+        if not before:
+            continue
+        changes = []
+        for key, label in (('p95_ms', 'p95'), ('throughput_rps', 'throughput')):
+            if before[key]:
+                changes.append(f'{label} {(result[key] - before[key]) / before[key] * 100:+7.1f}%')
+        print(f'{name:<22} {"  ".join(changes)}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200, help='requests per endpoint')
+    parser.add_argument('--concurrency', type=int, default=16, help='concurrent clients')
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds added to every upstream call')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of upstream calls failing with 503')
+    parser.add_argument('--endpoints', nargs='*', help='URL names of the endpoints to drive, all by default')
+    parser.add_argument('--output', type=Path, help='JSON results file, benchmarks/results/<time>.json by default')
+    parser.add_argument('--compare', type=Path, help='JSON results of a previous run to compare with')
+    parser.add_argument('--verbose', action='store_true', help='show the logs of the application')
+    options = parser.parse_args()
+
+    results = run(options)
+
+    output = options.output or DEFAULT_OUTPUT_DIR / f'load-test-{datetime.now():%Y%m%d-%H%M%S}.json'
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f'\nresults saved to {output}')
+
+    if options.compare:
+        print_comparison(results, json.loads(options.compare.read_text()))
+
+
+if __name__ == '__main__':
+    main()
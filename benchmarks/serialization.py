@@ -0,0 +1,84 @@
+"""
+Micro-benchmark of the serialization of one forecast response: WeatherSerializer with DRF's JSONRenderer (the
+previous path) against WeatherFastSerializer with FastJSONRenderer (orjson).
+
+    python benchmarks/serialization.py [--days 7] [--parameters 1] [--repeat 200]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'weather_app_django.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from weather_api.renderers import FastJSONRenderer  # noqa: E402
+from weather_api.serializers import WeatherFastSerializer, WeatherSerializer  # noqa: E402
+from weather_api.tests.stub_servers import stub_parameter_value  # noqa: E402
+
+
+PARAMETERS = ('t_2m:C', 'relative_humidity_2m:p', 'wind_speed_10m:ms', 'precip_1h:mm')
+
+
+def forecast_response(days: int, parameters: int) -> list:
+    """
+    Return the 'data' entries of an hourly Meteomatics forecast for one location, shaped like the real API.
+     """
+    start = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    moments = [start + timedelta(hours=hour) for hour in range(days * 24 + 1)]
+
+    return [
+        {
+            'parameter': parameter,
+            'coordinates': [{
+                'lat': 47.0,
+                'lon': 28.8,
+                'dates': [{'date': moment.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                           'value': stub_parameter_value(parameter, 47.0, 28.8, moment)} for moment in moments],
+            }],
+        }
+        for parameter in (PARAMETERS * parameters)[:parameters]
+    ]
+
+
+def serialize_before(data: list) -> bytes:
+    return JSONRenderer().render({'data': WeatherSerializer(data, many=True).data})
+
+
+def serialize_after(data: list) -> bytes:
+    return FastJSONRenderer().render({'data': WeatherFastSerializer(data, many=True).data})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--days', type=int, default=7)
+    parser.add_argument('--parameters', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=200)
+    options = parser.parse_args()
+
+    data = forecast_response(options.days, options.parameters)
+    assert serialize_before(data).replace(b' ', b'') == serialize_after(data).replace(b' ', b'')
+
+    points = sum(len(coordinate['dates']) for entry in data for coordinate in entry['coordinates'])
+    print(f'{options.days}-day hourly forecast, {options.parameters} parameter(s), {points} values')
+
+    results = {}
+    for name, function in (('before', serialize_before), ('after', serialize_after)):
+        seconds = min(timeit.repeat(lambda: function(data), number=options.repeat, repeat=5)) / options.repeat
+        results[name] = seconds
+        print(f'{name:>6}: {seconds * 1000:8.3f} ms per forecast')
+
+    print(f'speedup: {results["before"] / results["after"]:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
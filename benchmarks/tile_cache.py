@@ -0,0 +1,105 @@
+"""
+Accuracy and latency of the tile cache (weather_api.tile_cache) against direct point requests: random points of a
+region are requested one by one from the local Meteomatics stand-in (weather_api.tests.stub_servers, with --latency
+added to every upstream call), then interpolated from the tiles of the region. The interpolation errors against the
+point values and the p50/p95/p99 latency and upstream calls of both methods are printed.
+
+    python benchmarks/tile_cache.py [--points 200] [--region 46.9,28.7,47.1,29.0] [--tile-degrees 1]
+                                    [--resolution 0.1] [--latency 0.05] [--parameters t_2m:C,wind_speed_10m:ms]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+from datetime import timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'weather_app_django.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+import numpy as np  # noqa: E402
+
+from django.test.utils import override_settings  # noqa: E402
+
+from weather_api.meteomatics import get_meteomatics_client  # noqa: E402
+from weather_api.tests.stub_servers import StubUpstreamServer  # noqa: E402
+from weather_api.tile_cache import get_tile_cache  # noqa: E402
+
+
+def values_of(weather_data: dict) -> dict:
+    return {entry['parameter']: entry['coordinates'][0]['dates'][0]['value'] for entry in weather_data['data']}
+
+
+def measure(stub: StubUpstreamServer, points: list, request) -> tuple:
+    """
+    Call request(latitude, longitude) for every point and return the values it returned, the latency of every call
+    in seconds and the number of upstream calls made.
+     """
+    stub.reset()
+    values, latencies = [], []
+    for latitude, longitude in points:
+        start = time.perf_counter()
+        values.append(values_of(request(latitude, longitude)))
+        latencies.append(time.perf_counter() - start)
+    return values, np.array(latencies), stub.calls['meteomatics']
+
+
+def print_latency(name: str, latencies, calls: int):
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+    print(f'{name:>6}: p50 {p50:8.3f} ms  p95 {p95:8.3f} ms  p99 {p99:8.3f} ms  '
+          f'total {latencies.sum():7.3f} s  upstream calls {calls}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--points', type=int, default=200)
+    parser.add_argument('--region', default='46.9,28.7,47.1,29.0', help='south,west,north,east')
+    parser.add_argument('--tile-degrees', type=float, default=1.0)
+    parser.add_argument('--resolution', type=float, default=0.1)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--parameters', default='t_2m:C,wind_speed_10m:ms,relative_humidity_2m:p')
+    parser.add_argument('--seed', type=int, default=0)
+    options = parser.parse_args()
+
+    south, west, north, east = map(float, options.region.split(','))
+    generator = random.Random(options.seed)
+    points = [(round(generator.uniform(south, north), 4), round(generator.uniform(west, east), 4))
+              for _ in range(options.points)]
+    parameters = tuple(options.parameters.split(','))
+
+    stub = StubUpstreamServer(latency=options.latency).start()
+    try:
+        with override_settings(METEOMATICS_BASE_URL=stub.meteomatics_url, METEOMATICS_USERNAME='stub',
+                               METEOMATICS_PASSWORD='stub', WEATHER_TILES_ENABLED=True,
+                               WEATHER_TILE_DEGREES=options.tile_degrees, WEATHER_TILE_RESOLUTION=options.resolution,
+                               WEATHER_TILE_REGIONS=[(south, west, north, east)]):
+            client, tile_cache = get_meteomatics_client(), get_tile_cache()
+            direct = measure(stub, points, lambda latitude, longitude: client.current(
+                latitude, longitude, timezone.utc, parameters=parameters))
+            tiles = measure(stub, points, lambda latitude, longitude: tile_cache.point(
+                latitude, longitude, parameters))
+    finally:
+        stub.stop()
+
+    print(f'{options.points} points in {options.region}, {options.tile_degrees} degree tiles every '
+          f'{options.resolution} degree, {options.latency * 1000:.0f} ms upstream latency')
+
+    print('accuracy of the interpolated values against the point values:')
+    for parameter in parameters:
+        errors = np.abs([tile[parameter] - point[parameter] for tile, point in zip(tiles[0], direct[0])])
+        print(f'  {parameter:>24}: mean {errors.mean():.3f}  p95 {np.percentile(errors, 95):.3f}  '
+              f'max {errors.max():.3f}')
+
+    print('latency per point:')
+    print_latency('direct', *direct[1:])
+    print_latency('tiles', *tiles[1:])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Gunicorn configuration of the production server, started with:
+
+    gunicorn -c gunicorn.conf.py
+
+It serves weather_app_django.wsgi with threaded workers by default, or the ASGI application with uvicorn workers
+(GUNICORN_APP=weather_app_django.asgi:application GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker). The
+application is imported once by the master and the workers are forked from it, sharing its memory. Send SIGHUP to
+the master for a graceful reload (new workers replace the old ones, which finish their requests first; without
+preloading the new workers also load new code) and SIGTERM for a graceful shutdown.
+"""
+import os
+import shutil
+import tempfile
+
+from os import getenv
+
+
+def _cpu_count() -> int:
+    # The CPUs this process may run on, which respects container and taskset limits unlike os.cpu_count().
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+wsgi_app = getenv('GUNICORN_APP', 'weather_app_django.wsgi:application')
+bind = getenv('GUNICORN_BIND', '0.0.0.0:8000')
+
+workers = int(getenv('GUNICORN_WORKERS', 2 * _cpu_count() + 1))
+worker_class = getenv('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(getenv('GUNICORN_THREADS', 4))
+preload_app = getenv('GUNICORN_PRELOAD', '1') == '1'
+
+# Restart a worker after this many requests (0 disables it), the jitter spreads the restarts of the workers.
+max_requests = int(getenv('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = int(getenv('GUNICORN_MAX_REQUESTS_JITTER', max_requests // 10))
+
+timeout = int(getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(getenv('GUNICORN_KEEPALIVE', 5))
+
+accesslog = getenv('GUNICORN_ACCESS_LOG') or None
+errorlog = '-'
+
+# Worker heartbeats go to a RAM-backed directory when there is one, a disk-backed /tmp can stall them.
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+# Every worker writes its Prometheus metrics to files in this directory and /metrics sums them up, whichever worker
+# serves it. It must be set before prometheus_client is imported, so before the application is loaded.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(
+    '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(), 'weather-api-metrics'))
+
+
+def on_starting(server):
+    """
+    Start from an empty PROMETHEUS_MULTIPROC_DIR, the files of a previous run would be added to the metrics, and warn
+    when the workers can hold more persistent database connections (one per worker thread, two with
+    SINGLE_FLIGHT_ADVISORY_LOCKS, plus one for the observation archive thread) than the database or pooler accepts,
+    DB_MAX_CONNECTIONS.
+     """
+    from django.conf import settings
+
+    shutil.rmtree(os.environ['PROMETHEUS_MULTIPROC_DIR'], ignore_errors=True)
+    os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'])
+
+    # Advisory locks are taken on a second connection of every worker thread.
+    per_thread = 2 if settings.SINGLE_FLIGHT_ADVISORY_LOCKS else 1
+    per_worker = server.cfg.threads * per_thread + (1 if settings.OBSERVATION_ARCHIVE_ENABLED else 0)
+    connections = server.cfg.workers * per_worker
+    if settings.DATABASES['default'].get('CONN_MAX_AGE') != 0 and connections > settings.DB_MAX_CONNECTIONS:
+        server.log.warning('%d workers x %d connections can keep %d database connections open, DB_MAX_CONNECTIONS '
+                           'is %d', server.cfg.workers, per_worker, connections, settings.DB_MAX_CONNECTIONS)
+
+
+def when_ready(server):
+    """
+    Load the offline lookup tables, the OpenAPI schema and the modules deferred at start-up in the master once the
+    application is preloaded, so every forked worker shares them instead of loading its own copy on its first
+    requests.
+     """
+    if not server.cfg.preload_app:
+        return
+
+    from weather_api.gazetteer import get_gazetteer
+    from weather_api.ip_geolocation import get_ip_location_table
+    from weather_api.reverse_geocoder import get_reverse_geocoder
+    from weather_api.schema import get_schema_artifact
+    from weather_api.startup import import_deferred_modules
+
+    get_reverse_geocoder()
+    get_gazetteer()
+    get_ip_location_table()
+    get_schema_artifact()
+    import_deferred_modules()
+
+
+def post_fork(server, worker):
+    """
+    Drop the database connections inherited from the master, a connection must never be shared by two processes.
+     """
+    from django.db import connections
+
+    connections.close_all()
+
+
+def child_exit(server, worker):
+    """
+    Let prometheus_client drop the live gauges of a worker that exited, its counters and histograms are kept.
+     """
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,310 @@
+import asyncio
+import base64
+import logging
+
+from datetime import datetime, timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .meteomatics import DATETIME_FORMAT, RETRY_STATUS_CODES, get_meteomatics_client, meteomatics_credentials
+from .metrics import UPSTREAM_ERRORS, timing
+from .parameters import DEFAULT_PARAMETERS
+from .reverse_geocoder import resolve_country_and_timezone
+
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncMeteomaticsClient:
+    """
+    Asynchronous counterpart of MeteomaticsClient built on httpx.AsyncClient, so one ASGI worker can keep many
+    upstream requests in flight at the same time. The connection pool, timeouts, credentials and retries come from
+    the same METEOMATICS_* settings as the synchronous client: connection failures are retried by the transport,
+    429/5xx responses with exponential backoff (or after their Retry-After delay) by query().
+
+        Attributes:
+            base_url (str): The root URL of the Meteomatics API.
+            max_retries (int): The number of retries of a 429/5xx response.
+            backoff_factor (float): The delay before the first retry, doubled for every next one.
+            client (httpx.AsyncClient): The pooled asynchronous HTTP client.
+
+        Methods:
+            query(self, valid_time, parameters, coordinates, output='json'): Send a request for the given time
+             (or time range), parameters and coordinates, and return the decoded JSON body or None on failure.
+            current(self, latitude, longitude, local_timezone, parameters=('t_2m:C',)): Return the current
+             values of the parameters at the location.
+            forecast(self, latitude, longitude, local_timezone, days=7, parameters=('t_2m:C',), interval=None):
+             Return the forecast of the parameters at the location for the next 'days' days, every 'interval'
+             (an ISO 8601 duration such as 'PT1H') or at the upstream default step.
+            aclose(self): Close the pooled connections.
+     """
+
+    def __init__(self, username: str, password: str, base_url: str, connect_timeout: float, read_timeout: float,
+                 pool_size: int, max_retries: int, backoff_factor: float = 0.3):
+        self.base_url = base_url.rstrip('/')
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+
+        import httpx
+
+        credentials = base64.b64encode(f"{username}:{password}".encode()).decode()
+
+        self.client = httpx.AsyncClient(
+            headers={'Authorization': f'Basic {credentials}'},
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            transport=httpx.AsyncHTTPTransport(retries=max_retries),
+        )
+
+    async def query(self, valid_time: str, parameters: str, coordinates: str, output: str = 'json') -> dict:
+        from httpx import HTTPError
+
+        url = f'{self.base_url}/{valid_time}/{parameters}/{coordinates}/{output}'
+
+        for retry in range(self.max_retries + 1):
+            try:
+                with timing('meteomatics'):
+                    response = await self.client.get(url)
+            except HTTPError as e:
+                UPSTREAM_ERRORS.labels('meteomatics').inc()
+                logger.warning('Meteomatics request failed', extra={'url': url, 'error': str(e)})
+                return None
+
+            if response.status_code not in RETRY_STATUS_CODES or retry == self.max_retries:
+                break
+            await asyncio.sleep(self._retry_delay(response, retry))
+
+        if response.status_code == 200:
+            return response.json()
+        else:
+            UPSTREAM_ERRORS.labels('meteomatics').inc()
+            logger.warning('Meteomatics request failed',
+                           extra={'url': url, 'status': response.status_code, 'body': response.text[:1000]})
+
+    def _retry_delay(self, response, retry: int) -> float:
+        try:
+            return max(0.0, float(response.headers['Retry-After']))
+        except (KeyError, ValueError):
+            return self.backoff_factor * 2 ** retry
+
+    async def current(self, latitude, longitude, local_timezone, parameters=DEFAULT_PARAMETERS) -> dict:
+        formatted_datetime = datetime.now(local_timezone).strftime(DATETIME_FORMAT)
+        return await self.query(formatted_datetime, ','.join(parameters), f'{latitude},{longitude}')
+
+    async def forecast(self, latitude, longitude, local_timezone, days: int = 7,
+                       parameters=DEFAULT_PARAMETERS, interval: str = None) -> dict:
+        current_datetime = datetime.now(local_timezone)
+        future_datetime = current_datetime + timedelta(days=days)
+
+        valid_time = f'{current_datetime.strftime(DATETIME_FORMAT)}--{future_datetime.strftime(DATETIME_FORMAT)}'
+        if interval:
+            valid_time = f'{valid_time}:{interval}'
+        return await self.query(valid_time, ','.join(parameters), f'{latitude},{longitude}')
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+class AsyncNominatimGeocoder:
+    """
+    Asynchronous forward geocoder talking to the Nominatim search API with httpx. The country code is taken from
+    the address details of the search result, or resolved offline when Nominatim does not return one, so a lookup
+    is a single upstream round trip.
+
+        Attributes:
+            base_url (str): The root URL of the Nominatim API.
+            client (httpx.AsyncClient): The pooled asynchronous HTTP client.
+
+        Methods:
+            geocode(self, city_or_zip): Return a (latitude, longitude, country code) tuple, or None if Nominatim
+             does not know the location. Network errors are raised to the caller.
+            aclose(self): Close the pooled connections.
+     """
+
+    def __init__(self, base_url: str, user_agent: str, timeout: float, pool_size: int):
+        import httpx
+
+        self.base_url = base_url.rstrip('/')
+        self.client = httpx.AsyncClient(
+            headers={'User-Agent': user_agent},
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+
+    async def geocode(self, city_or_zip: str) -> tuple:
+        from httpx import HTTPError
+
+        try:
+            with timing('nominatim'):
+                response = await self.client.get(
+                    f'{self.base_url}/search',
+                    params={'q': city_or_zip, 'format': 'json', 'limit': 1, 'addressdetails': 1},
+                )
+            response.raise_for_status()
+        except HTTPError:
+            UPSTREAM_ERRORS.labels('nominatim').inc()
+            raise
+
+        results = response.json()
+        if not results:
+            return None
+
+        latitude = float(results[0]['lat'])
+        longitude = float(results[0]['lon'])
+        country = results[0].get('address', {}).get('country_code')
+        if not country:
+            country = resolve_country_and_timezone(latitude, longitude)[0].lower()
+
+        return latitude, longitude, country
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+class ThreadedMeteomaticsClient:
+    """
+    Stand-in for AsyncMeteomaticsClient outside of an ASGI server: async_to_sync runs every async view served by a
+    WSGI worker on an event loop of its own, which would open (and never close) a connection pool per request, so
+    the calls are made with the pooled synchronous MeteomaticsClient in a thread instead.
+
+        Methods:
+            current(self, latitude, longitude, local_timezone, parameters=('t_2m:C',)): See MeteomaticsClient.
+            forecast(self, latitude, longitude, local_timezone, days=7, parameters=('t_2m:C',), interval=None):
+             See MeteomaticsClient.
+     """
+
+    async def current(self, *args, **kwargs) -> dict:
+        return await sync_to_async(get_meteomatics_client().current, thread_sensitive=False)(*args, **kwargs)
+
+    async def forecast(self, *args, **kwargs) -> dict:
+        return await sync_to_async(get_meteomatics_client().forecast, thread_sensitive=False)(*args, **kwargs)
+
+
+class ThreadedNominatimGeocoder:
+    """
+    Stand-in for AsyncNominatimGeocoder outside of an ASGI server, it geocodes with the process-wide geopy client in
+    a thread, see ThreadedMeteomaticsClient.
+
+        Methods:
+            geocode(self, city_or_zip): See AsyncNominatimGeocoder.
+     """
+
+    async def geocode(self, city_or_zip: str) -> tuple:
+        from .weather_request import fetch_geolocation_from_nominatim
+
+        return await sync_to_async(fetch_geolocation_from_nominatim, thread_sensitive=False)(city_or_zip)
+
+
+# httpx.AsyncClient connections belong to the event loop that opened them, so the clients are only created on the
+# loop of the ASGI server, registered by AsyncClientsLifespan, and closed when the server shuts down.
+_server_loop = None
+_meteomatics_client = None
+_nominatim_geocoder = None
+
+
+def get_async_meteomatics_client():
+    """
+    Return the AsyncMeteomaticsClient of the ASGI server, it is created on first use from the METEOMATICS_*
+    settings. On any other event loop a ThreadedMeteomaticsClient is returned.
+
+        Returns:
+            AsyncMeteomaticsClient or ThreadedMeteomaticsClient: The Meteomatics client of the running loop.
+
+        Raises:
+            ImproperlyConfigured: If the Meteomatics credentials are not set.
+     """
+    global _meteomatics_client
+
+    if asyncio.get_running_loop() is not _server_loop:
+        return ThreadedMeteomaticsClient()
+
+    if _meteomatics_client is None:
+        username, password = meteomatics_credentials()
+        _meteomatics_client = AsyncMeteomaticsClient(
+            username=username,
+            password=password,
+            base_url=settings.METEOMATICS_BASE_URL,
+            connect_timeout=settings.METEOMATICS_CONNECT_TIMEOUT,
+            read_timeout=settings.METEOMATICS_READ_TIMEOUT,
+            pool_size=settings.ASYNC_HTTP_POOL_SIZE,
+            max_retries=settings.METEOMATICS_MAX_RETRIES,
+            backoff_factor=settings.METEOMATICS_BACKOFF_FACTOR,
+        )
+    return _meteomatics_client
+
+
+def get_async_nominatim_geocoder():
+    """
+    Return the AsyncNominatimGeocoder of the ASGI server, it is created on first use from the NOMINATIM_*
+    settings. On any other event loop a ThreadedNominatimGeocoder is returned.
+
+        Returns:
+            AsyncNominatimGeocoder or ThreadedNominatimGeocoder: The geocoder of the running loop.
+     """
+    global _nominatim_geocoder
+
+    if asyncio.get_running_loop() is not _server_loop:
+        return ThreadedNominatimGeocoder()
+
+    if _nominatim_geocoder is None:
+        _nominatim_geocoder = AsyncNominatimGeocoder(
+            base_url=settings.NOMINATIM_BASE_URL,
+            user_agent=settings.NOMINATIM_USER_AGENT,
+            timeout=settings.NOMINATIM_TIMEOUT,
+            pool_size=settings.ASYNC_HTTP_POOL_SIZE,
+        )
+    return _nominatim_geocoder
+
+
+async def close_async_clients():
+    """
+    Close the connection pools of the asynchronous clients, they are opened again on the next use.
+     """
+    global _meteomatics_client, _nominatim_geocoder
+
+    clients = [client for client in (_meteomatics_client, _nominatim_geocoder) if client is not None]
+    _meteomatics_client = _nominatim_geocoder = None
+    for client in clients:
+        await client.aclose()
+
+
+class AsyncClientsLifespan:
+    """
+    ASGI middleware handling the lifespan protocol around the Django application: on startup it registers the event
+    loop of the server, on which the asynchronous upstream clients are created, and on shutdown it closes their
+    connection pools. Other scopes are passed to the application.
+
+        Attributes:
+            application: The wrapped ASGI application.
+     """
+
+    def __init__(self, application):
+        self.application = application
+
+    async def __call__(self, scope, receive, send):
+        global _server_loop
+
+        if scope['type'] != 'lifespan':
+            return await self.application(scope, receive, send)
+
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                _server_loop = asyncio.get_running_loop()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await close_async_clients()
+                _server_loop = None
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+@receiver(setting_changed)
+def _reset_async_clients(setting, **kwargs):
+    global _meteomatics_client, _nominatim_geocoder
+
+    if setting.startswith(('METEOMATICS_', 'NOMINATIM_', 'ASYNC_HTTP_')):
+        _meteomatics_client = _nominatim_geocoder = None
@@ -0,0 +1,308 @@
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views import View
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication, SessionAuthentication, BasicAuthentication
+from rest_framework.request import Request
+
+from .async_clients import get_async_meteomatics_client, get_async_nominatim_geocoder
+from .forecast import DEFAULT_FORECAST_OPTIONS, aggregate_daily, parse_forecast_options
+from .gazetteer import get_gazetteer
+from .http_caching import weather_validator
+from .geocoding_cache import get_geocoding_cache, normalize_query
+from .ip_geolocation import get_client_ip
+from .metrics import timing
+from .models import WeatherObservation
+from .observations import archive_weather_data
+from .parameters import DEFAULT_PARAMETERS, apply_parameters, parse_parameters, upstream_parameters_for
+from .reverse_geocoder import get_local_timezone
+from .singleflight import AsyncSingleFlight
+from .tile_cache import get_tile_cache, interpolated_weather
+from .weather_cache import get_weather_cache
+from .weather_request import get_user_geolocation, serialize_weather_payload, weather_variant
+
+
+logger = logging.getLogger(__name__)
+
+_single_flight = AsyncSingleFlight()
+
+
+@timing('auth')
+def _authenticate(request):
+    """
+    Authenticate a Django request with the same authentication classes as the synchronous weather views.
+
+        Args:
+            request (HttpRequest): The incoming request.
+
+        Returns:
+            User or None: The authenticated user, or None if the credentials are missing or invalid.
+     """
+    drf_request = Request(request, authenticators=[
+        TokenAuthentication(), SessionAuthentication(), BasicAuthentication(),
+    ])
+    try:
+        user = drf_request.user
+    except exceptions.APIException:
+        return None
+    return user if user and user.is_authenticated else None
+
+
+async def get_geolocation_based_on_input_async(city_or_zip):
+    """
+    Asynchronous counterpart of get_geolocation_based_on_input, it serves the query from the offline gazetteer or
+    the geocoding cache when possible and otherwise geocodes it with the asynchronous Nominatim client, concurrent
+    misses for the same normalized query share one upstream call.
+
+        Args:
+            city_or_zip (str): The city name or zip code for which geolocation information is requested.
+
+        Returns:
+            tuple or None: A tuple containing latitude, longitude, and country code if geocoding is successful,
+            or None if geocoding fails.
+     """
+    location = (await sync_to_async(get_gazetteer)()).lookup(city_or_zip)
+    if location is not None:
+        return location
+
+    geocoding_cache = get_geocoding_cache()
+
+    async def fetch_and_store():
+        location = await get_async_nominatim_geocoder().geocode(city_or_zip)
+        await sync_to_async(geocoding_cache.set)(city_or_zip, location)
+        return location
+
+    try:
+        found, location = await sync_to_async(geocoding_cache.get)(city_or_zip)
+        if not found:
+            location = await _single_flight.do(f'geocode:{normalize_query(city_or_zip)}', fetch_and_store)
+        return location
+    except Exception:
+        logger.warning('Geocoding failed', extra={'query': city_or_zip}, exc_info=True)
+        return None
+
+
+async def fetch_weather_async(endpoint: str, latitude, longitude, country, parameters=DEFAULT_PARAMETERS,
+                              forecast=DEFAULT_FORECAST_OPTIONS):
+    """
+    Return the weather data for a location from the weather cache, requesting it from Meteomatics with the
+    asynchronous client on a miss, concurrent misses for the same cache key share one upstream call.
+
+        Args:
+            endpoint (str): 'current', 'search' or 'forcast', selects the request type and the cache lifetime.
+            latitude (float): The latitude of the location.
+            longitude (float): The longitude of the location.
+            country (str): The country associated with the location, narrows down the offline time zone lookup.
+            parameters (tuple): The validated weather parameters, fetched with one upstream request.
+            forecast (ForecastOptions): The resolution of a 'forcast' request, ignored by the other endpoints.
+
+        Returns:
+            dict or None: The decoded Meteomatics JSON response, or None if the request failed.
+     """
+    weather_cache = get_weather_cache()
+    variant = weather_variant(endpoint, parameters, forecast)
+
+    # The entry may have been cached for the same parameters in another order.
+    weather_data = await sync_to_async(weather_cache.get)(endpoint, latitude, longitude, variant)
+    if weather_data is not None:
+        return apply_parameters(weather_data, parameters)
+
+    async def fetch_and_store():
+        snapped_latitude, snapped_longitude = weather_cache.snap(latitude, longitude)
+        local_timezone = get_local_timezone(snapped_latitude, snapped_longitude, country)
+        client = get_async_meteomatics_client()
+
+        if endpoint == 'forcast':
+            weather_data = await client.forecast(
+                snapped_latitude, snapped_longitude, local_timezone, days=forecast.days,
+                parameters=upstream_parameters_for(parameters), interval=forecast.interval)
+            archive_weather_data(weather_data, WeatherObservation.FORECAST)
+        else:
+            weather_data = None
+            if get_tile_cache() is not None:
+                weather_data = await sync_to_async(interpolated_weather)(
+                    snapped_latitude, snapped_longitude, upstream_parameters_for(parameters))
+            if weather_data is None:
+                weather_data = await client.current(snapped_latitude, snapped_longitude, local_timezone,
+                                                    parameters=upstream_parameters_for(parameters))
+                archive_weather_data(weather_data)
+        weather_data = apply_parameters(weather_data, parameters)
+
+        await sync_to_async(weather_cache.set)(endpoint, latitude, longitude, weather_data, variant)
+        return weather_data
+
+    weather_data = await _single_flight.do(weather_cache.make_key(endpoint, latitude, longitude, variant),
+                                           fetch_and_store)
+    return apply_parameters(weather_data, parameters)
+
+
+class AsyncWeatherView(View):
+    """
+    Base class for the native async weather views, it authenticates the request with the same authentication
+    classes as the synchronous views (token, session or basic) and turns weather data into a JSON response.
+    Like DRF's APIView it is exempt from CsrfViewMiddleware, CSRF is enforced by SessionAuthentication only.
+
+        Attributes:
+            endpoint (str): 'current', 'search' or 'forcast', selects the request type and the cache lifetime.
+            parameters (tuple): The validated weather parameters of the request being served.
+            forecast (ForecastOptions): The validated forecast options of the request being served.
+
+        Methods:
+            dispatch(self, request, *args, **kwargs): Reject unauthenticated requests with 401 and requests for
+             unsupported weather parameters or forecast options with 400, dispatch the rest.
+            weather_response(self, location, shared=True): Fetch and serialize the weather data of a geolocation
+             dictionary, a GET response has validators and caching headers (private unless shared), see
+             WeatherValidator.
+     """
+    endpoint = None
+    parameters = DEFAULT_PARAMETERS
+    forecast = DEFAULT_FORECAST_OPTIONS
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        view.csrf_exempt = True
+        return view
+
+    async def dispatch(self, request, *args, **kwargs):
+        user = await sync_to_async(_authenticate)(request)
+        if user is None:
+            return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+
+        request.user = user
+
+        data = self.get_posted_data(request) if request.method == 'POST' else request.GET
+        try:
+            self.parameters = parse_parameters(data.get('parameters'))
+            if self.endpoint == 'forcast':
+                self.forecast = parse_forecast_options(data)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        return await super().dispatch(request, *args, **kwargs)
+
+    @staticmethod
+    def get_posted_data(request):
+        if request.content_type == 'application/json':
+            try:
+                data = json.loads(request.body or b'{}')
+            except ValueError:
+                return {}
+            return data if isinstance(data, dict) else {}
+        return request.POST
+
+    @classmethod
+    def get_posted_location(cls, request):
+        data = cls.get_posted_data(request)
+        return data.get('location') or data.get('parameter')
+
+    async def weather_response(self, location, shared=True):
+        if not location:
+            return JsonResponse({'error': 'Failed to fetch weather data'}, status=500)
+
+        with timing('weather'):
+            weather_data = await fetch_weather_async(
+                self.endpoint, location['latitude'], location['longitude'], location['country'], self.parameters,
+                self.forecast)
+        if self.forecast.aggregate == 'daily':
+            weather_data = aggregate_daily(
+                weather_data, get_local_timezone(location['latitude'], location['longitude'], location['country']))
+
+        validator = await sync_to_async(weather_validator)(
+            self.request, self.endpoint, location['latitude'], location['longitude'],
+            weather_variant(self.endpoint, self.parameters, self.forecast), weather_data, shared=shared)
+        if validator is not None:
+            not_modified = validator.not_modified()
+            if not_modified is not None:
+                return not_modified
+
+        serialized_weather_data = serialize_weather_payload(weather_data, self.parameters)
+        if serialized_weather_data is None:
+            return JsonResponse({'error': 'Failed to fetch weather data'}, status=500)
+        response = JsonResponse(serialized_weather_data, status=200)
+        return validator.patch(response) if validator is not None else response
+
+    async def weather_response_for_query(self, location_query):
+        if not location_query:
+            return await self.weather_response(None)
+
+        with timing('geocode'):
+            location = await get_geolocation_based_on_input_async(location_query)
+        if location is None:
+            return JsonResponse({'error': 'Location not found'}, status=404)
+
+        latitude, longitude, country = location
+        return await self.weather_response({'latitude': latitude, 'longitude': longitude, 'country': country})
+
+    async def weather_response_for_client_ip(self):
+        location = await sync_to_async(get_user_geolocation)(get_client_ip(self.request))
+        if not location:
+            error = 'Client location unknown'
+            if self.endpoint == 'forcast':
+                error += ', please provide a location (city name or zip code)'
+            return JsonResponse({'error': error}, status=422)
+        return await self.weather_response(location, shared=False)
+
+
+class AsyncCurrentWeatherView(AsyncWeatherView):
+    """
+    Async version of CurrentWeatherView: current weather information based on the geolocation of the IP address,
+    it requires authentication.
+
+        Methods:
+            get(self, request, *args, **kwargs): Handles HTTP GET requests to retrieve current weather data.
+     """
+    endpoint = 'current'
+
+    async def get(self, request, *args, **kwargs):
+        return await self.weather_response_for_client_ip()
+
+
+class AsyncSearchWeatherView(AsyncWeatherView):
+    """
+    Async version of SearchWeatherView: current weather information for a location query (city name or zip code)
+    provided via the 'location' query parameter (GET) or request data (POST), it requires authentication.
+
+        Methods:
+            get(self, request, *args, **kwargs): Handles HTTP GET requests for weather information retrieval.
+            post(self, request, *args, **kwargs): Handles HTTP POST requests for weather information retrieval.
+     """
+    endpoint = 'search'
+
+    async def get(self, request, *args, **kwargs):
+        location_query = request.GET.get('location')
+
+        if not location_query:
+            return JsonResponse({'error': 'Please provide a location (city name or zip code)'}, status=400)
+
+        return await self.weather_response_for_query(location_query)
+
+    async def post(self, request, *args, **kwargs):
+        return await self.weather_response_for_query(self.get_posted_location(request))
+
+
+class AsyncForcastWeatherView(AsyncWeatherView):
+    """
+    Async version of ForcastWeatherView: weather forecasts for 7 days for a location query (city name or zip code)
+    provided via the 'location' query parameter (GET) or request data (POST), or for the geolocation of the IP
+    address when a GET request has no location, it requires authentication.
+
+        Methods:
+            get(self, request, *args, **kwargs): Handles HTTP GET requests for weather forecast retrieval for 7 days.
+            post(self, request, *args, **kwargs): Handles HTTP POST requests for weather forecast retrieval for 7 days.
+     """
+    endpoint = 'forcast'
+
+    async def get(self, request, *args, **kwargs):
+        location_query = request.GET.get('location')
+
+        if not location_query:
+            return await self.weather_response_for_client_ip()
+
+        return await self.weather_response_for_query(location_query)
+
+    async def post(self, request, *args, **kwargs):
+        return await self.weather_response_for_query(self.get_posted_location(request))
@@ -0,0 +1,213 @@
+import logging
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextvars import copy_context
+from functools import partial
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .geocoding_cache import normalize_query
+from .meteomatics import get_meteomatics_client
+from .observations import archive_weather_data
+from .parameters import DEFAULT_PARAMETERS, apply_parameters, cache_variant, upstream_parameters_for
+from .reverse_geocoder import resolve_country_and_timezone
+from .weather_cache import get_weather_cache
+from .weather_request import get_geolocation_based_on_input
+
+
+logger = logging.getLogger(__name__)
+
+LOCATION_NOT_FOUND = 'Location not found'
+WEATHER_NOT_FETCHED = 'Failed to fetch weather data'
+
+
+def _call_in_context(function, item, context):
+    try:
+        return context.run(function, item)
+    finally:
+        close_old_connections()
+
+
+def _run_in_threads(function, items, max_workers):
+    """
+    Call function(item) for every item with a thread pool and return the results in the order of the items. Every
+    call runs in a copy of the caller's context, so its timing spans are reported with the request, and its thread
+    closes its database connections when it is done, like a request thread would.
+     """
+    if len(items) <= 1:
+        return [function(item) for item in items]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        return list(executor.map(_call_in_context, [function] * len(items), items,
+                                 [copy_context() for _ in items]))
+
+
+def _iter_in_threads(function, items, max_workers):
+    """
+    Call function(item) for every item like _run_in_threads, but yield the (item, result) pairs as soon as every
+    call completes, in completion order.
+     """
+    if len(items) <= 1:
+        for item in items:
+            yield item, function(item)
+        return
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        futures = {executor.submit(_call_in_context, function, item, copy_context()): item for item in items}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+
+def _geocode_batch(locations: list) -> list:
+    """
+    Resolve every batch location to a (latitude, longitude, country) tuple or None. Coordinates are used as they
+    are, location queries are geocoded concurrently and each distinct normalized query is geocoded only once.
+     """
+    queries = {}
+    for location in locations:
+        if isinstance(location, str):
+            queries.setdefault(normalize_query(location), location)
+
+    geocoded = dict(zip(
+        queries,
+        _run_in_threads(get_geolocation_based_on_input, list(queries.values()),
+                        settings.WEATHER_BATCH_GEOCODING_CONCURRENCY),
+    ))
+
+    resolved = []
+    for location in locations:
+        if isinstance(location, str):
+            resolved.append(geocoded[normalize_query(location)])
+        else:
+            latitude, longitude = location['latitude'], location['longitude']
+            country = location.get('country') or resolve_country_and_timezone(latitude, longitude)[0].lower()
+            resolved.append((latitude, longitude, country))
+    return resolved
+
+
+def _fetch_chunk(points: list, parameters=DEFAULT_PARAMETERS) -> list:
+    """
+    Fetch the current weather of a chunk of snapped points with one upstream request and split the response into
+    one single-point response per point, in the shape of a regular single-location request.
+     """
+    weather_data = get_meteomatics_client().current_many(points, parameters=upstream_parameters_for(parameters))
+    archive_weather_data(weather_data)
+    weather_data = apply_parameters(weather_data, parameters)
+    if not weather_data or not weather_data.get('data'):
+        return [None] * len(points)
+
+    if any(len(entry.get('coordinates', [])) != len(points) for entry in weather_data['data']):
+        return [None] * len(points)
+
+    return [
+        {'data': [{'parameter': entry.get('parameter', ''), 'coordinates': [entry['coordinates'][index]]}
+                  for entry in weather_data['data']]}
+        for index in range(len(points))
+    ]
+
+
+def _fetch_chunk_or_none(points: list, parameters=DEFAULT_PARAMETERS) -> list:
+    # A failed chunk fails its own locations only, the results of the other chunks may already be streamed.
+    try:
+        return _fetch_chunk(points, parameters)
+    except Exception:
+        logger.exception('Failed to fetch a batch chunk', extra={'points': len(points)})
+        return [None] * len(points)
+
+
+def _batch_result(location, geolocation: tuple, weather_data: dict, parameters) -> dict:
+    if geolocation is None:
+        return {'location': location, 'status': 'error', 'error': LOCATION_NOT_FOUND}
+    weather_data = apply_parameters(weather_data, parameters)
+    if not weather_data or not weather_data.get('data'):
+        return {'location': location, 'status': 'error', 'error': WEATHER_NOT_FETCHED}
+
+    latitude, longitude, country = geolocation
+    result = {'location': location, 'status': 'ok', 'latitude': latitude, 'longitude': longitude,
+              'country': country}
+    if len(parameters) == 1:
+        result['parameter'] = weather_data['data'][0].get('parameter', '')
+        result['coordinates'] = weather_data['data'][0].get('coordinates', [])
+    else:
+        result['data'] = [{'parameter': entry.get('parameter', ''), 'coordinates': entry.get('coordinates', [])}
+                          for entry in weather_data['data']]
+    return result
+
+
+def iter_batch_weather(locations: list, parameters=DEFAULT_PARAMETERS):
+    """
+    Fetch the current weather for many locations at once, it geocodes the location queries concurrently, serves
+    the points already in the weather cache from it, and requests the remaining distinct grid cells from
+    Meteomatics in as few multi-coordinate requests as possible (WEATHER_BATCH_CHUNK_SIZE points per request).
+    Geocoding and the cache lookups are done by the call; the returned iterator yields the locations not found and
+    the cached ones first, then the locations of every upstream request as soon as it completes.
+
+        Args:
+            locations (list): Location queries (city name or zip code) and/or dictionaries with 'latitude',
+             'longitude' and an optional 'country'.
+            parameters (tuple): The validated weather parameters, temperature in °C by default.
+
+        Returns:
+            iterator: (index, result) pairs, one per input location in completion order, the index being the
+            position of the location in the input. Successful results have 'status' set to 'ok' and hold the
+            coordinates, country and serialized weather data; failed results have 'status' set to 'error' and an
+            'error' message.
+     """
+    weather_cache = get_weather_cache()
+    variant = cache_variant(parameters)
+    resolved = _geocode_batch(locations)
+
+    indexes_by_cell = {}
+    ready = []
+    missing_cells = []
+    for index, geolocation in enumerate(resolved):
+        if geolocation is None:
+            ready.append((index, None))
+            continue
+        cell = weather_cache.snap(geolocation[0], geolocation[1])
+        if cell not in indexes_by_cell:
+            weather_data = weather_cache.get('search', *cell, variant=variant)
+            if weather_data is None:
+                missing_cells.append(cell)
+            indexes_by_cell[cell] = (weather_data, [])
+        weather_data, indexes = indexes_by_cell[cell]
+        if weather_data is None:
+            indexes.append(index)
+        else:
+            ready.append((index, weather_data))
+
+    chunk_size = settings.WEATHER_BATCH_CHUNK_SIZE
+    chunks = [missing_cells[index:index + chunk_size] for index in range(0, len(missing_cells), chunk_size)]
+
+    def results():
+        for index, weather_data in ready:
+            yield index, _batch_result(locations[index], resolved[index], weather_data, parameters)
+
+        fetched = _iter_in_threads(partial(_fetch_chunk_or_none, parameters=parameters), chunks,
+                                   settings.WEATHER_BATCH_UPSTREAM_CONCURRENCY)
+        for chunk, chunk_weather_data in fetched:
+            for cell, weather_data in zip(chunk, chunk_weather_data):
+                weather_cache.set('search', *cell, weather_data, variant=variant)
+                for index in indexes_by_cell[cell][1]:
+                    yield index, _batch_result(locations[index], resolved[index], weather_data, parameters)
+
+    return results()
+
+
+def fetch_batch_weather(locations: list, parameters=DEFAULT_PARAMETERS) -> list:
+    """
+    Fetch the current weather for many locations at once, see iter_batch_weather.
+
+        Args:
+            locations (list): Location queries (city name or zip code) and/or dictionaries with 'latitude',
+             'longitude' and an optional 'country'.
+            parameters (tuple): The validated weather parameters, temperature in °C by default.
+
+        Returns:
+            list: One result dictionary per input location, in input order.
+     """
+    results = [None] * len(locations)
+    for index, result in iter_batch_weather(locations, parameters):
+        results[index] = result
+    return results
@@ -0,0 +1,92 @@
+import math
+import struct
+
+from datetime import datetime
+
+from .renderers import ColumnarJSONRenderer, MessagePackRenderer
+
+
+# Statistics of a daily aggregate, in the order of their columns.
+AGGREGATE_STATISTICS = ('min', 'max', 'mean')
+
+
+def columnar_format(request):
+    """
+    Return the columnar format selected by content negotiation for a DRF request: ColumnarJSONRenderer.format,
+    MessagePackRenderer.format, or None for the other representations.
+     """
+    renderer = getattr(request, 'accepted_renderer', None)
+    if renderer is not None and renderer.format in (ColumnarJSONRenderer.format, MessagePackRenderer.format):
+        return renderer.format
+    return None
+
+
+def _time_step(dates: list):
+    """
+    Return the number of seconds between consecutive dates, or None when the dates are not evenly spaced.
+     """
+    if len(dates) < 2:
+        return 0
+    times = [datetime.fromisoformat(date) for date in dates]
+    step = times[1] - times[0]
+    if any(later - earlier != step for earlier, later in zip(times, times[1:])):
+        return None
+    return int(step.total_seconds())
+
+
+def pack_float32(values) -> bytes:
+    """
+    Pack values as little-endian IEEE 754 float32, missing values (None) as NaN.
+     """
+    return struct.pack(f'<{len(values)}f', *(math.nan if value is None else value for value in values))
+
+
+def columnar_weather(weather_data: dict, packed: bool = False):
+    """
+    Return the weather data in columnar form: the dates of the time series are described by their start and step
+    in seconds (86400 for daily aggregates) and every coordinate holds one array of values per column, instead of
+    repeating a {'date', 'value'} object per timestamp:
+
+        {'start': '2024-03-01T00:00:00Z', 'step': 3600, 'count': 169, 'columns': ['t_2m:C', 'uv:idx'],
+         'coordinates': [{'lat': 47.0, 'lon': 28.8, 'values': [[5.1, ...], [0.0, ...]]}]}
+
+    The columns of a daily aggregate are '<parameter>.min', '<parameter>.max' and '<parameter>.mean'. Dates that are
+    not evenly spaced are listed in 'dates' and 'step' is None.
+
+        Args:
+            weather_data (dict): The decoded Meteomatics JSON response (after apply_parameters or aggregate_daily),
+             every series sharing the same dates, or None.
+            packed (bool): True to pack every array of values with pack_float32, for binary encodings.
+
+        Returns:
+            dict or None: The columnar weather data, or None if the response holds no data.
+     """
+    if not weather_data or not weather_data.get('data'):
+        return None
+
+    entries = weather_data['data']
+    aggregated = weather_data.get('aggregate') is not None
+    statistics = AGGREGATE_STATISTICS if aggregated else ('value',)
+
+    columns = [entry.get('parameter', '') for entry in entries]
+    if aggregated:
+        columns = [f'{column}.{statistic}' for column in columns for statistic in statistics]
+
+    coordinates = []
+    dates = []
+    for series in zip(*(entry.get('coordinates', []) for entry in entries)):
+        dates = dates or [date['date'] for date in series[0].get('dates', [])]
+        values = [[date.get(statistic) for date in coordinate.get('dates', [])]
+                  for coordinate in series for statistic in statistics]
+        coordinates.append({
+            'lat': series[0].get('lat'),
+            'lon': series[0].get('lon'),
+            'values': [pack_float32(column) for column in values] if packed else values,
+        })
+
+    step = _time_step(dates)
+    columnar = {'start': dates[0] if dates else None, 'step': step, 'count': len(dates), 'columns': columns,
+                'coordinates': coordinates}
+    if step is None:
+        columnar['dates'] = dates
+    return columnar
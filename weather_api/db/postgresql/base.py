@@ -0,0 +1,36 @@
+import time
+
+from django.db.backends.postgresql import base
+
+from weather_api.metrics import DB_CONNECTION_EVENTS, DB_CONNECTION_WAIT
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    PostgreSQL backend recording how long every new connection takes to be established, in the connection wait
+    histogram of the /metrics endpoint. Through PgBouncer this includes the time spent queued for a pooled server
+    connection. It also counts the connections opened, closed and found unusable by the CONN_HEALTH_CHECKS check.
+     """
+
+    def get_new_connection(self, conn_params):
+        start = time.perf_counter()
+        try:
+            connection = super().get_new_connection(conn_params)
+        except Exception:
+            DB_CONNECTION_EVENTS.labels(self.alias, 'failed').inc()
+            raise
+        finally:
+            DB_CONNECTION_WAIT.labels(self.alias).observe(time.perf_counter() - start)
+        DB_CONNECTION_EVENTS.labels(self.alias, 'opened').inc()
+        return connection
+
+    def is_usable(self):
+        usable = super().is_usable()
+        if not usable:
+            DB_CONNECTION_EVENTS.labels(self.alias, 'unusable').inc()
+        return usable
+
+    def _close(self):
+        if self.connection is not None:
+            DB_CONNECTION_EVENTS.labels(self.alias, 'closed').inc()
+        super()._close()
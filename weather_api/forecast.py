@@ -0,0 +1,165 @@
+import math
+
+from datetime import datetime, timedelta
+from typing import NamedTuple
+
+from django.conf import settings
+
+
+DEFAULT_FORECAST_DAYS = 7
+
+# Meteomatics time steps (ISO 8601 durations) a client may request, None keeps the upstream default step.
+ALLOWED_INTERVALS = ('PT15M', 'PT30M', 'PT1H', 'PT3H', 'PT6H', 'PT12H', 'P1D')
+ALLOWED_AGGREGATES = ('daily',)
+
+# Step requested for daily aggregation when the client does not choose one.
+DEFAULT_AGGREGATE_INTERVAL = 'PT1H'
+
+
+class ForecastOptions(NamedTuple):
+    """
+    Resolution of a forecast request: the number of days, the upstream time step and the optional aggregation.
+     """
+    days: int = DEFAULT_FORECAST_DAYS
+    interval: str = None
+    aggregate: str = None
+
+
+DEFAULT_FORECAST_OPTIONS = ForecastOptions()
+
+
+def parse_forecast_options(data) -> ForecastOptions:
+    """
+    Parse and validate the 'days', 'interval' and 'aggregate' forecast options requested by a client.
+
+        Args:
+            data (dict or QueryDict): The query parameters or request data, missing options take their defaults.
+
+        Returns:
+            ForecastOptions: The validated options, with the interval set to DEFAULT_AGGREGATE_INTERVAL for daily
+            aggregation when the client did not choose one.
+
+        Raises:
+            ValueError: If an option is out of range or not supported.
+     """
+    days = data.get('days')
+    if days in (None, ''):
+        days = DEFAULT_FORECAST_DAYS
+    try:
+        days = int(days)
+    except (TypeError, ValueError):
+        raise ValueError(f'Invalid days: {days}.')
+    if not 1 <= days <= settings.FORECAST_MAX_DAYS:
+        raise ValueError(f'Days must be between 1 and {settings.FORECAST_MAX_DAYS}.')
+
+    interval = data.get('interval') or None
+    if interval is not None:
+        interval = str(interval).upper()
+        if interval not in ALLOWED_INTERVALS:
+            raise ValueError(f'Unsupported interval: {interval}. '
+                             f'Supported intervals: {", ".join(ALLOWED_INTERVALS)}.')
+
+    aggregate = data.get('aggregate') or None
+    if aggregate is not None:
+        aggregate = str(aggregate).lower()
+        if aggregate not in ALLOWED_AGGREGATES:
+            raise ValueError(f'Unsupported aggregate: {aggregate}. '
+                             f'Supported aggregates: {", ".join(ALLOWED_AGGREGATES)}.')
+        interval = interval or DEFAULT_AGGREGATE_INTERVAL
+
+    return ForecastOptions(days, interval, aggregate)
+
+
+def forecast_variant(options: ForecastOptions) -> str:
+    """
+    Return the weather cache variant for the upstream resolution of a forecast, empty for the default resolution.
+    The aggregation is applied to cached responses, so it is not part of the variant.
+     """
+    if (options.days, options.interval) == (DEFAULT_FORECAST_DAYS, None):
+        return ''
+    return f'{options.days}d{options.interval or ""}'
+
+
+def _local_day_starts(first: int, last: int, local_timezone) -> tuple:
+    """
+    Return the local dates spanned by the epoch seconds first..last and the epoch seconds of their local midnights,
+    so daylight saving time changes inside the forecast are honoured.
+     """
+    first_day = datetime.fromtimestamp(first, local_timezone).date()
+    last_day = datetime.fromtimestamp(last, local_timezone).date()
+
+    days = [first_day + timedelta(days=offset) for offset in range((last_day - first_day).days + 1)]
+    starts = [int(local_timezone.localize(datetime(day.year, day.month, day.day)).timestamp()) for day in days]
+    return days, starts
+
+
+def _rounded(values) -> list:
+    return [None if math.isnan(value) else round(float(value), 1) for value in values]
+
+
+def aggregate_daily(weather_data: dict, local_timezone) -> dict:
+    """
+    Summarize a Meteomatics time series per local day, the values of every parameter and coordinate are stacked
+    into one NumPy matrix and reduced per day in a vectorized way. Missing values are ignored.
+
+        Args:
+            weather_data (dict): The decoded Meteomatics JSON response of a forecast, all series sharing the same
+             dates.
+            local_timezone (pytz.timezone): The time zone defining the local days.
+
+        Returns:
+            dict: The response with the 'dates' of every coordinate replaced by one {'date', 'min', 'max', 'mean'}
+            entry per local day, or the response unchanged if it holds no data.
+     """
+    if not weather_data or not weather_data.get('data'):
+        return weather_data
+
+    # NumPy is only needed by daily forecasts, it is imported on the first one, see weather_api.startup.
+    import numpy as np
+
+    series = [coordinate for entry in weather_data['data'] for coordinate in entry.get('coordinates', [])]
+    if not series or not series[0].get('dates'):
+        return weather_data
+
+    dates = series[0]['dates']
+    if any(len(coordinate['dates']) != len(dates) for coordinate in series):
+        return weather_data
+
+    epochs = np.array([date['date'].rstrip('Z') for date in dates], dtype='datetime64[s]').astype(np.int64)
+    values = np.array([[date['value'] for date in coordinate['dates']] for coordinate in series], dtype=float)
+
+    days, day_starts = _local_day_starts(int(epochs.min()), int(epochs.max()), local_timezone)
+    day_starts = np.array(day_starts, dtype=np.int64)
+    day_index = np.searchsorted(day_starts, epochs, side='right') - 1
+
+    order = np.argsort(day_index, kind='stable')
+    day_index, values = day_index[order], values[:, order]
+    group_days, group_starts = np.unique(day_index, return_index=True)
+
+    present = ~np.isnan(values)
+    counts = np.add.reduceat(present, group_starts, axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        minimums = np.fmin.reduceat(values, group_starts, axis=1)
+        maximums = np.fmax.reduceat(values, group_starts, axis=1)
+        means = np.add.reduceat(np.where(present, values, 0.0), group_starts, axis=1) / counts
+
+    day_labels = [days[day].isoformat() for day in group_days]
+    aggregated = iter(zip(minimums, maximums, means))
+
+    data = []
+    for entry in weather_data['data']:
+        coordinates = []
+        for coordinate in entry.get('coordinates', []):
+            minimum, maximum, mean = next(aggregated)
+            coordinates.append({
+                'lat': coordinate.get('lat'),
+                'lon': coordinate.get('lon'),
+                'dates': [
+                    {'date': label, 'min': low, 'max': high, 'mean': average}
+                    for label, low, high, average in zip(day_labels, _rounded(minimum), _rounded(maximum),
+                                                         _rounded(mean))
+                ],
+            })
+        data.append({'parameter': entry.get('parameter'), 'coordinates': coordinates})
+
+    return dict(weather_data, data=data, aggregate='daily')
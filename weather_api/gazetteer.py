@@ -0,0 +1,204 @@
+import csv
+import gzip
+import logging
+import threading
+
+from pathlib import Path
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .geocoding_cache import normalize_query
+
+
+logger = logging.getLogger(__name__)
+
+
+def _open_table(path):
+    path = Path(path)
+    opener = gzip.open if path.suffix == '.gz' else open
+    return opener(path, 'rt', encoding='utf-8', newline='')
+
+
+def read_geonames_table(path, warning: str) -> list:
+    """
+    Return the rows of a tab-separated GeoNames dump, or no rows when the path is empty or cannot be read.
+     """
+    if not path:
+        return []
+    try:
+        with _open_table(path) as file:
+            return list(csv.reader(file, delimiter='\t', quoting=csv.QUOTE_NONE))
+    except OSError as e:
+        logger.warning(warning, extra={'path': str(path), 'error': str(e)})
+        return []
+
+
+def _outward_code(postcode: str) -> str:
+    # The part of a normalized full postcode the postal codes dumps list: the 5-digit ZIP code of a ZIP+4 code, the
+    # outward code (all but the last 3 characters) of British and Canadian postcodes.
+    if postcode.isdigit():
+        return postcode[:5] if len(postcode) == 9 else None
+    return postcode[:-3] if 5 <= len(postcode) <= 7 and any(character.isdigit() for character in postcode) else None
+
+
+class _TrieNode:
+    __slots__ = ('children', 'top')
+
+    def __init__(self):
+        self.children = {}
+        self.top = []
+
+
+class Gazetteer:
+    """
+    Offline index of populated places and postcodes: exact names and postcodes are resolved through dictionaries,
+    and a prefix trie keeps at every node the indexes of its most populated places, so an autocomplete query costs
+    one step per character of the prefix whatever the number of places below it. Places are inserted from the most
+    to the least populated, which keeps every node's list ranked without sorting. Exact lookups also match the
+    alternate names of places (exonyms such as 'Cologne', short forms such as 'New York'), a place's own name wins
+    over another place's alternate name.
+
+        Attributes:
+            places (list): The (name, country code, latitude, longitude, population) tuples of the places, built
+             from (name, country code, latitude, longitude, population, ASCII name, alternate names) tuples.
+            suggest_limit (int): The number of places kept per trie node, the maximum number of suggestions.
+
+        Methods:
+            from_geonames(cls, cities_path, postcodes_path, suggest_limit): Build the gazetteer from a GeoNames
+             cities dump and a GeoNames postal codes dump, missing files are reported and skipped.
+            lookup(self, city_or_zip): Return the (latitude, longitude, country code) tuple of a city name or
+             postcode, optionally suffixed with ', <country code>', or None if it is not in the gazetteer. A full
+             postcode missing from the gazetteer is looked up by its outward code or ZIP code.
+            suggest(self, prefix, limit): Return the most populated places whose name starts with the prefix.
+     """
+
+    def __init__(self, places: list, postcodes: list = (), suggest_limit: int = 10):
+        self.places = []
+        self.suggest_limit = suggest_limit
+        self._names = {}
+        self._alternate_names = {}
+        self._postcodes = {}
+        self._trie = _TrieNode()
+
+        for place in sorted(places, key=lambda place: place[4], reverse=True):
+            index = len(self.places)
+            self.places.append(place)
+            names = {normalize_query(place[0]), normalize_query(place[5])}
+            alternate_names = {normalize_query(name) for name in place[6]} - names
+            for key in names:
+                self._names.setdefault(key, []).append(index)
+                self._insert(key, index)
+            # Alternate names are only matched exactly, in the trie their many spellings would multiply its size and
+            # crowd the suggestions.
+            for key in alternate_names:
+                self._alternate_names.setdefault(key, []).append(index)
+
+        for postcode, country, latitude, longitude in postcodes:
+            entries = self._postcodes.setdefault(normalize_query(postcode), {})
+            entries.setdefault(country, (latitude, longitude))
+
+        self.places = [place[:5] for place in self.places]
+
+    def __len__(self):
+        return len(self.places)
+
+    def _insert(self, key: str, index: int):
+        node = self._trie
+        for character in key:
+            node = node.children.setdefault(character, _TrieNode())
+            if len(node.top) < self.suggest_limit and (not node.top or node.top[-1] != index):
+                node.top.append(index)
+
+    @classmethod
+    def from_geonames(cls, cities_path, postcodes_path, suggest_limit: int = 10):
+        """
+        Read the tab-separated GeoNames 'cities' dump (name, ASCII name, comma-separated alternate names,
+        coordinates, country code and population) and the 'postal codes' dump (country code, postcode and
+        coordinates), optionally gzipped. An empty path loads nothing.
+         """
+        places = []
+        for row in read_geonames_table(cities_path, 'Gazetteer cities not loaded'):
+            try:
+                places.append((row[1], row[8].upper(), float(row[4]), float(row[5]), int(row[14] or 0), row[2],
+                               tuple(filter(None, row[3].split(',')))))
+            except (IndexError, ValueError):
+                continue
+
+        postcodes = []
+        for row in read_geonames_table(postcodes_path, 'Gazetteer postcodes not loaded'):
+            try:
+                postcodes.append((row[1], row[0].upper(), float(row[9]), float(row[10])))
+            except (IndexError, ValueError):
+                continue
+
+        return cls(places, postcodes, suggest_limit)
+
+    def lookup(self, city_or_zip) -> tuple:
+        query = normalize_query(city_or_zip)
+        country = None
+        if not self._known(query) and ', ' in query:
+            name, _, suffix = query.rpartition(', ')
+            if len(suffix) == 2 and suffix.isalpha():
+                query, country = normalize_query(name), suffix.upper()
+
+        for names in (self._names, self._alternate_names):
+            for index in names.get(query, ()):
+                _, place_country, latitude, longitude, _ = self.places[index]
+                if country is None or place_country == country:
+                    return latitude, longitude, place_country.lower()
+
+        # A postcode shared by several countries is ambiguous without a country, it is left to the geocoder.
+        entries = self._postcodes.get(query) or self._postcodes.get(_outward_code(query), {})
+        if country is not None:
+            entries = {country: entries[country]} if country in entries else {}
+        if len(entries) == 1:
+            (place_country, (latitude, longitude)), = entries.items()
+            return latitude, longitude, place_country.lower()
+        return None
+
+    def _known(self, query: str) -> bool:
+        return query in self._names or query in self._alternate_names or query in self._postcodes
+
+    def suggest(self, prefix: str, limit: int = None) -> list:
+        node = self._trie
+        for character in normalize_query(prefix):
+            node = node.children.get(character)
+            if node is None:
+                return []
+
+        return [
+            {'name': name, 'country': country, 'latitude': latitude, 'longitude': longitude, 'population': population}
+            for name, country, latitude, longitude, population in
+            (self.places[index] for index in node.top[:limit or self.suggest_limit])
+        ]
+
+
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+
+
+def get_gazetteer() -> Gazetteer:
+    """
+    Return the process-wide Gazetteer, loaded on first use from GAZETTEER_CITIES_FILE and GAZETTEER_POSTCODES_FILE.
+
+        Returns:
+            Gazetteer: The shared gazetteer.
+     """
+    global _gazetteer
+
+    if _gazetteer is None:
+        with _gazetteer_lock:
+            if _gazetteer is None:
+                _gazetteer = Gazetteer.from_geonames(settings.GAZETTEER_CITIES_FILE, settings.GAZETTEER_POSTCODES_FILE,
+                                                     settings.GAZETTEER_SUGGEST_LIMIT)
+    return _gazetteer
+
+
+@receiver(setting_changed)
+def _reset_gazetteer(setting, **kwargs):
+    global _gazetteer
+
+    if setting.startswith('GAZETTEER_'):
+        _gazetteer = None
@@ -0,0 +1,205 @@
+import logging
+import re
+import threading
+import unicodedata
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.db import DatabaseError
+from django.utils import timezone
+
+from .lru_cache import LRUCache
+from .metrics import CACHE_LOOKUPS
+from .models import GeocodingCacheEntry
+from .singleflight import SingleFlight, coalesce
+
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r'\s+')
+_COMMA_RE = re.compile(r'\s*,\s*')
+_POSTCODE_RE = re.compile(r'(?=.*\d)[a-z0-9][a-z0-9 \-]{1,9}')
+
+_NOT_FOUND = 'not-found'
+
+
+def normalize_query(city_or_zip: str) -> str:
+    """
+    Normalize a location query so that spelling variants of the same city name or zip code share one cache entry,
+    it folds the case, collapses whitespace, normalizes the spacing around commas and strips spaces and hyphens from
+    queries that look like a postcode ('SW1A 1AA' and 'sw1a-1aa' both become 'sw1a1aa').
+
+        Args:
+            city_or_zip (str): The raw city name or zip code provided by the user.
+
+        Returns:
+            str: The normalized query used as the cache key.
+     """
+    query = unicodedata.normalize('NFKC', str(city_or_zip)).casefold()
+    query = _WHITESPACE_RE.sub(' ', query).strip()
+    query = _COMMA_RE.sub(', ', query)
+
+    if _POSTCODE_RE.fullmatch(query):
+        query = query.replace(' ', '').replace('-', '')
+
+    return query
+
+
+class GeocodingCache:
+    """
+    Two-tier cache for geocoding results: an in-process LRU in front of the persistent GeocodingCacheEntry table.
+    Successful lookups are kept for 'ttl' seconds, locations the geocoder could not find are kept for the shorter
+    'negative_ttl' seconds. Exceptions raised by the fetch function are never cached. Database errors are swallowed
+    so a broken cache table degrades to a direct geocoder call instead of failing the request.
+
+        Attributes:
+            ttl (int): Lifetime in seconds of a successful geocoding result.
+            negative_ttl (int): Lifetime in seconds of a 'location not found' result.
+            lru (LRUCache): The in-process cache tier.
+            single_flight (SingleFlight): Coalesces concurrent fetches of the same normalized query.
+
+        Methods:
+            get(self, city_or_zip): Return a (found, result) tuple, 'found' is False on a cache miss.
+            set(self, city_or_zip, result): Store the geocoding result (or None for 'not found') for the query.
+            get_or_fetch(self, city_or_zip, fetch): Return the cached geolocation tuple for the query, calling
+             fetch(city_or_zip) and storing its result on a miss. Concurrent misses for the same normalized query
+             share one fetch.
+            stats(self): Return the hit and miss counters.
+            clear(self): Empty the in-process tier and reset the counters.
+     """
+
+    def __init__(self, ttl: int, negative_ttl: int, lru_size: int):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.lru = LRUCache(lru_size)
+        self.single_flight = SingleFlight()
+        self._counters = {'memory_hits': 0, 'database_hits': 0, 'misses': 0}
+        self._counters_lock = threading.Lock()
+
+    def _count(self, name):
+        CACHE_LOOKUPS.labels('geocoding', name).inc()
+        with self._counters_lock:
+            self._counters[name] += 1
+
+    def stats(self) -> dict:
+        with self._counters_lock:
+            counters = dict(self._counters)
+        counters['hits'] = counters['memory_hits'] + counters['database_hits']
+        return counters
+
+    def clear(self):
+        self.lru.clear()
+        with self._counters_lock:
+            for name in self._counters:
+                self._counters[name] = 0
+
+    def _get(self, key) -> tuple:
+        now = timezone.now()
+
+        cached = self.lru.get(key)
+        if cached is not None and cached[1] > now:
+            return True, self._unpack(cached[0]), 'memory_hits'
+
+        cached = self._read_database(key, now)
+        if cached is not None:
+            self.lru.set(key, cached)
+            return True, self._unpack(cached[0]), 'database_hits'
+        return False, None, 'misses'
+
+    def get(self, city_or_zip) -> tuple:
+        found, result, counter = self._get(normalize_query(city_or_zip))
+        self._count(counter)
+        return found, result
+
+    def set(self, city_or_zip, result):
+        self._store(normalize_query(city_or_zip), result, timezone.now())
+
+    def get_or_fetch(self, city_or_zip, fetch):
+        found, result = self.get(city_or_zip)
+        if found:
+            return result
+
+        def fetch_and_store():
+            result = fetch(city_or_zip)
+            self.set(city_or_zip, result)
+            return result
+
+        # The re-check of the cache table (shared by every process) under the lock is not counted, the miss was.
+        key = normalize_query(city_or_zip)
+        return coalesce(self.single_flight, f'geocode:{key}', lambda: self._get(key)[:2], fetch_and_store)
+
+    @staticmethod
+    def _unpack(value):
+        return None if value == _NOT_FOUND else value
+
+    def _read_database(self, key, now):
+        try:
+            entry = GeocodingCacheEntry.objects.filter(query=key, expires_at__gt=now).first()
+        except DatabaseError:
+            logger.exception('Geocoding cache read failed', extra={'query': key})
+            return None
+
+        if entry is None:
+            return None
+        if not entry.found:
+            return _NOT_FOUND, entry.expires_at
+        return (entry.latitude, entry.longitude, entry.country), entry.expires_at
+
+    def _store(self, key, result, now):
+        if result:
+            latitude, longitude, country = result
+            expires_at = now + timedelta(seconds=self.ttl)
+            self.lru.set(key, (tuple(result), expires_at))
+        else:
+            latitude = longitude = country = None
+            expires_at = now + timedelta(seconds=self.negative_ttl)
+            self.lru.set(key, (_NOT_FOUND, expires_at))
+
+        try:
+            GeocodingCacheEntry.objects.update_or_create(
+                query=key,
+                defaults={
+                    'latitude': latitude,
+                    'longitude': longitude,
+                    'country': country,
+                    'found': bool(result),
+                    'expires_at': expires_at,
+                },
+            )
+        except DatabaseError:
+            logger.exception('Geocoding cache write failed', extra={'query': key})
+
+
+_geocoding_cache = None
+_geocoding_cache_lock = threading.Lock()
+
+
+def get_geocoding_cache() -> GeocodingCache:
+    """
+    Return the process-wide GeocodingCache, it is created on first use from the GEOCODING_CACHE_* settings.
+
+        Returns:
+            GeocodingCache: The shared geocoding cache instance.
+     """
+    global _geocoding_cache
+
+    if _geocoding_cache is None:
+        with _geocoding_cache_lock:
+            if _geocoding_cache is None:
+                _geocoding_cache = GeocodingCache(
+                    ttl=settings.GEOCODING_CACHE_TTL,
+                    negative_ttl=settings.GEOCODING_CACHE_NEGATIVE_TTL,
+                    lru_size=settings.GEOCODING_CACHE_LRU_SIZE,
+                )
+    return _geocoding_cache
+
+
+@receiver(setting_changed)
+def _reset_geocoding_cache(setting, **kwargs):
+    global _geocoding_cache
+
+    if setting.startswith('GEOCODING_CACHE_'):
+        _geocoding_cache = None
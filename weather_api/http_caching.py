@@ -0,0 +1,113 @@
+import hashlib
+from datetime import datetime
+
+import orjson
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from .weather_cache import get_weather_cache
+
+
+def weather_last_modified(weather_data: dict):
+    """
+    Return when Meteomatics generated the weather data, from its 'dateGenerated' field.
+
+        Returns:
+            float or None: A POSIX timestamp, or None when the field is missing or malformed.
+     """
+    try:
+        return datetime.fromisoformat(weather_data['dateGenerated']).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def weather_etag(path: str, representation: str, endpoint: str, latitude, longitude, variant: str,
+                 weather_data: dict) -> str:
+    """
+    Return the strong ETag of a weather response. Every request for the same URL path and representation whose
+    location snaps to the same weather cache cell is answered from the same cache entry, so the ETag is derived from
+    the snapped location, the cache variant (parameters and forecast resolution) and the upstream generation time
+    instead of the serialized body. Data without a generation time is hashed itself.
+
+        Args:
+            path (str): The URL path of the request, sync and async views render different bytes.
+            representation (str): The format of the response, e.g. 'json' or 'ndjson'.
+            endpoint (str): 'current', 'search' or 'forcast'.
+            latitude (float): The latitude of the location, snapped to the weather cache grid.
+            longitude (float): The longitude of the location, snapped to the weather cache grid.
+            variant (str): The weather cache variant of the request (parameters and forecast resolution).
+            weather_data (dict): The weather data the response is serialized from.
+
+        Returns:
+            str: The quoted ETag.
+     """
+    latitude, longitude = get_weather_cache().snap(latitude, longitude)
+    # Daily aggregates are computed from the cached forecast, they share its generation time.
+    variant = '|'.join(filter(None, (variant, weather_data.get('aggregate'))))
+    generated = weather_data.get('dateGenerated') or hashlib.sha256(
+        orjson.dumps(weather_data, option=orjson.OPT_SORT_KEYS)).hexdigest()
+    key = '\n'.join(map(str, (path, representation, endpoint, latitude, longitude, variant, generated)))
+    return f'"{hashlib.sha256(key.encode()).hexdigest()[:32]}"'
+
+
+class WeatherValidator:
+    """
+    The validators and caching headers of a GET weather response, computed from the weather data before it is
+    serialized so a request with a matching If-None-Match (or If-Modified-Since) is answered with an empty 304.
+
+    Responses are cacheable for the remaining lifetime of their weather cache entry. Shared caches may store the
+    responses for a location (they vary on the URL and the Accept header only) but have to revalidate them after
+    WEATHER_HTTP_SHARED_MAX_AGE seconds, 0 by default, so every request still reaches the view and is authenticated
+    there, a revalidation costing a 304 without serialization. Responses located from the client IP address are
+    private.
+
+        Attributes:
+            request (HttpRequest): The request being answered.
+            etag (str): The quoted strong ETag, see weather_etag.
+            last_modified (float): The upstream generation time of the data, or None.
+            max_age (int): The seconds left before the weather cache entry expires.
+            shared (bool): False for responses only the client may cache.
+
+        Methods:
+            not_modified(self): Return a 304 response when the request's validators match, None otherwise.
+            patch(self, response): Add the ETag, Last-Modified, Cache-Control and Vary headers to a response.
+     """
+
+    def __init__(self, request, endpoint: str, latitude, longitude, variant: str, weather_data: dict,
+                 representation: str = 'json', shared: bool = True):
+        self.request = request
+        self.etag = weather_etag(request.path, representation, endpoint, latitude, longitude, variant, weather_data)
+        self.last_modified = weather_last_modified(weather_data)
+        self.max_age = int(get_weather_cache().expires_in(endpoint, latitude, longitude, variant) or 0)
+        self.shared = shared
+
+    def not_modified(self):
+        response = get_conditional_response(self.request, etag=self.etag, last_modified=self.last_modified)
+        return self.patch(response) if response is not None else None
+
+    def patch(self, response):
+        response['ETag'] = self.etag
+        if self.last_modified is not None:
+            response['Last-Modified'] = http_date(self.last_modified)
+
+        if self.shared:
+            patch_cache_control(response, public=True, max_age=self.max_age, must_revalidate=True,
+                                s_maxage=min(self.max_age, settings.WEATHER_HTTP_SHARED_MAX_AGE))
+        else:
+            patch_cache_control(response, private=True, max_age=self.max_age)
+        patch_vary_headers(response, ('Accept',))
+        return response
+
+
+def weather_validator(request, endpoint: str, latitude, longitude, variant: str, weather_data: dict,
+                      representation: str = 'json', shared: bool = True):
+    """
+    Return the WeatherValidator of a weather response, or None when the response is not cacheable: the request is
+    not a GET (or HEAD), the upstream request failed or the response is the HTML of the browsable API.
+     """
+    if request is None or request.method not in ('GET', 'HEAD') or not weather_data or not weather_data.get('data'):
+        return None
+    if representation == 'api':
+        return None
+    return WeatherValidator(request, endpoint, latitude, longitude, variant, weather_data, representation, shared)
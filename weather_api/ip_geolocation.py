@@ -0,0 +1,180 @@
+import csv
+import gzip
+import ipaddress
+import logging
+import threading
+
+from array import array
+from bisect import bisect_right
+from pathlib import Path
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .lru_cache import LRUCache
+
+
+logger = logging.getLogger(__name__)
+
+
+class IPLocationTable:
+    """
+    In-memory IP range to location table. Ranges are kept per address family in sorted arrays of range starts
+    and ends (compact machine-integer arrays for IPv4) with the index of their location, so a lookup is a single
+    bisect instead of a call to a geolocation service.
+
+        Attributes:
+            locations (list): The distinct (latitude, longitude, country code) tuples of the table.
+
+        Methods:
+            from_csv(cls, path): Build the table from a DB-IP "IP to City Lite" style CSV file, optionally gzipped.
+            lookup(self, address): Return the location dictionary of an IP address, or None if no range has it.
+     """
+
+    def __init__(self, ranges: list):
+        self.locations = []
+        location_indexes = {}
+        tables = {4: (array('I'), array('I'), array('I')), 6: ([], [], array('I'))}
+
+        for start, end, version, location in sorted(ranges, key=lambda row: (row[2], row[0])):
+            index = location_indexes.get(location)
+            if index is None:
+                index = location_indexes[location] = len(self.locations)
+                self.locations.append(location)
+
+            starts, ends, indexes = tables[version]
+            starts.append(start)
+            ends.append(end)
+            indexes.append(index)
+
+        self._tables = tables
+
+    def __len__(self):
+        return sum(len(starts) for starts, _, _ in self._tables.values())
+
+    @classmethod
+    def from_csv(cls, path):
+        """
+        Read rows of 'first address, last address, continent, country code, region, city, latitude, longitude';
+        rows with an unparseable address or coordinates are skipped.
+         """
+        path = Path(path)
+        opener = gzip.open if path.suffix == '.gz' else open
+
+        ranges = []
+        with opener(path, 'rt', encoding='utf-8', newline='') as file:
+            for row in csv.reader(file):
+                try:
+                    first, last = ipaddress.ip_address(row[0]), ipaddress.ip_address(row[1])
+                    location = (float(row[6]), float(row[7]), row[3].upper())
+                except (IndexError, ValueError):
+                    continue
+                ranges.append((int(first), int(last), first.version, location))
+        return cls(ranges)
+
+    def lookup(self, address) -> dict:
+        try:
+            address = ipaddress.ip_address(address)
+        except ValueError:
+            return None
+
+        if address.version == 6 and address.ipv4_mapped is not None:
+            address = address.ipv4_mapped
+
+        starts, ends, indexes = self._tables[address.version]
+        position = bisect_right(starts, int(address)) - 1
+        if position < 0 or ends[position] < int(address):
+            return None
+
+        latitude, longitude, country = self.locations[indexes[position]]
+        return {'latitude': latitude, 'longitude': longitude, 'country': country}
+
+
+def _is_trusted_proxy(address: str, trusted_networks: list) -> bool:
+    try:
+        address = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(address in network for network in trusted_networks)
+
+
+def get_client_ip(request) -> str:
+    """
+    Return the IP address of the client of a request: REMOTE_ADDR, or when the request comes from a trusted proxy
+    (IP_GEOLOCATION_TRUSTED_PROXIES), the right-most X-Forwarded-For address that is not a trusted proxy itself.
+    Addresses added by untrusted hops are never believed, so clients cannot spoof their location.
+
+        Args:
+            request (HttpRequest): The incoming request (a DRF Request works too).
+
+        Returns:
+            str or None: The client IP address, or None if the request has no remote address.
+     """
+    meta = request.META
+    address = meta.get('REMOTE_ADDR')
+    trusted_networks = [ipaddress.ip_network(network, strict=False)
+                        for network in settings.IP_GEOLOCATION_TRUSTED_PROXIES]
+    if not address or not _is_trusted_proxy(address, trusted_networks):
+        return address
+
+    forwarded_for = [hop.strip() for hop in meta.get('HTTP_X_FORWARDED_FOR', '').split(',') if hop.strip()]
+    for hop in reversed(forwarded_for):
+        if not _is_trusted_proxy(hop, trusted_networks):
+            return hop
+    return forwarded_for[0] if forwarded_for else address
+
+
+_ip_location_table = None
+_ip_location_table_lock = threading.Lock()
+_ip_fallback_cache = None
+
+
+def get_ip_location_table() -> IPLocationTable:
+    """
+    Return the process-wide IPLocationTable, loaded on first use from IP_GEOLOCATION_DATABASE. An empty table is
+    used when the setting is empty, and once reported when the file does not exist.
+
+        Returns:
+            IPLocationTable: The shared IP location table.
+     """
+    global _ip_location_table
+
+    if _ip_location_table is None:
+        with _ip_location_table_lock:
+            if _ip_location_table is None and not settings.IP_GEOLOCATION_DATABASE:
+                _ip_location_table = IPLocationTable([])
+            elif _ip_location_table is None:
+                try:
+                    _ip_location_table = IPLocationTable.from_csv(settings.IP_GEOLOCATION_DATABASE)
+                except OSError as e:
+                    logger.warning('IP location table not loaded', extra={'path': settings.IP_GEOLOCATION_DATABASE,
+                                                                         'error': str(e)})
+                    _ip_location_table = IPLocationTable([])
+    return _ip_location_table
+
+
+def get_ip_fallback_cache() -> LRUCache:
+    """
+    Return the process-wide LRUCache of the locations found by the online fallback, by client address, so an address
+    missing from the table is only looked up online once per worker.
+
+        Returns:
+            LRUCache: The shared fallback cache, IP_GEOLOCATION_FALLBACK_CACHE_SIZE entries.
+     """
+    global _ip_fallback_cache
+
+    if _ip_fallback_cache is None:
+        with _ip_location_table_lock:
+            if _ip_fallback_cache is None:
+                _ip_fallback_cache = LRUCache(settings.IP_GEOLOCATION_FALLBACK_CACHE_SIZE)
+    return _ip_fallback_cache
+
+
+@receiver(setting_changed)
+def _reset_ip_location_table(setting, **kwargs):
+    global _ip_location_table, _ip_fallback_cache
+
+    if setting.startswith('IP_GEOLOCATION_'):
+        _ip_location_table = None
+        _ip_fallback_cache = None
@@ -0,0 +1,59 @@
+import threading
+
+from collections import OrderedDict
+
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Thread-safe, size-bounded in-process cache with least-recently-used eviction, it is used as the first cache tier
+    in front of slower shared stores (database, Django cache backends) so repeat lookups inside one worker never
+    leave the process.
+
+        Attributes:
+            maxsize (int): The maximum number of entries kept before the least recently used one is evicted.
+
+        Methods:
+            get(self, key, default=None): Return the value stored for the key and mark it as recently used.
+            set(self, key, value): Store the value for the key, evicting the oldest entry when the cache is full.
+            delete(self, key): Remove the key from the cache if present.
+            clear(self): Remove every entry from the cache.
+     """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._data.get(key, _MISSING)
+            if value is _MISSING:
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
@@ -0,0 +1,29 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from weather_api.schema import SCHEMA_FORMATS, SchemaArtifact, schema_version
+
+
+class Command(BaseCommand):
+    help = ('Generate the OpenAPI schema of the current code and write it as openapi-<version>.json and .yaml, the '
+            'documents the schema endpoints serve. Run it when building the image so no process generates it.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output-dir', help='Directory of the documents (SCHEMA_ARTIFACT_DIR).')
+        parser.add_argument('--keep-old', action='store_true', help='Keep the documents of the other versions.')
+
+    def handle(self, *args, **options):
+        directory = Path(options['output_dir'] or settings.SCHEMA_ARTIFACT_DIR)
+        artifact = SchemaArtifact.generate(schema_version())
+        paths = artifact.save(directory)
+
+        if not options['keep_old']:
+            for format in SCHEMA_FORMATS:
+                for path in directory.glob(f'openapi-*{format}'):
+                    if path not in paths:
+                        path.unlink()
+
+        for path in paths:
+            self.stdout.write(f'Wrote {path}')
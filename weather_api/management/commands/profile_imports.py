@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from weather_api.startup import DEFERRED_MODULES, profile_startup
+
+
+class Command(BaseCommand):
+    help = ('Report the import cost of the modules loaded when a worker starts (Django set up and the URLconf '
+            'loaded), measured with "python -X importtime" in a fresh interpreter.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=25, help='Number of modules or packages to list.')
+        parser.add_argument('--by-package', action='store_true',
+                            help='Sum the import time of the modules of every top-level package.')
+        parser.add_argument('--module', action='append', default=[],
+                            help='Also import this module, e.g. weather_app_django.wsgi (repeatable).')
+
+    def handle(self, *args, **options):
+        profile = profile_startup(tuple(options['module']))
+        total = sum(timing.cumulative_seconds for timing in profile.imports if timing.depth == 0)
+        self.stdout.write(f'Start-up took {profile.seconds * 1000:.1f} ms; {len(profile.imports)} modules imported in '
+                          f'{total * 1000:.1f} ms including the interpreter start-up (inflated by the profiling).')
+
+        if options['by_package']:
+            packages = {}
+            for timing in profile.imports:
+                package = timing.module.partition('.')[0]
+                packages[package] = packages.get(package, 0.0) + timing.self_seconds
+            self.stdout.write(f'{"self ms":>10}  package')
+            for package, seconds in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:options['limit']]:
+                self.stdout.write(f'{seconds * 1000:10.1f}  {package}')
+        else:
+            self.stdout.write(f'{"total ms":>10}{"self ms":>10}  module')
+            slowest = sorted(profile.imports, key=lambda timing: timing.cumulative_seconds, reverse=True)
+            for timing in slowest[:options['limit']]:
+                self.stdout.write(f'{timing.cumulative_seconds * 1000:10.1f}{timing.self_seconds * 1000:10.1f}  '
+                                  f'{"  " * timing.depth}{timing.module}')
+
+        loaded = [module for module in DEFERRED_MODULES if module in profile.modules]
+        if loaded:
+            self.stdout.write(self.style.WARNING(f'\nDeferred modules imported at start-up: {", ".join(loaded)}'))
@@ -0,0 +1,32 @@
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from weather_api.refresh_ahead import get_refresh_ahead_worker
+
+
+class Command(BaseCommand):
+    help = ('Refresh the weather cache entries of the most requested locations before they expire. Needs '
+            'REFRESH_AHEAD_ENABLED in the web processes and a weather cache backend shared with them.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run a single refresh cycle and exit.')
+        parser.add_argument('--interval', type=int, help='Seconds between cycles (REFRESH_AHEAD_INTERVAL).')
+
+    def handle(self, *args, **options):
+        worker = get_refresh_ahead_worker()
+        try:
+            worker.check_backend()
+        except ImproperlyConfigured as e:
+            raise CommandError(e)
+        interval = options['interval'] or worker.interval
+
+        while True:
+            started = time.monotonic()
+            refreshed = worker.run_cycle()
+            self.stdout.write(f'Refreshed {refreshed} location(s) in {time.monotonic() - started:.2f}s')
+
+            if options['once']:
+                return
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
@@ -0,0 +1,171 @@
+import base64
+import logging
+import threading
+
+from datetime import datetime, timedelta, timezone
+
+import requests
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .metrics import UPSTREAM_ERRORS, timing
+from .parameters import DEFAULT_PARAMETERS
+
+
+logger = logging.getLogger(__name__)
+
+DATETIME_FORMAT = '%Y-%m-%dT%H:%M:%S.%f%z'
+
+# Responses worth retrying: rate limiting and transient server errors.
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+class MeteomaticsClient:
+    """
+    Client for the Meteomatics weather API that keeps one long-lived requests.Session per process, so connections
+    (TCP + TLS) are pooled and kept alive between requests instead of being re-established for every call.
+    Credentials are encoded once, every request has connect and read timeouts, and idempotent requests are
+    retried a bounded number of times with exponential backoff on connection errors and 429/5xx responses.
+
+        Attributes:
+            base_url (str): The root URL of the Meteomatics API.
+            timeout (tuple): The (connect, read) timeouts in seconds passed to every request.
+            session (requests.Session): The pooled HTTP session.
+
+        Methods:
+            query(self, valid_time, parameters, coordinates, output='json'): Send a request for the given time
+             (or time range), parameters and coordinates, and return the decoded JSON body or None on failure.
+            current(self, latitude, longitude, local_timezone, parameters=('t_2m:C',)): Return the current
+             values of the parameters at the location.
+            forecast(self, latitude, longitude, local_timezone, days=7, parameters=('t_2m:C',), interval=None):
+             Return the forecast of the parameters at the location for the next 'days' days, every 'interval'
+             (an ISO 8601 duration such as 'PT1H') or at the upstream default step.
+            current_many(self, points, parameters=('t_2m:C',)): Return the current values of the parameters at
+             several (latitude, longitude) points with a single request.
+            current_grid(self, south, west, north, east, resolution, parameters=('t_2m:C',)): Return the current
+             values of the parameters at every point of a grid spaced 'resolution' degrees, with a single request.
+     """
+
+    def __init__(self, username: str, password: str, base_url: str = 'https://api.meteomatics.com',
+                 connect_timeout: float = 3.05, read_timeout: float = 10, pool_size: int = 10,
+                 max_retries: int = 2, backoff_factor: float = 0.3):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+
+        credentials = base64.b64encode(f"{username}:{password}".encode()).decode()
+
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=frozenset(['GET']),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.headers.update({'Authorization': f'Basic {credentials}', 'Connection': 'keep-alive'})
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def query(self, valid_time: str, parameters: str, coordinates: str, output: str = 'json') -> dict:
+        url = f'{self.base_url}/{valid_time}/{parameters}/{coordinates}/{output}'
+
+        try:
+            with timing('meteomatics'):
+                response = self.session.get(url, timeout=self.timeout)
+        except requests.RequestException as e:
+            UPSTREAM_ERRORS.labels('meteomatics').inc()
+            logger.warning('Meteomatics request failed', extra={'url': url, 'error': str(e)})
+            return None
+
+        if response.status_code == 200:
+            return response.json()
+        else:
+            UPSTREAM_ERRORS.labels('meteomatics').inc()
+            logger.warning('Meteomatics request failed',
+                           extra={'url': url, 'status': response.status_code, 'body': response.text[:1000]})
+
+    def current(self, latitude, longitude, local_timezone, parameters=DEFAULT_PARAMETERS) -> dict:
+        formatted_datetime = datetime.now(local_timezone).strftime(DATETIME_FORMAT)
+        return self.query(formatted_datetime, ','.join(parameters), f'{latitude},{longitude}')
+
+    def forecast(self, latitude, longitude, local_timezone, days: int = 7, parameters=DEFAULT_PARAMETERS,
+                 interval: str = None) -> dict:
+        current_datetime = datetime.now(local_timezone)
+        future_datetime = current_datetime + timedelta(days=days)
+
+        valid_time = f'{current_datetime.strftime(DATETIME_FORMAT)}--{future_datetime.strftime(DATETIME_FORMAT)}'
+        if interval:
+            valid_time = f'{valid_time}:{interval}'
+        return self.query(valid_time, ','.join(parameters), f'{latitude},{longitude}')
+
+    def current_many(self, points: list, parameters=DEFAULT_PARAMETERS) -> dict:
+        formatted_datetime = datetime.now(timezone.utc).strftime(DATETIME_FORMAT)
+        coordinates = '+'.join(f'{latitude},{longitude}' for latitude, longitude in points)
+        return self.query(formatted_datetime, ','.join(parameters), coordinates)
+
+    def current_grid(self, south, west, north, east, resolution: float, parameters=DEFAULT_PARAMETERS) -> dict:
+        formatted_datetime = datetime.now(timezone.utc).strftime(DATETIME_FORMAT)
+        coordinates = f'{north},{west}_{south},{east}:{resolution},{resolution}'
+        return self.query(formatted_datetime, ','.join(parameters), coordinates)
+
+
+_meteomatics_client = None
+_meteomatics_client_lock = threading.Lock()
+
+
+def meteomatics_credentials() -> tuple:
+    """
+    Return the METEOMATICS_USERNAME and METEOMATICS_PASSWORD settings, read from the environment.
+
+        Raises:
+            ImproperlyConfigured: If either of them is not set.
+     """
+    if not settings.METEOMATICS_USERNAME or not settings.METEOMATICS_PASSWORD:
+        raise ImproperlyConfigured('The Meteomatics API needs the METEOMATICS_USERNAME and METEOMATICS_PASSWORD '
+                                   'environment variables, see .env.template.')
+    return settings.METEOMATICS_USERNAME, settings.METEOMATICS_PASSWORD
+
+
+def get_meteomatics_client() -> MeteomaticsClient:
+    """
+    Return the process-wide MeteomaticsClient, it is created on first use from the METEOMATICS_* settings.
+
+        Returns:
+            MeteomaticsClient: The shared Meteomatics client.
+
+        Raises:
+            ImproperlyConfigured: If the Meteomatics credentials are not set.
+     """
+    global _meteomatics_client
+
+    if _meteomatics_client is None:
+        with _meteomatics_client_lock:
+            if _meteomatics_client is None:
+                username, password = meteomatics_credentials()
+                _meteomatics_client = MeteomaticsClient(
+                    username=username,
+                    password=password,
+                    base_url=settings.METEOMATICS_BASE_URL,
+                    connect_timeout=settings.METEOMATICS_CONNECT_TIMEOUT,
+                    read_timeout=settings.METEOMATICS_READ_TIMEOUT,
+                    pool_size=settings.METEOMATICS_POOL_SIZE,
+                    max_retries=settings.METEOMATICS_MAX_RETRIES,
+                    backoff_factor=settings.METEOMATICS_BACKOFF_FACTOR,
+                )
+    return _meteomatics_client
+
+
+@receiver(setting_changed)
+def _reset_meteomatics_client(setting, **kwargs):
+    global _meteomatics_client
+
+    if setting.startswith('METEOMATICS_'):
+        _meteomatics_client = None
@@ -0,0 +1,156 @@
+import os
+import time
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Cache lookup results counted as hits by the hit ratio, stale weather served while refreshing is not one.
+CACHE_HIT_RESULTS = ('memory_hits', 'shared_hits', 'database_hits')
+
+_spans = ContextVar('server_timing_spans', default=None)
+
+
+REQUEST_DURATION = Histogram('weather_request_duration_seconds', 'Time to produce the response of a request.',
+                             ('view', 'method', 'status'), buckets=DEFAULT_BUCKETS)
+STAGE_DURATION = Histogram('weather_stage_duration_seconds', 'Time spent in a stage of a request.', ('stage',),
+                           buckets=DEFAULT_BUCKETS)
+UPSTREAM_ERRORS = Counter('weather_upstream_errors_total', 'Failed upstream API calls.', ('upstream',))
+DB_CONNECTION_WAIT = Histogram('weather_db_connection_wait_seconds',
+                               'Time to obtain a new database connection, queueing in the pooler included.',
+                               ('database',), buckets=DEFAULT_BUCKETS)
+DB_CONNECTION_EVENTS = Counter('weather_db_connections_total',
+                               'Database connections opened, closed, failed or found unusable by health checks.',
+                               ('database', 'event'))
+CACHE_LOOKUPS = Counter('weather_cache_lookups_total', 'Cache lookups by cache and result.', ('cache', 'result'))
+LOG_RECORDS_DROPPED = Counter('weather_log_records_dropped_total',
+                              'Log records dropped because the background logging queue was full.')
+
+
+@contextmanager
+def timing(stage: str):
+    """
+    Time the enclosed block as a stage of the current request: the duration is recorded in the stage histogram and,
+    inside a request handled by ServerTimingMiddleware, reported in its Server-Timing header.
+
+        Args:
+            stage (str): The stage name, e.g. 'auth', 'geocode', 'meteomatics' or 'serialize'.
+     """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        STAGE_DURATION.labels(stage).observe(duration)
+        spans = _spans.get()
+        if spans is not None:
+            spans.append((stage, duration))
+
+
+def server_timing_header(spans: list, total: float) -> str:
+    """
+    Return the Server-Timing header value of the spans of a request, the durations of repeated stages are summed.
+     """
+    durations = {}
+    for stage, duration in spans:
+        durations[stage] = durations.get(stage, 0.0) + duration
+    durations['total'] = total
+    return ', '.join(f'{stage};dur={duration * 1000:.1f}' for stage, duration in durations.items())
+
+
+class ServerTimingMiddleware:
+    """
+    Middleware collecting the timing spans of every request: the stages timed with timing() are sent in the
+    Server-Timing header (when SERVER_TIMING_ENABLED is on) together with the total time, and the total time is
+    recorded in the request histogram per URL name, method and status. It supports sync and async views.
+     """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        spans = []
+        token = _spans.set(spans)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _spans.reset(token)
+        return self.finish(request, response, spans, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        spans = []
+        token = _spans.set(spans)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _spans.reset(token)
+        return self.finish(request, response, spans, time.perf_counter() - start)
+
+    @staticmethod
+    def finish(request, response, spans: list, total: float):
+        resolver_match = getattr(request, 'resolver_match', None)
+        view = resolver_match.url_name if resolver_match and resolver_match.url_name else 'unmatched'
+        REQUEST_DURATION.labels(view, request.method, str(response.status_code)).observe(total)
+
+        if settings.SERVER_TIMING_ENABLED:
+            response['Server-Timing'] = server_timing_header(spans, total)
+        return response
+
+
+def _collecting_registry():
+    # Under gunicorn every worker writes its metrics to files in PROMETHEUS_MULTIPROC_DIR (see gunicorn.conf.py),
+    # whichever worker is scraped sums them up; a single process reports its own metrics.
+    path = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if not path:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry, path)
+    return registry
+
+
+def _hit_ratio_lines(registry) -> list:
+    lookups = {}
+    for metric in registry.collect():
+        if metric.name != 'weather_cache_lookups':
+            continue
+        for sample in metric.samples:
+            if sample.name.endswith('_total'):
+                hits, total = lookups.get(sample.labels['cache'], (0.0, 0.0))
+                if sample.labels['result'] in CACHE_HIT_RESULTS:
+                    hits += sample.value
+                if sample.labels['result'] in CACHE_HIT_RESULTS or sample.labels['result'] == 'misses':
+                    total += sample.value
+                lookups[sample.labels['cache']] = (hits, total)
+
+    return ['# HELP weather_cache_hit_ratio Share of cache lookups served from the cache.',
+            '# TYPE weather_cache_hit_ratio gauge',
+            *(f'weather_cache_hit_ratio{{cache="{cache}"}} {hits / total if total else 0.0}'
+              for cache, (hits, total) in sorted(lookups.items()))]
+
+
+def render_metrics() -> str:
+    """
+    Return the metrics in the Prometheus text exposition format: request and stage duration histograms, upstream
+    error counters, database connection wait times and events, and the lookups and hit ratios of the weather,
+    geocoding and tile caches. With PROMETHEUS_MULTIPROC_DIR set they are the sums over every worker process.
+
+        Returns:
+            str: The exposition document.
+     """
+    registry = _collecting_registry()
+    return generate_latest(registry).decode() + '\n'.join(_hit_ratio_lines(registry)) + '\n'
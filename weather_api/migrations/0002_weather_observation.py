@@ -0,0 +1,33 @@
+# Generated by Django 4.2 on 2026-10-17 12:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather_api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WeatherObservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('latitude', models.DecimalField(decimal_places=6, max_digits=9)),
+                ('longitude', models.DecimalField(decimal_places=6, max_digits=9)),
+                ('parameter', models.CharField(max_length=32)),
+                ('valid_time', models.DateTimeField()),
+                ('value', models.FloatField(blank=True, null=True)),
+                ('fetched_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='weatherobservation',
+            index=models.Index(fields=['valid_time'], name='weather_observation_time_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='weatherobservation',
+            constraint=models.UniqueConstraint(fields=('latitude', 'longitude', 'parameter', 'valid_time'), name='weather_observation_unique_reading'),
+        ),
+    ]
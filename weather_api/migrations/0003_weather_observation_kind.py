@@ -0,0 +1,33 @@
+# Generated by Django 4.2 on 2026-10-17 15:10
+
+from django.db import migrations, models
+
+
+def mark_forecasts(apps, schema_editor):
+    # Rows archived before 'kind' existed are current values unless they were valid after they were fetched.
+    WeatherObservation = apps.get_model('weather_api', 'WeatherObservation')
+    WeatherObservation.objects.filter(valid_time__gt=models.F('fetched_at')).update(kind='forecast')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather_api', '0002_weather_observation'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='weatherobservation',
+            name='weather_observation_unique_reading',
+        ),
+        migrations.AddField(
+            model_name='weatherobservation',
+            name='kind',
+            field=models.CharField(choices=[('current', 'Current'), ('forecast', 'Forecast')], default='current', max_length=8),
+        ),
+        migrations.RunPython(mark_forecasts, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='weatherobservation',
+            constraint=models.UniqueConstraint(fields=('latitude', 'longitude', 'parameter', 'kind', 'valid_time'), name='weather_observation_unique_reading'),
+        ),
+    ]
@@ -0,0 +1,70 @@
+from django.db import models
+
+
+class GeocodingCacheEntry(models.Model):
+    """
+    Persistent geocoding result for a normalized location query (city name or zip code), shared by every worker
+    process. Negative results (query not found) are stored too, with 'found' set to False and a shorter expiry.
+
+        Fields:
+            query (CharField): The normalized location query used as the cache key.
+            latitude (FloatField): The latitude of the location, empty for negative results.
+            longitude (FloatField): The longitude of the location, empty for negative results.
+            country (CharField): The ISO 3166-1 alpha-2 country code of the location, empty for negative results.
+            found (BooleanField): False if the geocoder did not find the location.
+            expires_at (DateTimeField): The moment after which the entry must be fetched again.
+            updated_at (DateTimeField): The moment the entry was last written.
+     """
+    query = models.CharField(max_length=255, unique=True)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    country = models.CharField(max_length=2, null=True, blank=True)
+    found = models.BooleanField(default=True)
+    expires_at = models.DateTimeField(db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.query
+
+
+class WeatherObservation(models.Model):
+    """
+    Weather value fetched from the upstream API, archived so that historical time ranges can be served from the
+    database instead of being requested again. Locations are quantized to the weather cache grid, current values and
+    forecasts are kept apart by 'kind', one row is kept per location, parameter, kind and valid time; a later fetch
+    of the same row (e.g. a revised forecast) overwrites it.
+
+        Fields:
+            latitude (DecimalField): The latitude of the grid cell centre.
+            longitude (DecimalField): The longitude of the grid cell centre.
+            parameter (CharField): The weather parameter, e.g. 't_2m:C'.
+            kind (CharField): 'current' for a value fetched as the current weather, 'forecast' for a forecast one.
+            valid_time (DateTimeField): The moment the value is valid for.
+            value (FloatField): The value of the parameter, empty if the upstream API had none.
+            fetched_at (DateTimeField): The moment the value was last fetched.
+     """
+    CURRENT = 'current'
+    FORECAST = 'forecast'
+    KINDS = [(CURRENT, 'Current'), (FORECAST, 'Forecast')]
+
+    latitude = models.DecimalField(max_digits=9, decimal_places=6)
+    longitude = models.DecimalField(max_digits=9, decimal_places=6)
+    parameter = models.CharField(max_length=32)
+    kind = models.CharField(max_length=8, choices=KINDS, default=CURRENT)
+    valid_time = models.DateTimeField()
+    value = models.FloatField(null=True, blank=True)
+    fetched_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            # Also the index of time-range queries: equality on the location, parameter and kind, range on
+            # valid_time.
+            models.UniqueConstraint(fields=['latitude', 'longitude', 'parameter', 'kind', 'valid_time'],
+                                    name='weather_observation_unique_reading'),
+        ]
+        indexes = [
+            models.Index(fields=['valid_time'], name='weather_observation_time_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.parameter} {self.kind} at {self.latitude},{self.longitude} on {self.valid_time.isoformat()}'
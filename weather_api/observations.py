@@ -0,0 +1,287 @@
+import atexit
+import logging
+import queue
+import threading
+
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import DatabaseError, close_old_connections, transaction
+from django.db.models import Avg, Max, Min
+from django.db.models.functions import TruncDay, TruncHour
+from django.dispatch import receiver
+
+from .models import WeatherObservation
+from .parameters import MISSING_VALUE
+from .weather_cache import get_weather_cache
+
+
+logger = logging.getLogger(__name__)
+
+HISTORY_RESOLUTIONS = ('raw', 'hour', 'day')
+HISTORY_KINDS = tuple(kind for kind, _ in WeatherObservation.KINDS)
+
+_TRUNCATIONS = {'hour': TruncHour, 'day': TruncDay}
+_QUANTUM = Decimal('0.000001')
+
+
+def quantize_location(latitude, longitude) -> tuple:
+    """
+    Return the archive key of a location: the centre of its weather cache grid cell, as exact decimals.
+     """
+    latitude, longitude = get_weather_cache().snap(latitude, longitude)
+    return Decimal(str(latitude)).quantize(_QUANTUM), Decimal(str(longitude)).quantize(_QUANTUM)
+
+
+def _parse_date(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).astimezone(dt_timezone.utc)
+
+
+def observations_from_response(weather_data: dict, kind: str = WeatherObservation.CURRENT) -> list:
+    """
+    Return the unsaved WeatherObservation rows of every value of an upstream weather response.
+
+        Args:
+            weather_data (dict): The decoded Meteomatics JSON response, or None.
+            kind (str): WeatherObservation.CURRENT or WeatherObservation.FORECAST.
+
+        Returns:
+            list: The WeatherObservation instances.
+     """
+    if not weather_data or not weather_data.get('data'):
+        return []
+
+    observations = []
+    for entry in weather_data['data']:
+        for coordinate in entry.get('coordinates', []):
+            latitude, longitude = quantize_location(coordinate['lat'], coordinate['lon'])
+            for date in coordinate.get('dates', []):
+                if 'value' not in date:
+                    continue
+                observations.append(WeatherObservation(
+                    latitude=latitude,
+                    longitude=longitude,
+                    parameter=entry.get('parameter', ''),
+                    kind=kind,
+                    valid_time=_parse_date(date['date']),
+                    value=None if date['value'] == MISSING_VALUE else date['value'],
+                ))
+    return observations
+
+
+def write_observations(observations: list) -> int:
+    """
+    Write WeatherObservation rows with bulk_create in batches of OBSERVATION_ARCHIVE_BATCH_SIZE, values already
+    archived for the same location, parameter, kind and valid time are overwritten. Database errors are reported and
+    ignored.
+
+        Args:
+            observations (list): The WeatherObservation instances.
+
+        Returns:
+            int: The number of values written.
+     """
+    if not observations:
+        return 0
+
+    try:
+        # A savepoint of its own, a failed write must not break a transaction of the caller.
+        with transaction.atomic():
+            WeatherObservation.objects.bulk_create(
+                observations,
+                batch_size=settings.OBSERVATION_ARCHIVE_BATCH_SIZE,
+                update_conflicts=True,
+                unique_fields=['latitude', 'longitude', 'parameter', 'kind', 'valid_time'],
+                update_fields=['value', 'fetched_at'],
+            )
+    except DatabaseError:
+        logger.exception('Failed to archive weather observations', extra={'count': len(observations)})
+        return 0
+    return len(observations)
+
+
+class ObservationArchiver:
+    """
+    Writes archived weather responses from a background thread, so a request only puts the response it fetched on
+    a bounded in-memory queue and never waits for the INSERT. The thread turns the queued responses into rows and
+    writes up to batch_size of them at a time; when the queue is full the response is dropped and counted in
+    'dropped' instead. The queue is written out at exit, and the thread is started again in forked children.
+
+        Attributes:
+            queue_size (int): The maximum number of queued responses.
+            batch_size (int): The number of rows gathered before they are written.
+            dropped (int): The number of responses dropped because the queue was full.
+
+        Methods:
+            submit(self, weather_data, kind): Queue a response for archiving, return False if it was dropped.
+            flush(self): Wait until every queued response is written.
+            stop(self): Write the queued responses and stop the thread.
+     """
+
+    _STOP = object()
+
+    def __init__(self, queue_size: int, batch_size: int):
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._thread = None
+        atexit.register(self.stop)
+
+    def submit(self, weather_data: dict, kind: str = WeatherObservation.CURRENT) -> bool:
+        self._start()
+        try:
+            self._queue.put_nowait((weather_data, kind))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        return True
+
+    def flush(self):
+        self._queue.join()
+
+    def stop(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None and thread.is_alive():
+            self._queue.put(self._STOP)
+            thread.join()
+
+    def _start(self):
+        with self._lock:
+            # Threads do not survive fork(): a pre-forked worker starts a thread and a queue of its own.
+            if self._thread is not None and not self._thread.is_alive():
+                self._queue = queue.Queue(maxsize=self.queue_size)
+                self._thread = None
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='observation-archiver', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            items = [self._queue.get()]
+            observations = []
+            while items[-1] is not self._STOP:
+                weather_data, kind = items[-1]
+                try:
+                    observations.extend(observations_from_response(weather_data, kind))
+                except (KeyError, TypeError, ValueError):
+                    logger.exception('Failed to read weather observations')
+                if len(observations) >= self.batch_size:
+                    break
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                if observations:
+                    write_observations(observations)
+                    close_old_connections()
+            finally:
+                for _ in items:
+                    self._queue.task_done()
+            if items[-1] is self._STOP:
+                return
+
+
+_observation_archiver = None
+_observation_archiver_lock = threading.Lock()
+
+
+def get_observation_archiver() -> ObservationArchiver:
+    """
+    Return the process-wide ObservationArchiver, it is created on first use from the OBSERVATION_ARCHIVE_* settings.
+
+        Returns:
+            ObservationArchiver: The shared archiver.
+     """
+    global _observation_archiver
+
+    if _observation_archiver is None:
+        with _observation_archiver_lock:
+            if _observation_archiver is None:
+                _observation_archiver = ObservationArchiver(
+                    queue_size=settings.OBSERVATION_ARCHIVE_QUEUE_SIZE,
+                    batch_size=settings.OBSERVATION_ARCHIVE_BATCH_SIZE,
+                )
+    return _observation_archiver
+
+
+def archive_weather_data(weather_data: dict, kind: str = WeatherObservation.CURRENT) -> bool:
+    """
+    Queue every value of an upstream weather response for the archive, written in the background by the
+    ObservationArchiver so the request that fetched the data neither waits for nor fails with the write. Archiving
+    is skipped when OBSERVATION_ARCHIVE_ENABLED is off.
+
+        Args:
+            weather_data (dict): The decoded Meteomatics JSON response, or None.
+            kind (str): WeatherObservation.CURRENT for current values, WeatherObservation.FORECAST for forecasts.
+
+        Returns:
+            bool: True if the response was queued.
+     """
+    if not settings.OBSERVATION_ARCHIVE_ENABLED or not weather_data or not weather_data.get('data'):
+        return False
+    return get_observation_archiver().submit(weather_data, kind)
+
+
+@receiver(setting_changed)
+def _reset_observation_archiver(setting, **kwargs):
+    global _observation_archiver
+
+    if setting.startswith('OBSERVATION_ARCHIVE_') and _observation_archiver is not None:
+        _observation_archiver.stop()
+        _observation_archiver = None
+
+
+def query_observations(latitude, longitude, parameter: str, start: datetime, end: datetime,
+                       resolution: str = 'raw', kind: str = WeatherObservation.CURRENT) -> list:
+    """
+    Return the archived values of a kind of a parameter at a location for the time range [start, end) with one
+    indexed query, in time order. With an 'hour' or 'day' resolution the values are downsampled by the database into one
+    {'date', 'min', 'max', 'mean'} summary per UTC hour or day.
+
+        Args:
+            latitude (float): The latitude of the location, quantized like the archived rows.
+            longitude (float): The longitude of the location, quantized like the archived rows.
+            parameter (str): The weather parameter.
+            start (datetime): The beginning of the time range, included.
+            end (datetime): The end of the time range, excluded.
+            resolution (str): 'raw', 'hour' or 'day'.
+            kind (str): WeatherObservation.CURRENT or WeatherObservation.FORECAST.
+
+        Returns:
+            list: The {'date', 'value'} readings, or the summaries of the downsampled resolutions.
+     """
+    latitude, longitude = quantize_location(latitude, longitude)
+    observations = WeatherObservation.objects.filter(
+        latitude=latitude, longitude=longitude, parameter=parameter, kind=kind, valid_time__gte=start,
+        valid_time__lt=end)
+
+    if resolution == 'raw':
+        return [
+            {'date': valid_time.astimezone(dt_timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'), 'value': value}
+            for valid_time, value in observations.order_by('valid_time').values_list('valid_time', 'value')
+        ]
+
+    buckets = (
+        observations
+        .annotate(bucket=_TRUNCATIONS[resolution]('valid_time', tzinfo=dt_timezone.utc))
+        .values('bucket')
+        .annotate(minimum=Min('value'), maximum=Max('value'), mean=Avg('value'))
+        .order_by('bucket')
+    )
+    return [
+        {
+            'date': bucket['bucket'].astimezone(dt_timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'min': bucket['minimum'],
+            'max': bucket['maximum'],
+            'mean': None if bucket['mean'] is None else round(bucket['mean'], 1),
+        }
+        for bucket in buckets
+    ]
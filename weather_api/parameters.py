@@ -0,0 +1,158 @@
+import math
+
+
+DEFAULT_PARAMETERS = ('t_2m:C',)
+
+# Value Meteomatics returns when it has no data for a parameter at a point and date.
+MISSING_VALUE = -999
+
+# Parameters requested from Meteomatics as they are.
+UPSTREAM_PARAMETERS = {
+    't_2m:C': 'Temperature 2 m above ground, in °C.',
+    'dew_point_2m:C': 'Dew point 2 m above ground, in °C.',
+    'relative_humidity_2m:p': 'Relative humidity 2 m above ground, in %.',
+    'wind_speed_10m:ms': 'Wind speed 10 m above ground, in m/s.',
+    'wind_dir_10m:d': 'Wind direction 10 m above ground, in degrees.',
+    'wind_gusts_10m_1h:ms': 'Maximum wind gust 10 m above ground in the previous hour, in m/s.',
+    'precip_1h:mm': 'Precipitation in the previous hour, in mm.',
+    'msl_pressure:hPa': 'Mean sea level pressure, in hPa.',
+    'effective_cloud_cover:p': 'Effective cloud cover, in %.',
+    'uv:idx': 'UV index.',
+    'weather_symbol_1h:idx': 'Weather symbol of the previous hour.',
+}
+
+
+def _celsius_to_fahrenheit(temperature):
+    return temperature * 9 / 5 + 32
+
+
+def _apparent_temperature(temperature, relative_humidity, wind_speed):
+    # Steadman's apparent temperature as used by the Australian Bureau of Meteorology (shade, no radiation).
+    vapour_pressure = relative_humidity / 100 * 6.105 * math.exp(17.27 * temperature / (237.7 + temperature))
+    return temperature + 0.33 * vapour_pressure - 0.70 * wind_speed - 4.00
+
+
+# Parameters computed locally from upstream parameters: name -> (upstream dependencies, function of their values).
+DERIVED_PARAMETERS = {
+    't_2m:F': (('t_2m:C',), _celsius_to_fahrenheit),
+    'feels_like:C': (('t_2m:C', 'relative_humidity_2m:p', 'wind_speed_10m:ms'), _apparent_temperature),
+    'feels_like:F': (('t_2m:C', 'relative_humidity_2m:p', 'wind_speed_10m:ms'),
+                     lambda *values: _celsius_to_fahrenheit(_apparent_temperature(*values))),
+}
+
+ALLOWED_PARAMETERS = tuple(UPSTREAM_PARAMETERS) + tuple(DERIVED_PARAMETERS)
+
+
+def parse_parameters(value) -> tuple:
+    """
+    Parse and validate the weather parameters requested by a client against the allow-list.
+
+        Args:
+            value (str or list or None): A comma-separated string or a list of parameter names, None or empty for
+             the default parameters.
+
+        Returns:
+            tuple: The distinct requested parameter names, in request order.
+
+        Raises:
+            ValueError: If the value is not a string, a list or None, or a parameter is not in ALLOWED_PARAMETERS.
+     """
+    if value is not None and not isinstance(value, (str, list, tuple)):
+        raise ValueError('Parameters must be a comma-separated string or a list of parameter names.')
+
+    if not value:
+        return DEFAULT_PARAMETERS
+
+    if isinstance(value, str):
+        value = value.split(',')
+
+    parameters = tuple(dict.fromkeys(str(parameter).strip() for parameter in value if str(parameter).strip()))
+    invalid = [parameter for parameter in parameters if parameter not in ALLOWED_PARAMETERS]
+    if invalid:
+        raise ValueError(f'Unsupported parameters: {", ".join(invalid)}. '
+                         f'Supported parameters: {", ".join(ALLOWED_PARAMETERS)}.')
+    return parameters or DEFAULT_PARAMETERS
+
+
+def upstream_parameters_for(parameters) -> tuple:
+    """
+    Return the upstream parameters needed to answer the requested parameters, derived parameters are replaced by
+    their dependencies, so one upstream request fetches everything.
+
+        Args:
+            parameters (tuple): The validated requested parameter names.
+
+        Returns:
+            tuple: The distinct upstream parameter names, in request order.
+     """
+    upstream = []
+    for parameter in parameters:
+        upstream.extend(DERIVED_PARAMETERS[parameter][0] if parameter in DERIVED_PARAMETERS else (parameter,))
+    return tuple(dict.fromkeys(upstream))
+
+
+def cache_variant(parameters) -> str:
+    """
+    Return the weather cache variant for the requested parameters, whatever their order, empty for the default
+    parameters so their entries are shared with clients that do not ask for parameters at all. Cached responses are
+    put back in request order by apply_parameters().
+     """
+    parameters = tuple(sorted(parameters))
+    return '' if parameters == DEFAULT_PARAMETERS else ','.join(parameters)
+
+
+def _without_missing_values(entry: dict) -> dict:
+    coordinates = entry.get('coordinates', [])
+    if all(date.get('value') != MISSING_VALUE for coordinate in coordinates for date in coordinate.get('dates', [])):
+        return entry
+
+    return dict(entry, coordinates=[
+        dict(coordinate, dates=[dict(date, value=None) if date.get('value') == MISSING_VALUE else date
+                                for date in coordinate.get('dates', [])])
+        for coordinate in coordinates
+    ])
+
+
+def apply_parameters(weather_data: dict, parameters) -> dict:
+    """
+    Compute the derived parameters of an upstream response and keep exactly the requested parameters, in request
+    order. Derived values are computed per coordinate and date from the values of their dependencies. The missing
+    value sentinel (-999) becomes None, parameters the response does not hold (or depend on one it does not hold)
+    are left out. Applying it again to its result only restores the request order, e.g. of a cached response.
+
+        Args:
+            weather_data (dict): The decoded Meteomatics JSON response for upstream_parameters_for(parameters).
+            parameters (tuple): The validated requested parameter names.
+
+        Returns:
+            dict: The response with its 'data' list holding one entry per requested parameter it could answer, or
+            the response unchanged if it holds no data.
+     """
+    if not weather_data or not weather_data.get('data'):
+        return weather_data
+
+    by_parameter = {entry.get('parameter'): _without_missing_values(entry) for entry in weather_data['data']}
+    data = []
+
+    for parameter in parameters:
+        if parameter in by_parameter:
+            data.append(by_parameter[parameter])
+            continue
+
+        dependencies, function = DERIVED_PARAMETERS.get(parameter, ((parameter,), None))
+        if any(dependency not in by_parameter for dependency in dependencies):
+            continue
+
+        sources = [by_parameter[dependency].get('coordinates', []) for dependency in dependencies]
+        coordinates = []
+        for source_coordinates in zip(*sources):
+            dates = []
+            for source_dates in zip(*(coordinate.get('dates', []) for coordinate in source_coordinates)):
+                values = [date.get('value') for date in source_dates]
+                value = None if None in values else round(function(*values), 1)
+                dates.append({'date': source_dates[0]['date'], 'value': value})
+            coordinates.append({'lat': source_coordinates[0]['lat'], 'lon': source_coordinates[0]['lon'],
+                                'dates': dates})
+        data.append({'parameter': parameter, 'coordinates': coordinates})
+
+    return dict(weather_data, data=data)
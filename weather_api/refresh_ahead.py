@@ -0,0 +1,317 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.db import close_old_connections
+from django.dispatch import receiver
+
+from .forecast import DEFAULT_FORECAST_DAYS, ForecastOptions
+from .weather_cache import get_weather_cache, is_shared_cache
+
+
+logger = logging.getLogger(__name__)
+
+POPULAR_LOCATIONS_KEY = 'refresh-ahead:popular'
+REFRESH_LEASE_KEY = 'refresh-ahead:lease'
+
+
+class RefreshTarget(NamedTuple):
+    """
+    A weather request worth keeping warm: the endpoint, the snapped location, the country used for the time zone
+    lookup, the parameters and the upstream resolution of forecasts.
+     """
+    endpoint: str
+    latitude: float
+    longitude: float
+    country: str
+    parameters: tuple
+    days: int = DEFAULT_FORECAST_DAYS
+    interval: str = None
+
+
+def _target_digest(target: RefreshTarget) -> str:
+    return hashlib.sha1(repr(tuple(target)).encode()).hexdigest()
+
+
+class PopularityTracker:
+    """
+    Counts the weather requests per RefreshTarget. Counts are kept in memory and added every flush_interval seconds
+    to per-window counters of the Django cache backend with add() and incr(). In a backend shared between processes
+    with an atomic incr() (Redis, memcached) the flushes of every worker process add up and the refresh_ahead command
+    sees the same ranking; the local-memory backend keeps separate counters in every process, which is why the
+    refresh-ahead worker and command refuse to run with it. Windows last 'window' seconds and expire after two windows: a target is ranked by its count in the
+    current window plus the part of its count in the previous window that still overlaps the last 'window' seconds,
+    so the popularity of targets no longer requested decays to nothing. The first max_tracked targets requested in a
+    window are ranked.
+
+        Attributes:
+            alias (str): The alias of the Django cache backend from settings.CACHES.
+            window (int): The length in seconds of a counting window.
+            max_tracked (int): The maximum number of ranked targets per window.
+            flush_interval (int): How often in seconds the in-memory counts are added to the backend.
+
+        Methods:
+            record(self, target): Count one request of the target.
+            flush(self): Add the in-memory counts to the backend now.
+            popular(self, limit): Return the most requested targets, most requested first.
+     """
+
+    def __init__(self, alias: str, window: int, max_tracked: int, flush_interval: int):
+        self.alias = alias
+        self.window = window
+        self.max_tracked = max_tracked
+        self.flush_interval = flush_interval
+        self._pending = Counter()
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    @property
+    def backend(self):
+        return caches[self.alias]
+
+    def _prefix(self, window_index: int) -> str:
+        return f'{POPULAR_LOCATIONS_KEY}:{self.window}:{window_index}'
+
+    def record(self, target: RefreshTarget):
+        with self._lock:
+            self._pending[target] += 1
+            due = time.monotonic() - self._last_flush >= self.flush_interval
+
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+            self._last_flush = time.monotonic()
+        if not pending:
+            return
+
+        backend = self.backend
+        prefix = self._prefix(int(time.time() // self.window))
+        timeout = 2 * self.window
+        for target, count in pending.items():
+            key = f'{prefix}:count:{_target_digest(target)}'
+            if not backend.add(key, count, timeout):
+                try:
+                    backend.incr(key, count)
+                except ValueError:
+                    # The counter expired between add() and incr().
+                    backend.add(key, count, timeout)
+                continue
+
+            # First request of the target in this window: it takes the next slot of the window.
+            backend.add(f'{prefix}:size', 0, timeout)
+            slot = backend.incr(f'{prefix}:size')
+            if slot <= self.max_tracked:
+                backend.set(f'{prefix}:slot:{slot}', target, timeout)
+
+    def popular(self, limit: int) -> list:
+        backend = self.backend
+        now = time.time()
+        window_index = int(now // self.window)
+        overlap = 1 - (now % self.window) / self.window
+
+        scores = {}
+        for index, weight in ((window_index, 1.0), (window_index - 1, overlap)):
+            prefix = self._prefix(index)
+            size = min(backend.get(f'{prefix}:size') or 0, self.max_tracked)
+            targets = backend.get_many([f'{prefix}:slot:{slot}' for slot in range(1, size + 1)]).values()
+            keys = {f'{prefix}:count:{_target_digest(target)}': target for target in targets}
+            for key, count in backend.get_many(list(keys)).items():
+                scores[keys[key]] = scores.get(keys[key], 0.0) + weight * count
+
+        ranked = sorted((target for target, score in scores.items() if score > 0), key=scores.get, reverse=True)
+        return ranked[:limit]
+
+
+class RefreshAheadWorker:
+    """
+    Refreshes the cache entries of the most requested targets shortly before they stop being served, so their
+    requests never wait for the upstream API. An entry is due when it is missing or stops being served within
+    'margin' seconds; when the current time bucket ends first, the entry of the next bucket is filled instead.
+    Refreshes run as the in-flight call of their cache key, so requests arriving meanwhile get the stale entry.
+    Every web process may start the background thread, a cycle only runs in the process holding the lease of the
+    current interval in the cache backend, so the targets are refreshed once per interval whatever the number of
+    processes. The lease, the counters and the refreshed entries must be shared by every process, so the thread is
+    not started on a per-process cache backend.
+
+        Attributes:
+            tracker (PopularityTracker): The ranking of the requested targets.
+            interval (int): The number of seconds between two refresh cycles of the background thread.
+            margin (int): How many seconds before expiry an entry is refreshed.
+            top_n (int): The number of most requested targets kept warm.
+            concurrency (int): The maximum number of concurrent upstream calls.
+            budget (int): The maximum number of upstream calls per cycle.
+
+        Methods:
+            due(self): Return the (target, time bucket) pairs to refresh, most requested first.
+            run_cycle(self): Refresh the due targets within the budget and return the number of refreshes.
+            acquire_lease(self): Return True if this process takes the lease of the current interval.
+            check_backend(self): Raise ImproperlyConfigured unless the cache backend is shared between processes.
+            start(self): Run refresh cycles every 'interval' seconds in a daemon thread.
+            stop(self): Stop the daemon thread after its current cycle.
+     """
+
+    def __init__(self, tracker: PopularityTracker, interval: int, margin: int, top_n: int, concurrency: int,
+                 budget: int):
+        self.tracker = tracker
+        self.interval = interval
+        self.margin = margin
+        self.top_n = top_n
+        self.concurrency = concurrency
+        self.budget = budget
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def due(self) -> list:
+        from .weather_request import weather_cache_request
+
+        weather_cache = get_weather_cache()
+        due = []
+        for target in self.tracker.popular(self.top_n):
+            variant, _ = weather_cache_request(target.endpoint, target.country, target.parameters,
+                                               ForecastOptions(target.days, target.interval))
+            expires_in = weather_cache.expires_in(target.endpoint, target.latitude, target.longitude, variant)
+            if expires_in is not None and expires_in > self.margin:
+                continue
+
+            now = time.time()
+            bucket = weather_cache.current_bucket(now)
+            if (bucket + 1) * weather_cache.time_bucket - now <= self.margin:
+                bucket += 1
+            due.append((target, bucket))
+        return due
+
+    def _refresh(self, target_and_bucket: tuple):
+        from .weather_request import weather_cache_request
+
+        target, bucket = target_and_bucket
+        variant, fetch = weather_cache_request(target.endpoint, target.country, target.parameters,
+                                               ForecastOptions(target.days, target.interval))
+        try:
+            return get_weather_cache().refresh(target.endpoint, target.latitude, target.longitude, fetch, variant,
+                                               bucket) is not None
+        except Exception:
+            logger.exception('Refresh-ahead refresh failed', extra={'target': target, 'bucket': bucket})
+            return False
+        finally:
+            close_old_connections()
+
+    def run_cycle(self) -> int:
+        self.tracker.flush()
+        due = self.due()[:self.budget]
+        if not due:
+            return 0
+
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(due))) as executor:
+            return sum(executor.map(self._refresh, due))
+
+    def acquire_lease(self) -> bool:
+        return self.tracker.backend.add(REFRESH_LEASE_KEY, os.getpid(), self.interval)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                if self.acquire_lease():
+                    self.run_cycle()
+            except Exception:
+                logger.exception('Refresh-ahead cycle failed')
+
+    def check_backend(self):
+        if not is_shared_cache(self.tracker.alias):
+            raise ImproperlyConfigured(f'Refresh-ahead needs a cache backend shared between processes (Redis, '
+                                       f'memcached), the {self.tracker.alias!r} cache is kept in process memory.')
+
+    def start(self):
+        self.check_backend()
+        if self._thread is None or not self._thread.is_alive():
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name='refresh-ahead', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+
+_refresh_ahead_worker = None
+_refresh_ahead_lock = threading.Lock()
+
+
+def get_refresh_ahead_worker() -> RefreshAheadWorker:
+    """
+    Return the process-wide RefreshAheadWorker and its tracker, created on first use from the REFRESH_AHEAD_*
+    settings.
+
+        Returns:
+            RefreshAheadWorker: The shared refresh-ahead worker.
+     """
+    global _refresh_ahead_worker
+
+    if _refresh_ahead_worker is None:
+        with _refresh_ahead_lock:
+            if _refresh_ahead_worker is None:
+                tracker = PopularityTracker(
+                    alias=settings.WEATHER_CACHE_ALIAS,
+                    window=settings.REFRESH_AHEAD_WINDOW,
+                    max_tracked=settings.REFRESH_AHEAD_TOP_N * 20,
+                    flush_interval=settings.REFRESH_AHEAD_FLUSH_INTERVAL,
+                )
+                _refresh_ahead_worker = RefreshAheadWorker(
+                    tracker=tracker,
+                    interval=settings.REFRESH_AHEAD_INTERVAL,
+                    margin=settings.REFRESH_AHEAD_MARGIN,
+                    top_n=settings.REFRESH_AHEAD_TOP_N,
+                    concurrency=settings.REFRESH_AHEAD_CONCURRENCY,
+                    budget=settings.REFRESH_AHEAD_BUDGET,
+                )
+    return _refresh_ahead_worker
+
+
+def track_request(endpoint: str, latitude, longitude, country, parameters, forecast):
+    """
+    Count a search or forcast request for refresh-ahead when REFRESH_AHEAD_ENABLED is on, and start the background
+    refresh thread of the process on first use when REFRESH_AHEAD_WORKER is on (its cycles take a cross-process
+    lease, see RefreshAheadWorker).
+
+        Args:
+            endpoint (str): 'search' or 'forcast'.
+            latitude (float): The latitude of the location.
+            longitude (float): The longitude of the location.
+            country (str): The country associated with the location.
+            parameters (tuple): The validated weather parameters.
+            forecast (ForecastOptions): The resolution of a 'forcast' request.
+     """
+    if not settings.REFRESH_AHEAD_ENABLED:
+        return
+
+    latitude, longitude = get_weather_cache().snap(latitude, longitude)
+    if endpoint == 'forcast':
+        target = RefreshTarget(endpoint, latitude, longitude, country, tuple(parameters), forecast.days,
+                               forecast.interval)
+    else:
+        target = RefreshTarget(endpoint, latitude, longitude, country, tuple(parameters))
+
+    worker = get_refresh_ahead_worker()
+    worker.tracker.record(target)
+    if settings.REFRESH_AHEAD_WORKER:
+        worker.start()
+
+
+@receiver(setting_changed)
+def _reset_refresh_ahead_worker(setting, **kwargs):
+    global _refresh_ahead_worker
+
+    if setting.startswith(('REFRESH_AHEAD_', 'WEATHER_CACHE_')) and _refresh_ahead_worker is not None:
+        _refresh_ahead_worker.stop()
+        _refresh_ahead_worker = None
@@ -0,0 +1,320 @@
+import logging
+import math
+import threading
+
+import pytz
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .gazetteer import read_geonames_table
+from .metrics import timing
+
+
+logger = logging.getLogger(__name__)
+
+GRID_CELL_DEGREES = 2
+
+# The boundary coordinates are stored as integers, in units of 1e-4 degree.
+COORDINATE_SCALE = 1e4
+
+
+def _parse_iso6709(coordinates: str) -> tuple:
+    """
+    Parse the ISO 6709 coordinates used by the tz database ('+4700+02850' or '+404251-0740023') into degrees.
+
+        Args:
+            coordinates (str): Latitude and longitude as sign-prefixed DDMM[SS] and DDDMM[SS] groups.
+
+        Returns:
+            tuple: A tuple containing latitude and longitude in decimal degrees.
+     """
+    split_at = max(coordinates.rfind('+'), coordinates.rfind('-'))
+    return _parse_dms(coordinates[:split_at], 2), _parse_dms(coordinates[split_at:], 3)
+
+
+def _parse_dms(value: str, degree_digits: int) -> float:
+    sign = -1 if value[0] == '-' else 1
+    digits = value[1:]
+    degrees = int(digits[:degree_digits])
+    minutes = int(digits[degree_digits:degree_digits + 2])
+    seconds = int(digits[degree_digits + 2:] or 0)
+    return sign * (degrees + minutes / 60 + seconds / 3600)
+
+
+def _distance_km(latitude_1, longitude_1, latitude_2, longitude_2) -> float:
+    latitude_1, longitude_1, latitude_2, longitude_2 = map(
+        math.radians, (latitude_1, longitude_1, latitude_2, longitude_2))
+    a = (math.sin((latitude_2 - latitude_1) / 2) ** 2
+         + math.cos(latitude_1) * math.cos(latitude_2) * math.sin((longitude_2 - longitude_1) / 2) ** 2)
+    return 12742 * math.asin(min(1.0, math.sqrt(a)))
+
+
+class TimezoneBoundaries:
+    """
+    Point-in-polygon index over simplified time zone boundary polygons. The edges of every polygon are bucketed by
+    the one degree latitude bands they cross, so a lookup only casts its ray against the edges of the candidate
+    polygons in the band of the point (a few hundred at most) with one vectorized NumPy test per polygon.
+
+        Attributes:
+            zones (list): The IANA timezone names.
+            countries (list): The upper-case country code of every zone.
+
+        Methods:
+            from_file(cls, path): Load the boundaries from a NumPy .npz file with 'zones', 'countries',
+             'coordinates' ((longitude, latitude) rows in 1e-4 degree), 'ring_starts' (the first coordinate of every
+             ring), 'polygon_rings' (the first ring of every polygon, its exterior, holes follow) and 'polygon_zones'
+             (the zone of every polygon) arrays.
+            zone_at(self, latitude, longitude): Return the index of the zone containing the point, or None.
+     """
+
+    def __init__(self, zones, countries, coordinates, ring_starts, polygon_rings, polygon_zones):
+        # NumPy is only needed once the boundaries are loaded, it is imported then, see weather_api.startup.
+        import numpy as np
+
+        self.zones = [str(zone) for zone in zones]
+        self.countries = [str(country) for country in countries]
+        self._polygon_zones = [int(zone) for zone in polygon_zones]
+
+        coordinates = np.asarray(coordinates, dtype=np.float64) / COORDINATE_SCALE
+        ring_starts = np.asarray(ring_starts, dtype=np.int64)
+        ring_lengths = np.diff(np.append(ring_starts, len(coordinates)))
+        ring_polygons = np.searchsorted(np.asarray(polygon_rings), np.arange(len(ring_starts)), side='right') - 1
+
+        # Every vertex starts an edge to the next vertex of its ring, the last one closes the ring.
+        following = np.arange(1, len(coordinates) + 1)
+        following[ring_starts + ring_lengths - 1] = ring_starts
+        x1, y1 = coordinates[:, 0], coordinates[:, 1]
+        x2, y2 = x1[following], y1[following]
+        edge_polygons = np.repeat(ring_polygons, ring_lengths)
+
+        first_band = np.clip(np.floor(np.minimum(y1, y2)).astype(np.int64) + 90, 0, 179)
+        last_band = np.clip(np.floor(np.maximum(y1, y2)).astype(np.int64) + 90, 0, 179)
+        counts = last_band - first_band + 1
+        edges = np.repeat(np.arange(len(coordinates)), counts)
+        bands = np.repeat(first_band, counts) + np.arange(len(edges)) - np.repeat(np.cumsum(counts) - counts, counts)
+
+        polygons = len(self._polygon_zones)
+        keys = bands * polygons + edge_polygons[edges]
+        order = np.argsort(keys, kind='stable')
+        keys, edges = keys[order], edges[order]
+        self._x1, self._y1, self._x2, self._y2 = x1[edges], y1[edges], x2[edges], y2[edges]
+
+        minimum_x = np.full(polygons, np.inf)
+        maximum_x = np.full(polygons, -np.inf)
+        np.minimum.at(minimum_x, edge_polygons, x1)
+        np.maximum.at(maximum_x, edge_polygons, x1)
+
+        unique_keys, starts = np.unique(keys, return_index=True)
+        ends = np.append(starts[1:], len(keys))
+        self._bands = [[] for _ in range(180)]
+        for key, start, end in zip(unique_keys.tolist(), starts.tolist(), ends.tolist()):
+            band, polygon = divmod(key, polygons)
+            self._bands[band].append((polygon, float(minimum_x[polygon]), float(maximum_x[polygon]), start, end))
+
+    @classmethod
+    def from_file(cls, path):
+        import numpy as np
+
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data['zones'], data['countries'], data['coordinates'], data['ring_starts'],
+                       data['polygon_rings'], data['polygon_zones'])
+
+    def zone_at(self, latitude: float, longitude: float):
+        import numpy as np
+
+        longitude = (longitude + 180) % 360 - 180
+        band = min(max(math.floor(latitude) + 90, 0), 179)
+        for polygon, minimum_x, maximum_x, start, end in self._bands[band]:
+            if not minimum_x <= longitude <= maximum_x:
+                continue
+            y1, y2 = self._y1[start:end], self._y2[start:end]
+            crossing = (y1 > latitude) != (y2 > latitude)
+            if not crossing.any():
+                continue
+            x1, x2 = self._x1[start:end][crossing], self._x2[start:end][crossing]
+            y1, y2 = y1[crossing], y2[crossing]
+            # Even-odd rule: the point is inside when a ray to the east crosses the rings an odd number of times.
+            if np.count_nonzero(x1 + (latitude - y1) * (x2 - x1) / (y2 - y1) > longitude) % 2:
+                return self._polygon_zones[polygon]
+        return None
+
+
+class ReverseGeocoder:
+    """
+    Offline lat/lon -> (country code, IANA timezone) resolver. Points are located in the simplified time zone boundary
+    polygons with a point-in-polygon test, and the country is the one the zone belongs to in the tz database. Points
+    outside every boundary (at sea or on islands too small to be kept) get the zone of the closest place, places
+    being bucketed into a fixed degree grid; when the country is already known only that country's places are
+    considered.
+
+        Attributes:
+            boundaries (TimezoneBoundaries or None): The time zone boundaries, or None when they are not loaded.
+            places (list): A list of (latitude, longitude, country code, timezone name) tuples.
+            grid (dict): A mapping of (row, column) grid cells to indexes into 'places'.
+            places_by_country (dict): A mapping of upper-case country codes to indexes into 'places'.
+
+        Methods:
+            from_files(cls, boundaries_path, cities_path): Build the resolver from the boundaries file and a GeoNames
+             cities dump, the tz database zone table bundled with pytz stands in for missing places.
+            resolve(self, latitude, longitude): Return the country code and timezone name of the point.
+            timezone_for(self, latitude, longitude, country=None): Return the timezone name for the point, the
+             closest place of the given country is used when the point is outside every boundary.
+     """
+
+    def __init__(self, boundaries, places: list):
+        self.boundaries = boundaries
+        self.places = places
+        self.grid = {}
+        self.places_by_country = {}
+
+        for index, (latitude, longitude, country, _) in enumerate(places):
+            self.grid.setdefault(self._cell(latitude, longitude), []).append(index)
+            self.places_by_country.setdefault(country, []).append(index)
+
+    @classmethod
+    def from_files(cls, boundaries_path, cities_path):
+        boundaries = None
+        if boundaries_path:
+            try:
+                boundaries = TimezoneBoundaries.from_file(boundaries_path)
+            except (OSError, KeyError, ValueError) as e:
+                logger.warning('Time zone boundaries not loaded', extra={'path': str(boundaries_path),
+                                                                        'error': str(e)})
+
+        places = []
+        for row in read_geonames_table(cities_path, 'Reverse geocoder places not loaded'):
+            try:
+                if row[17] in pytz.all_timezones_set:
+                    places.append((float(row[4]), float(row[5]), row[8].upper(), row[17]))
+            except (IndexError, ValueError):
+                continue
+        return cls(boundaries, places or cls.zone_table_places())
+
+    @staticmethod
+    def zone_table_places() -> list:
+        places = []
+        with pytz.open_resource('zone.tab') as zone_table:
+            for line in zone_table.read().decode('utf-8').splitlines():
+                if not line or line.startswith('#'):
+                    continue
+                country, coordinates, timezone_name = line.split('\t')[:3]
+                latitude, longitude = _parse_iso6709(coordinates)
+                places.append((latitude, longitude, country, timezone_name))
+        return places
+
+    @staticmethod
+    def _cell(latitude, longitude) -> tuple:
+        return int((latitude + 90) // GRID_CELL_DEGREES), int((longitude + 180) // GRID_CELL_DEGREES)
+
+    def _nearest(self, latitude, longitude, indexes) -> tuple:
+        return min(
+            (self.places[index] for index in indexes),
+            key=lambda place: _distance_km(latitude, longitude, place[0], place[1]),
+        )
+
+    def _nearest_in_grid(self, latitude, longitude) -> tuple:
+        row, column = self._cell(latitude, longitude)
+        columns = 360 // GRID_CELL_DEGREES
+        candidates = []
+        found_at = None
+
+        # Rings are searched outwards; once a ring yields candidates, one more ring is added because the closest
+        # point can sit in a neighbouring cell of the cell that matched first.
+        for radius in range(columns):
+            for ring_row in range(row - radius, row + radius + 1):
+                for ring_column in range(column - radius, column + radius + 1):
+                    if max(abs(ring_row - row), abs(ring_column - column)) != radius:
+                        continue
+                    candidates.extend(self.grid.get((ring_row, ring_column % columns), ()))
+            if found_at is None and candidates:
+                found_at = radius
+            if found_at is not None and radius > found_at:
+                break
+
+        return self._nearest(latitude, longitude, candidates or range(len(self.places)))
+
+    def _zone_at(self, latitude, longitude):
+        return self.boundaries.zone_at(latitude, longitude) if self.boundaries is not None else None
+
+    def resolve(self, latitude: float, longitude: float) -> tuple:
+        latitude, longitude = float(latitude), float(longitude)
+        zone = self._zone_at(latitude, longitude)
+        if zone is not None:
+            return self.boundaries.countries[zone], self.boundaries.zones[zone]
+
+        _, _, country, timezone_name = self._nearest_in_grid(latitude, longitude)
+        return country, timezone_name
+
+    def timezone_for(self, latitude: float, longitude: float, country: str = None) -> str:
+        latitude, longitude = float(latitude), float(longitude)
+        zone = self._zone_at(latitude, longitude)
+        if zone is not None:
+            return self.boundaries.zones[zone]
+
+        indexes = self.places_by_country.get(country.upper()) if country else None
+        if not indexes:
+            return self._nearest_in_grid(latitude, longitude)[3]
+        return self._nearest(latitude, longitude, indexes)[3]
+
+
+_reverse_geocoder = None
+_reverse_geocoder_lock = threading.Lock()
+
+
+def get_reverse_geocoder() -> ReverseGeocoder:
+    """
+    Return the process-wide ReverseGeocoder, loaded on first use from REVERSE_GEOCODER_BOUNDARIES_FILE and
+    REVERSE_GEOCODER_CITIES_FILE.
+
+        Returns:
+            ReverseGeocoder: The shared offline reverse geocoder.
+     """
+    global _reverse_geocoder
+
+    if _reverse_geocoder is None:
+        with _reverse_geocoder_lock:
+            if _reverse_geocoder is None:
+                _reverse_geocoder = ReverseGeocoder.from_files(settings.REVERSE_GEOCODER_BOUNDARIES_FILE,
+                                                               settings.REVERSE_GEOCODER_CITIES_FILE)
+    return _reverse_geocoder
+
+
+def resolve_country_and_timezone(latitude: float, longitude: float) -> tuple:
+    """
+    Resolve the country code and IANA timezone of a point without any network call.
+
+        Args:
+            latitude (float): The latitude of the point.
+            longitude (float): The longitude of the point.
+
+        Returns:
+            tuple: A tuple containing the upper-case country code and the timezone name.
+     """
+    return get_reverse_geocoder().resolve(latitude, longitude)
+
+
+@timing('reverse_geocode')
+def get_local_timezone(latitude: float, longitude: float, country: str = None):
+    """
+    Get the local timezone of a point without any network call, the country narrows down the closest place used for
+    points outside every time zone boundary.
+
+        Args:
+            latitude (float): The latitude of the point.
+            longitude (float): The longitude of the point.
+            country (str): The ISO 3166-1 alpha-2 country code of the point, in any case, or None.
+
+        Returns:
+            tzinfo: The pytz timezone of the point.
+     """
+    return pytz.timezone(get_reverse_geocoder().timezone_for(latitude, longitude, country))
+
+
+@receiver(setting_changed)
+def _reset_reverse_geocoder(setting, **kwargs):
+    global _reverse_geocoder
+
+    if setting.startswith('REVERSE_GEOCODER_'):
+        _reverse_geocoder = None
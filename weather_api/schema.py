@@ -0,0 +1,162 @@
+import hashlib
+import logging
+import os
+import threading
+
+from importlib import import_module
+from importlib.metadata import version as package_version
+from pathlib import Path
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+
+logger = logging.getLogger(__name__)
+
+# The formats of the schema documents and the content types they are served with.
+SCHEMA_FORMATS = {
+    '.json': 'application/json; charset=utf-8',
+    '.yaml': 'application/yaml; charset=utf-8',
+}
+
+# Source files that do not shape the schema: changing them keeps the schema version.
+_IGNORED_DIRECTORIES = frozenset({'tests', 'migrations', 'management', '__pycache__'})
+
+
+def api_info():
+    """
+    Return the drf_yasg Info object describing the API, shared by the schema documents and the Swagger UI.
+     """
+    from drf_yasg import openapi
+
+    return openapi.Info(
+        title="Weather app with API endpoints",
+        default_version='v1',
+        description="Weather app with API endpoints",
+        contact=openapi.Contact(email="alexandr.basso@gmail.com"),
+        license=openapi.License(name="MIT"),
+    )
+
+
+def schema_version() -> str:
+    """
+    Return the version of the schema of the code on disk: a hash of the sources of weather_api and of the project
+    package (URLconf and settings) and of the drf_yasg version, so it changes exactly when the code does.
+
+        Returns:
+            str: 16 hexadecimal characters.
+     """
+    digest = hashlib.sha256(package_version('drf-yasg').encode())
+    packages = (Path(__file__).parent, Path(import_module(settings.ROOT_URLCONF).__file__).parent)
+    for package in packages:
+        for path in sorted(package.rglob('*.py')):
+            relative = path.relative_to(package.parent)
+            if _IGNORED_DIRECTORIES.isdisjoint(relative.parts):
+                digest.update(str(relative).encode())
+                digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def generate_schema_documents() -> dict:
+    """
+    Introspect every view of the URLconf with drf_yasg, as the schema view of a public schema does, and return the
+    schema encoded in every format of SCHEMA_FORMATS.
+
+        Returns:
+            dict: The document (bytes) per format.
+     """
+    from drf_yasg.app_settings import swagger_settings
+    from drf_yasg.codecs import OpenAPICodecJson, OpenAPICodecYaml
+
+    generator = swagger_settings.DEFAULT_GENERATOR_CLASS(api_info())
+    schema = generator.get_schema(request=None, public=True)
+    return {'.json': OpenAPICodecJson([]).encode(schema), '.yaml': OpenAPICodecYaml([]).encode(schema)}
+
+
+def artifact_paths(directory, version: str) -> dict:
+    """
+    Return the path of the schema document of every format for a schema version, e.g. 'openapi-<version>.json'.
+     """
+    return {format: Path(directory) / f'openapi-{version}{format}' for format in SCHEMA_FORMATS}
+
+
+class SchemaArtifact:
+    """
+    The schema documents of one schema version, held in memory with the ETag of every document.
+
+        Attributes:
+            version (str): The schema version, see schema_version.
+            documents (dict): The document (bytes) per format.
+            etags (dict): The quoted ETag per format, derived from the content of the document.
+
+        Methods:
+            generate(cls, version): Build the documents with drf_yasg.
+            load(cls, directory, version): Read the documents written by a previous save, raises OSError when one
+             is missing.
+            save(self, directory): Write the documents to the directory and return their paths.
+     """
+
+    def __init__(self, version: str, documents: dict):
+        self.version = version
+        self.documents = documents
+        self.etags = {format: f'"{hashlib.sha256(document).hexdigest()[:32]}"'
+                      for format, document in documents.items()}
+
+    @classmethod
+    def generate(cls, version: str):
+        return cls(version, generate_schema_documents())
+
+    @classmethod
+    def load(cls, directory, version: str):
+        return cls(version, {format: path.read_bytes() for format, path in artifact_paths(directory, version).items()})
+
+    def save(self, directory) -> list:
+        Path(directory).mkdir(parents=True, exist_ok=True)
+        paths = artifact_paths(directory, self.version)
+        for format, path in paths.items():
+            # Written next to the target and renamed, so a worker reading concurrently never sees a partial file.
+            temporary = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+            temporary.write_bytes(self.documents[format])
+            temporary.replace(path)
+        return list(paths.values())
+
+
+_artifact = None
+_artifact_lock = threading.Lock()
+
+
+def get_schema_artifact() -> SchemaArtifact:
+    """
+    Return the process-wide SchemaArtifact of the code on disk. It is read from SCHEMA_ARTIFACT_DIR when
+    "python manage.py generate_schema" wrote it (at image build), otherwise it is generated once and written there for
+    the next processes; a read-only directory only costs the write.
+
+        Returns:
+            SchemaArtifact: The shared schema documents.
+     """
+    global _artifact
+
+    if _artifact is None:
+        with _artifact_lock:
+            if _artifact is None:
+                version = schema_version()
+                try:
+                    artifact = SchemaArtifact.load(settings.SCHEMA_ARTIFACT_DIR, version)
+                except OSError:
+                    artifact = SchemaArtifact.generate(version)
+                    try:
+                        artifact.save(settings.SCHEMA_ARTIFACT_DIR)
+                    except OSError as e:
+                        logger.warning('OpenAPI schema artifact not written',
+                                       extra={'directory': str(settings.SCHEMA_ARTIFACT_DIR), 'error': str(e)})
+                _artifact = artifact
+    return _artifact
+
+
+@receiver(setting_changed)
+def _reset_schema_artifact(setting, **kwargs):
+    global _artifact
+
+    if setting in ('SCHEMA_ARTIFACT_DIR', 'SWAGGER_SETTINGS', 'REST_FRAMEWORK'):
+        _artifact = None
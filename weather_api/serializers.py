@@ -1,6 +1,13 @@
+from datetime import timedelta
+
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.utils import timezone
 from rest_framework import serializers
 
+from .observations import HISTORY_KINDS, HISTORY_RESOLUTIONS
+from .parameters import DEFAULT_PARAMETERS, UPSTREAM_PARAMETERS, parse_parameters
+
 
 class UserLoginSerializer(serializers.Serializer):
     """
@@ -40,8 +47,125 @@ class WeatherSerializer(serializers.Serializer):
     coordinates = serializers.ListField(child=serializers.DictField())
 
 
+class WeatherFastSerializer(serializers.BaseSerializer):
+    """
+    Read-only fast path of WeatherSerializer for trusted upstream data: it returns the 'parameter' and the
+    'coordinates' list as they are, instead of walking and copying every nested date/value dictionary through DRF
+    fields. The coordinates are shared with the (possibly cached) upstream response and must not be mutated.
+
+        Methods:
+            to_representation(self, instance): Return the 'parameter' and 'coordinates' of a Meteomatics data entry.
+     """
+
+    def to_representation(self, instance):
+        return {
+            'parameter': str(instance.get('parameter', '')),
+            'coordinates': list(instance.get('coordinates', [])),
+        }
+
+
 class WeatherInputSerializer(serializers.Serializer):
     """
     Serializer class for weather input data, specifically a 'location'.
      """
     location = serializers.CharField()
+
+
+class WeatherBatchLocationField(serializers.Field):
+    """
+    Field for one batch location: either a location query (city name or zip code) string, or a dictionary with
+    'latitude', 'longitude' and an optional 'country'.
+     """
+    default_error_messages = {
+        'invalid': 'Expected a city name or zip code, or an object with "latitude" and "longitude".',
+        'out_of_range': 'Latitude must be within [-90, 90] and longitude within [-180, 180].',
+    }
+
+    def to_internal_value(self, data):
+        if isinstance(data, str):
+            if not data.strip():
+                self.fail('invalid')
+            return data
+
+        if not isinstance(data, dict) or 'latitude' not in data or 'longitude' not in data:
+            self.fail('invalid')
+        try:
+            latitude, longitude = float(data['latitude']), float(data['longitude'])
+        except (TypeError, ValueError):
+            self.fail('invalid')
+        if not -90 <= latitude <= 90 or not -180 <= longitude <= 180:
+            self.fail('out_of_range')
+
+        location = {'latitude': latitude, 'longitude': longitude}
+        if data.get('country'):
+            location['country'] = str(data['country'])
+        return location
+
+    def to_representation(self, value):
+        return value
+
+
+class WeatherBatchInputSerializer(serializers.Serializer):
+    """
+    Serializer class for batch weather input data, a list of 'locations' (city names, zip codes or coordinates)
+    and the optional weather 'parameters', as a comma-separated string or a list.
+     """
+    locations = serializers.ListField(child=WeatherBatchLocationField(), allow_empty=False)
+    parameters = serializers.JSONField(required=False)
+
+    def validate_locations(self, value):
+        max_locations = settings.WEATHER_BATCH_MAX_LOCATIONS
+        if len(value) > max_locations:
+            raise serializers.ValidationError(f'Ensure this field has no more than {max_locations} elements.')
+        return value
+
+    def validate_parameters(self, value):
+        try:
+            return parse_parameters(value)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+
+
+class WeatherHistoryInputSerializer(serializers.Serializer):
+    """
+    Serializer class for weather history queries: a 'location' (city name or zip code) or 'latitude' and
+    'longitude', the archived 'parameter' and its 'kind' ('current' values or 'forecast' ones), the time range from
+    'start' to 'end' (now by default) and the 'resolution' of the returned series ('raw', or downsampled per 'hour'
+    or 'day').
+     """
+    location = serializers.CharField(required=False)
+    latitude = serializers.FloatField(required=False, min_value=-90, max_value=90)
+    longitude = serializers.FloatField(required=False, min_value=-180, max_value=180)
+    parameter = serializers.ChoiceField(choices=list(UPSTREAM_PARAMETERS), default=DEFAULT_PARAMETERS[0])
+    kind = serializers.ChoiceField(choices=HISTORY_KINDS, default='current')
+    start = serializers.DateTimeField()
+    end = serializers.DateTimeField(required=False)
+    resolution = serializers.ChoiceField(choices=HISTORY_RESOLUTIONS, default='raw')
+
+    def validate(self, attrs):
+        if not attrs.get('location') and (attrs.get('latitude') is None or attrs.get('longitude') is None):
+            raise serializers.ValidationError('Provide a location, or a latitude and a longitude.')
+
+        attrs.setdefault('end', timezone.now())
+        if attrs['end'] <= attrs['start']:
+            raise serializers.ValidationError('The end must be after the start.')
+
+        max_days = settings.OBSERVATION_HISTORY_MAX_DAYS
+        if attrs['end'] - attrs['start'] > timedelta(days=max_days):
+            raise serializers.ValidationError(f'Ensure the time range is no longer than {max_days} days.')
+        return attrs
+
+
+class LocationSuggestInputSerializer(serializers.Serializer):
+    """
+    Serializer class for location autocomplete queries: the beginning 'q' of a city name and the maximum number of
+    suggestions 'limit', at most GAZETTEER_SUGGEST_LIMIT.
+     """
+    q = serializers.CharField(max_length=100)
+    limit = serializers.IntegerField(required=False, min_value=1)
+
+    def validate_limit(self, value):
+        if value > settings.GAZETTEER_SUGGEST_LIMIT:
+            raise serializers.ValidationError(
+                f'Ensure this value is less than or equal to {settings.GAZETTEER_SUGGEST_LIMIT}.')
+        return value
@@ -0,0 +1,176 @@
+import asyncio
+import hashlib
+import threading
+
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connection, connections
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.exception = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key inside one process: the first caller (the leader) runs the
+    function, callers arriving while it is in flight wait for it and receive the same result, or the same
+    exception. Nothing is remembered once the call has finished, caching is left to the caller.
+
+        Methods:
+            do(self, key, function): Return function(), sharing one execution between concurrent callers of the key.
+            in_flight(self, key): Return True if a call for the key is currently running.
+     """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def in_flight(self, key) -> bool:
+        with self._lock:
+            return key in self._calls
+
+    def do(self, key, function):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.exception is not None:
+                raise call.exception
+            return call.result
+
+        try:
+            call.result = function()
+            return call.result
+        except BaseException as e:
+            call.exception = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class AsyncSingleFlight:
+    """
+    Event loop counterpart of SingleFlight for the async views: concurrent coroutines awaiting the same key on the
+    same event loop share one execution of the coroutine function.
+
+        Methods:
+            do(self, key, coroutine_function): Return await coroutine_function(), sharing one execution between
+             concurrent callers of the key.
+     """
+
+    def __init__(self):
+        self._futures = {}
+
+    async def do(self, key, coroutine_function):
+        loop = asyncio.get_running_loop()
+        flight_key = (id(loop), key)
+
+        future = self._futures.get(flight_key)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = self._futures[flight_key] = loop.create_future()
+        try:
+            result = await coroutine_function()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting for it.
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._futures[flight_key]
+
+
+def _advisory_lock_id(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'big', signed=True)
+
+
+_lock_connections = threading.local()
+
+
+def _lock_connection():
+    # Every thread keeps a connection of its own for advisory locks, reopened when it is unusable or older than
+    # CONN_MAX_AGE, so the lock transaction never includes the queries of the request.
+    lock_connection = getattr(_lock_connections, 'connection', None)
+    if lock_connection is None:
+        lock_connection = _lock_connections.connection = connections.create_connection(DEFAULT_DB_ALIAS)
+    lock_connection.close_if_unusable_or_obsolete()
+    return lock_connection
+
+
+@contextmanager
+def advisory_lock(key: str):
+    """
+    Serialize a block across worker processes with a transaction-level PostgreSQL advisory lock on the key, when
+    SINGLE_FLIGHT_ADVISORY_LOCKS is enabled and the database is PostgreSQL; otherwise the block runs unlocked.
+    The lock is taken in a transaction of a separate connection, which ends (releasing the lock) with the block: the
+    upstream call and the queries of the block run on the request connection, outside of any transaction. A
+    transaction-level lock also works behind a transaction-pooling connection bouncer.
+
+        Args:
+            key (str): The key to lock, hashed to a 64-bit advisory lock id.
+     """
+    if not settings.SINGLE_FLIGHT_ADVISORY_LOCKS or connection.vendor != 'postgresql':
+        yield
+        return
+
+    lock_connection = _lock_connection()
+    lock_connection.set_autocommit(False)
+    try:
+        with lock_connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [_advisory_lock_id(key)])
+        yield
+    finally:
+        try:
+            lock_connection.rollback()
+            lock_connection.set_autocommit(True)
+        except DatabaseError:
+            lock_connection.close()
+
+
+def coalesce(single_flight: SingleFlight, key: str, lookup, fetch, shared: bool = True):
+    """
+    Run a cache fill once for concurrent callers of the same key: within the process callers share one execution
+    through single_flight, across processes the execution is serialized with an advisory lock and the cache is
+    looked up again once the lock is held, so a fill finished by another process is not repeated. A cache that is
+    not shared between processes never sees the fills of the others, so no lock is taken for it.
+
+        Args:
+            single_flight (SingleFlight): The in-process coalescing registry.
+            key (str): The normalized cache key.
+            lookup (function): Returns a (found, value) tuple from the cache, without fetching or counting a lookup.
+            fetch (function): Fetches the value from upstream and stores it in the cache.
+            shared (bool): Whether the cache is shared between worker processes.
+
+        Returns:
+            The cached or fetched value.
+     """
+    def load():
+        if not shared:
+            return fetch()
+
+        with advisory_lock(key):
+            if settings.SINGLE_FLIGHT_ADVISORY_LOCKS:
+                found, value = lookup()
+                if found:
+                    return value
+            return fetch()
+
+    return single_flight.do(key, load)
@@ -0,0 +1,91 @@
+import importlib
+import json
+import os
+import subprocess
+import sys
+
+from typing import NamedTuple
+
+from django.conf import settings
+
+
+# Modules kept out of the start-up of a worker: they are imported where they are first used (the schema views, the IP
+# geolocation fallback, Nominatim geocoding, the async clients and daily forecasts), which keeps the cold start of a
+# new worker short. geopy, geocoder and the drf_yasg schema generation are the slowest to import; drf_yasg itself is
+# an installed app for its templates and static files, only its views are deferred.
+DEFERRED_MODULES = ('drf_yasg.views', 'geocoder', 'geopy', 'httpx', 'numpy')
+
+# What a worker imports before serving its first request: the settings, the installed apps and the URLconf.
+_STARTUP_CODE = '''
+import json, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+for module in sys.argv[1:]:
+    __import__(module)
+print(json.dumps({'seconds': time.perf_counter() - start, 'modules': sorted(sys.modules)}))
+'''
+
+
+class ImportTiming(NamedTuple):
+    """
+    The import time of a module as reported by 'python -X importtime', in seconds.
+     """
+    module: str
+    self_seconds: float
+    cumulative_seconds: float
+    depth: int
+
+
+class StartupProfile(NamedTuple):
+    """
+    The start-up of a worker measured in a fresh interpreter: the time taken to set Django up and load the URLconf,
+    the modules loaded by then and, when profiled, the import time of every module in import order.
+     """
+    seconds: float
+    modules: frozenset
+    imports: list
+
+
+def _parse_importtime(output: str) -> list:
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or line.endswith('| imported package'):
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        imports.append(ImportTiming(name.strip(), int(self_us) / 1e6, int(cumulative_us) / 1e6,
+                                    (len(name) - len(name.lstrip()) - 1) // 2))
+    return imports
+
+
+def profile_startup(modules: tuple = (), importtime: bool = True) -> StartupProfile:
+    """
+    Start a new interpreter with the current settings, set Django up, load the URLconf and import the extra
+    modules, and return what it took.
+
+        Args:
+            modules (tuple): Extra modules to import after the URLconf, e.g. 'weather_app_django.wsgi'.
+            importtime (bool): Whether to report the import time of every module, which slows the start-up down.
+
+        Returns:
+            StartupProfile: The start-up time, the loaded modules and the import times.
+     """
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE,
+               PYTHONPATH=os.pathsep.join(path for path in sys.path if path))
+    command = [sys.executable, *(['-X', 'importtime'] if importtime else []), '-c', _STARTUP_CODE, *modules]
+    result = subprocess.run(command, env=env, capture_output=True, text=True, check=True)
+
+    report = json.loads(result.stdout.splitlines()[-1])
+    return StartupProfile(report['seconds'], frozenset(report['modules']),
+                          _parse_importtime(result.stderr) if importtime else [])
+
+
+def import_deferred_modules():
+    """
+    Import the deferred modules now, for processes that fork their workers after loading the application (gunicorn
+    with preload_app): the workers then share the modules instead of importing them on their first requests.
+     """
+    for module in DEFERRED_MODULES:
+        importlib.import_module(module)
@@ -0,0 +1,40 @@
+import os
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoiseMiddleware supporting async views: WhiteNoise's middleware is sync only, which makes Django run every
+    async view of the chain through a single thread, one request at a time. Static files are looked up the same way
+    and served before the rest of the chain runs, other requests are passed on without leaving the event loop.
+     """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, **kwargs):
+        super().__init__(get_response, **kwargs)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def add_files(self, root, prefix=None):
+        # STATIC_ROOT only exists once collectstatic has run, until then (development, tests) it is skipped silently.
+        if os.path.isdir(root):
+            super().add_files(root, prefix)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    def _find(self, request):
+        if self.autorefresh:
+            return self.find_file(request.path_info)
+        return self.files.get(request.path_info)
+
+    async def __acall__(self, request):
+        static_file = self._find(request)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
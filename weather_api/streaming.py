@@ -0,0 +1,55 @@
+from django.http import StreamingHttpResponse
+
+from .renderers import NDJSONRenderer
+
+
+def wants_ndjson(request) -> bool:
+    """
+    Return True if content negotiation selected the NDJSON renderer for a DRF request.
+     """
+    renderer = getattr(request, 'accepted_renderer', None)
+    return renderer is not None and renderer.format == NDJSONRenderer.format
+
+
+def iter_weather_records(weather_data: dict):
+    """
+    Yield one record per coordinate and timestamp of a Meteomatics response, holding the value of every parameter
+    at that time: {'lat', 'lon', 'date', <parameter>: <value>, ...}. Daily aggregates yield their {'min', 'max',
+    'mean'} summary as the value. Records are built one at a time from the response, nothing else is materialized.
+
+        Args:
+            weather_data (dict): The decoded Meteomatics JSON response (after apply_parameters), or None.
+     """
+    if not weather_data or not weather_data.get('data'):
+        return
+
+    entries = weather_data['data']
+    for coordinates in zip(*(entry.get('coordinates', []) for entry in entries)):
+        for dates in zip(*(coordinate.get('dates', []) for coordinate in coordinates)):
+            record = {'lat': coordinates[0].get('lat'), 'lon': coordinates[0].get('lon'), 'date': dates[0]['date']}
+            for entry, date in zip(entries, dates):
+                record[entry.get('parameter', '')] = (
+                    date['value'] if 'value' in date
+                    else {key: value for key, value in date.items() if key != 'date'})
+            yield record
+
+
+def _encode_records(records):
+    renderer = NDJSONRenderer()
+    for record in records:
+        yield renderer.render(record)
+
+
+def ndjson_response(records, status: int = 200) -> StreamingHttpResponse:
+    """
+    Stream records as newline-delimited JSON, each record is encoded when the server pulls it, so the first bytes
+    are sent before the last record is built and the whole payload is never held in memory.
+
+        Args:
+            records (iterable): The JSON-serializable records, typically a generator.
+            status (int): The HTTP status code.
+
+        Returns:
+            StreamingHttpResponse: The 'application/x-ndjson' response.
+     """
+    return StreamingHttpResponse(_encode_records(records), status=status, content_type=NDJSONRenderer.media_type)
@@ -0,0 +1,136 @@
+import atexit
+import copy
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+import orjson
+
+from .metrics import LOG_RECORDS_DROPPED
+
+
+# Attributes every LogRecord has, anything else on a record was passed with 'extra' and is logged as a field.
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    Formatter writing each record as one JSON object per line: the time, level, logger name and message, the
+    fields passed with 'extra', and the formatted exception if any.
+     """
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+
+        return orjson.dumps(entry, default=str).decode()
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Filter keeping only a share 'rate' (0..1) of the records at or below 'level', DEBUG by default, so high-volume
+    debug events can stay enabled in production; records above the level always pass.
+     """
+
+    def __init__(self, rate: float = 1.0, level=logging.DEBUG, name: str = ''):
+        super().__init__(name)
+        self.rate = float(rate)
+        self.level = level if isinstance(level, int) else logging.getLevelName(str(level).upper())
+
+    def filter(self, record):
+        return record.levelno > self.level or self.rate >= 1 or random.random() < self.rate
+
+
+class _QueueListener(QueueListener):
+    def enqueue_sentinel(self):
+        # Wait for room, a full queue must not prevent the listener from stopping.
+        self.queue.put(self._sentinel)
+
+
+class BackgroundQueueHandler(QueueHandler):
+    """
+    Logging handler that only puts records on a bounded in-memory queue, a background QueueListener thread formats
+    and writes them to the stream. A request thread therefore never waits for the output: when the queue is full
+    the record is dropped and counted in 'dropped' and in the weather_log_records_dropped_total metric instead. The
+    formatter configured for this handler is used by the listener's stream handler, the listener is flushed and
+    stopped at exit and restarted in forked children.
+
+        Attributes:
+            listener (QueueListener): The background thread writing the records.
+            dropped (int): The number of records dropped because the queue was full.
+
+        Methods:
+            stop(self): Write the queued records and stop the listener thread.
+     """
+
+    def __init__(self, stream=None, queue_size: int = 10000):
+        super().__init__(queue.Queue(maxsize=queue_size))
+        self.queue_size = queue_size
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+
+        self.stream_handler = logging.StreamHandler(stream or sys.stdout)
+        self.stream_handler.setFormatter(JSONFormatter())
+        self.listener = _QueueListener(self.queue, self.stream_handler)
+        self.listener.start()
+        atexit.register(self.stop)
+        os.register_at_fork(after_in_child=self._restart_after_fork)
+
+    def _restart_after_fork(self):
+        # Threads do not survive fork(): a pre-forked worker (e.g. gunicorn with preload_app) gets its own queue
+        # and listener thread instead of the copies of the parent's.
+        if self.listener._thread is None:
+            return
+        self.queue = queue.Queue(maxsize=self.queue_size)
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+        self.listener = _QueueListener(self.queue, self.stream_handler)
+        self.listener.start()
+
+    def setFormatter(self, fmt):
+        self.stream_handler.setFormatter(fmt)
+
+    def prepare(self, record):
+        # Only the cheap parts are done on the logging thread: merging the arguments into the message and rendering
+        # the traceback, which must happen while the exception is still alive.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+            with self._dropped_lock:
+                self.dropped += 1
+
+    def stop(self):
+        if self.listener._thread is not None:
+            self.listener.stop()
+
+    def close(self):
+        self.stop()
+        super().close()
@@ -0,0 +1,44 @@
+import pytest
+
+from django.core.cache import caches
+
+from weather_api.geocoding_cache import get_geocoding_cache
+from weather_api.weather_cache import get_weather_cache
+from weather_api.tests.stub_servers import StubUpstreamServer
+
+
+@pytest.fixture(autouse=True)
+def clear_weather_caches():
+    """
+    Fixture that empties the geocoding and weather caches before every test, so cached upstream responses never
+    leak from one test into another.
+    """
+    caches['default'].clear()
+    get_geocoding_cache().clear()
+    get_weather_cache().clear()
+
+
+@pytest.fixture
+def upstream_stub(settings):
+    """
+    Fixture that starts local stand-ins for Meteomatics and Nominatim and points the settings at them, so a test
+    sees every upstream call it causes. The shipped gazetteer cities and postcodes are turned off, every location is
+    geocoded by the Nominatim stand-in, and fetched values are not archived.
+
+        Returns:
+            StubUpstreamServer: The running stub server, with per-upstream call counters in 'calls'.
+    """
+    server = StubUpstreamServer().start()
+
+    settings.METEOMATICS_BASE_URL = server.meteomatics_url
+    settings.METEOMATICS_USERNAME = 'stub'
+    settings.METEOMATICS_PASSWORD = 'stub'
+    settings.NOMINATIM_BASE_URL = server.nominatim_url
+    settings.GAZETTEER_CITIES_FILE = ''
+    settings.GAZETTEER_POSTCODES_FILE = ''
+    # The archive thread commits outside of the test transaction, the tests of the archive turn it back on.
+    settings.OBSERVATION_ARCHIVE_ENABLED = False
+
+    yield server
+
+    server.stop()
@@ -0,0 +1,251 @@
+import json
+import math
+import random
+import re
+import threading
+import time
+
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+DEFAULT_PLACES = {
+    'chisinau': (47.0245, 28.8323, 'md'),
+    'new york': (40.7127, -74.0059, 'us'),
+    'london': (51.5073, -0.1276, 'gb'),
+    'paris': (48.8534, 2.3488, 'fr'),
+    'berlin': (52.5170, 13.3888, 'de'),
+    'tokyo': (35.6828, 139.7594, 'jp'),
+    'sydney': (-33.8698, 151.2082, 'au'),
+    'moscow': (55.7505, 37.6175, 'ru'),
+}
+
+_DURATION_RE = re.compile(r'P(?:(?P<days>\d+)D)?(?:T(?:(?P<hours>\d+)H)?(?:(?P<minutes>\d+)M)?)?$')
+_UPSTREAM_DATETIME_FORMAT = '%Y-%m-%dT%H:%M:%S.%f%z'
+
+
+def stub_parameter_value(parameter: str, latitude: float, longitude: float, moment: datetime) -> float:
+    """
+    Deterministic, smooth weather field served by the stub: the value only depends on the parameter, the location
+    and the time, so tests and benchmarks can compute the exact value they expect.
+
+        Args:
+            parameter (str): The Meteomatics parameter, e.g. 't_2m:C'.
+            latitude (float): The latitude of the point.
+            longitude (float): The longitude of the point.
+            moment (datetime): The timezone-aware valid time.
+
+        Returns:
+            float: The value of the parameter, rounded to one decimal like the real API.
+     """
+    hour = moment.astimezone(timezone.utc).hour + longitude / 15
+    diurnal = math.sin((hour - 9) / 24 * 2 * math.pi)
+    base = 25 - abs(latitude) / 3 + 2 * math.sin(math.radians(longitude * 4))
+
+    if parameter.startswith('t_'):
+        value = base + 5 * diurnal
+    elif parameter.startswith('wind_speed'):
+        value = 3 + 2 * abs(math.cos(math.radians(latitude * 5)))
+    elif parameter.startswith('relative_humidity'):
+        value = 60 - 20 * diurnal
+    elif parameter.startswith('precip'):
+        value = max(0.0, math.sin(math.radians(latitude * 7 + longitude * 3)))
+    else:
+        value = base
+    return round(value, 1)
+
+
+def _parse_valid_time(valid_time: str) -> list:
+    step = timedelta(hours=1)
+    if ':P' in valid_time:
+        valid_time, duration = valid_time.rsplit(':', 1)
+        match = _DURATION_RE.match(duration)
+        step = timedelta(days=int(match['days'] or 0), hours=int(match['hours'] or 0),
+                         minutes=int(match['minutes'] or 0))
+
+    if '--' not in valid_time:
+        return [datetime.strptime(valid_time, _UPSTREAM_DATETIME_FORMAT)]
+
+    start, end = (datetime.strptime(value, _UPSTREAM_DATETIME_FORMAT) for value in valid_time.split('--'))
+    moments = []
+    while start <= end:
+        moments.append(start)
+        start += step
+    return moments
+
+
+def _parse_coordinates(coordinates: str) -> list:
+    points = []
+    for group in coordinates.split('+'):
+        if '_' in group:
+            corners, resolution = group.split(':')
+            (north, west), (south, east) = (map(float, corner.split(',')) for corner in corners.split('_'))
+            latitude_step, longitude_step = map(float, resolution.split(','))
+            rows = int(round((north - south) / latitude_step)) + 1
+            columns = int(round((east - west) / longitude_step)) + 1
+            for row in range(rows):
+                for column in range(columns):
+                    points.append((round(north - row * latitude_step, 6), round(west + column * longitude_step, 6)))
+        else:
+            latitude, longitude = group.split(',')
+            points.append((float(latitude), float(longitude)))
+    return points
+
+
+class StubUpstreamServer:
+    """
+    Local HTTP server standing in for the Meteomatics and Nominatim APIs in tests and benchmarks. Meteomatics
+    requests are served under '/meteomatics' (single points, '+'-separated point lists, grids, time ranges with a
+    step) with values from stub_parameter_value; Nominatim search and reverse requests are served under
+    '/nominatim' from a dictionary of known places. Latency and a share of 503 errors can be injected, and the
+    number of calls per upstream is counted.
+
+        Attributes:
+            places (dict): A mapping of lower-case place names to (latitude, longitude, country code) tuples.
+            latency (float): The delay in seconds added to every response.
+            error_rate (float): The share (0..1) of requests answered with a 503 error.
+            calls (Counter): The number of requests received per upstream ('meteomatics', 'nominatim').
+
+        Methods:
+            start(self): Start serving on a free local port in a background thread.
+            stop(self): Stop the server.
+            reset(self): Reset the call counters.
+     """
+
+    def __init__(self, places: dict = None, latency: float = 0.0, error_rate: float = 0.0, seed: int = 0):
+        self.places = DEFAULT_PLACES if places is None else places
+        self.latency = latency
+        self.error_rate = error_rate
+        self.calls = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def meteomatics_url(self) -> str:
+        return f'{self.url}/meteomatics'
+
+    @property
+    def nominatim_url(self) -> str:
+        return f'{self.url}/nominatim'
+
+    def start(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                stub._handle(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def reset(self):
+        with self._lock:
+            self.calls.clear()
+
+    def _should_fail(self) -> bool:
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+    def _handle(self, handler):
+        url = urlsplit(handler.path)
+        upstream = url.path.strip('/').split('/', 1)[0]
+
+        with self._lock:
+            self.calls[upstream] += 1
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        if self._should_fail():
+            return self._send(handler, 503, {'message': 'Service temporarily unavailable'})
+
+        try:
+            if upstream == 'meteomatics':
+                return self._send(handler, 200, self._meteomatics(url.path))
+            if upstream == 'nominatim':
+                return self._send(handler, 200, self._nominatim(url.path, parse_qs(url.query)))
+        except (ValueError, KeyError, AttributeError) as e:
+            return self._send(handler, 400, {'message': str(e)})
+        return self._send(handler, 404, {'message': 'Not found'})
+
+    @staticmethod
+    def _send(handler, status, payload):
+        body = json.dumps(payload).encode()
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def _meteomatics(self, path: str) -> dict:
+        _, valid_time, parameters, coordinates, _ = path.strip('/').split('/')
+        moments = _parse_valid_time(valid_time)
+        points = _parse_coordinates(coordinates)
+
+        return {
+            'version': '3.0',
+            'user': 'stub',
+            'dateGenerated': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'status': 'OK',
+            'data': [
+                {
+                    'parameter': parameter,
+                    'coordinates': [
+                        {
+                            'lat': latitude,
+                            'lon': longitude,
+                            'dates': [
+                                {
+                                    'date': moment.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+                                    'value': stub_parameter_value(parameter, latitude, longitude, moment),
+                                }
+                                for moment in moments
+                            ],
+                        }
+                        for latitude, longitude in points
+                    ],
+                }
+                for parameter in parameters.split(',')
+            ],
+        }
+
+    def _nominatim(self, path: str, query: dict):
+        endpoint = path.strip('/').split('/')[-1]
+
+        if endpoint == 'search':
+            place = self.places.get(' '.join(query['q'][0].lower().split()))
+            if place is None:
+                return []
+            latitude, longitude, country = place
+            return [{'lat': str(latitude), 'lon': str(longitude), 'display_name': query['q'][0],
+                     'address': {'country_code': country}}]
+
+        if endpoint == 'reverse':
+            latitude, longitude = float(query['lat'][0]), float(query['lon'][0])
+            country = min(self.places.values(),
+                          key=lambda place: (place[0] - latitude) ** 2 + (place[1] - longitude) ** 2)[2]
+            return {'lat': str(latitude), 'lon': str(longitude), 'address': {'country_code': country}}
+
+        raise KeyError(endpoint)
@@ -0,0 +1,172 @@
+import asyncio
+import time
+
+import pytest
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.test import AsyncClient
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from weather_api.async_clients import (AsyncClientsLifespan, AsyncMeteomaticsClient, AsyncNominatimGeocoder,
+                                       ThreadedMeteomaticsClient, ThreadedNominatimGeocoder,
+                                       get_async_meteomatics_client, get_async_nominatim_geocoder)
+
+
+@pytest.fixture
+def auth_headers():
+    """
+    Fixture to create a user and the request headers authenticating as that user with a token. The headers are
+    passed on every request because AsyncClient(headers=...) defaults are not forwarded to the ASGI scope.
+
+        Returns:
+            dict: The 'Authorization' header for the test user.
+    """
+    user = User.objects.create_user(username="testuser", password="testpassword")
+    token, _ = Token.objects.get_or_create(user=user)
+
+    return {'Authorization': f'Token {token.key}'}
+
+
+def request(client, method, *args, **kwargs):
+    """
+    Run a request of the async test client to completion from synchronous test code.
+    """
+    async def send():
+        return await getattr(client, method)(*args, **kwargs)
+
+    return async_to_sync(send)()
+
+
+@pytest.mark.django_db
+def test_async_search_weather_view_returns_200(auth_headers, upstream_stub):
+    """
+    Test case to check that the async SearchWeatherView geocodes the location and fetches the weather from the
+    local upstream stand-ins, with one call to each upstream.
+    """
+    response = request(AsyncClient(), 'get', reverse('async-search-weather'), {'location': 'Chisinau'},
+                       headers=auth_headers)
+
+    assert response.status_code == 200
+    assert response.json()['parameter'] == 't_2m:C'
+    assert len(response.json()['coordinates'][0]['dates']) == 1
+    assert upstream_stub.calls == {'nominatim': 1, 'meteomatics': 1}
+
+
+@pytest.mark.django_db
+def test_async_forcast_weather_view_post_returns_200(auth_headers, upstream_stub):
+    """
+    Test case to check that the async ForcastWeatherView returns the 7 day forecast for a POSTed location.
+    """
+    response = request(AsyncClient(), 'post', reverse('async-forcast-weather'), {'location': 'Paris'},
+                       content_type='application/json', headers=auth_headers)
+
+    assert response.status_code == 200
+    assert len(response.json()['coordinates'][0]['dates']) == 7 * 24 + 1
+
+
+@pytest.mark.django_db
+def test_async_weather_view_requires_authentication(upstream_stub):
+    """
+    Test case to check that the async views reject unauthenticated requests without calling any upstream.
+    """
+    response = request(AsyncClient(), 'get', reverse('async-search-weather'), {'location': 'Chisinau'})
+
+    assert response.status_code == 401
+    assert not upstream_stub.calls
+
+
+@pytest.mark.django_db
+def test_async_search_weather_view_overlaps_upstream_calls(auth_headers, upstream_stub):
+    """
+    Test case to check that concurrent requests served by one event loop wait for the upstreams at the same time
+    instead of one after the other.
+    """
+    upstream_stub.latency = 0.2
+    cities = ['Chisinau', 'New York', 'London', 'Paris', 'Berlin', 'Tokyo', 'Sydney', 'Moscow']
+
+    client = AsyncClient()
+
+    async def search_all():
+        return await asyncio.gather(*(
+            client.get(reverse('async-search-weather'), {'location': city}, headers=auth_headers) for city in cities
+        ))
+
+    started = time.perf_counter()
+    responses = async_to_sync(search_all)()
+    elapsed = time.perf_counter() - started
+
+    assert [response.status_code for response in responses] == [200] * len(cities)
+    assert elapsed < len(cities) * 2 * upstream_stub.latency / 2
+
+
+def test_async_clients_are_opened_once_per_asgi_server(upstream_stub):
+    """
+    Test case to check that the httpx clients are only created on the event loop of the ASGI server, shared by its
+    requests and closed by the lifespan shutdown, while other loops (async_to_sync under WSGI) get the pooled
+    synchronous clients.
+    """
+    application = AsyncClientsLifespan(None)
+
+    async def serve():
+        messages = asyncio.Queue()
+        sent = []
+
+        async def send(message):
+            sent.append(message['type'])
+
+        await messages.put({'type': 'lifespan.startup'})
+        lifespan = asyncio.ensure_future(application({'type': 'lifespan'}, messages.get, send))
+        while not sent:
+            await asyncio.sleep(0)
+
+        client = get_async_meteomatics_client()
+        assert isinstance(client, AsyncMeteomaticsClient)
+        assert get_async_meteomatics_client() is client
+        assert isinstance(get_async_nominatim_geocoder(), AsyncNominatimGeocoder)
+
+        await messages.put({'type': 'lifespan.shutdown'})
+        await lifespan
+        assert sent == ['lifespan.startup.complete', 'lifespan.shutdown.complete']
+        assert client.client.is_closed
+
+    async def outside_server():
+        return get_async_meteomatics_client(), get_async_nominatim_geocoder()
+
+    async_to_sync(serve)()
+    clients = async_to_sync(outside_server)()
+
+    assert isinstance(clients[0], ThreadedMeteomaticsClient)
+    assert isinstance(clients[1], ThreadedNominatimGeocoder)
+
+
+def test_async_meteomatics_client_retries_rate_limits_and_server_errors():
+    """
+    Test case to check that the async client retries 429/5xx responses like the synchronous client, honouring
+    Retry-After, and gives up after max_retries.
+    """
+    import httpx
+
+    statuses = []
+
+    def respond(request):
+        status = [503, 429, 200][len(statuses) % 3]
+        statuses.append(status)
+        return httpx.Response(status, json={'data': []}, headers={'Retry-After': '0'} if status == 429 else {})
+
+    async def query(max_retries):
+        client = AsyncMeteomaticsClient('user', 'secret', 'https://meteomatics.test', 1, 5, 4, max_retries,
+                                        backoff_factor=0)
+        client.client = httpx.AsyncClient(transport=httpx.MockTransport(respond))
+        try:
+            return await client.query('now', 't_2m:C', '47,28')
+        finally:
+            await client.aclose()
+
+    assert async_to_sync(query)(2) == {'data': []}
+    assert statuses == [503, 429, 200]
+
+    statuses.clear()
+    assert async_to_sync(query)(1) is None
+    assert statuses == [503, 429]
@@ -0,0 +1,103 @@
+import threading
+
+import pytest
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from weather_api import batch
+from weather_api.batch import iter_batch_weather
+
+
+@pytest.fixture
+def authenticated_client():
+    """
+    Fixture to create an authenticated client for testing, it creates a user, obtains their authentication token and
+    configures the client with the token for authentication.
+
+        Returns:
+            APIClient: An authenticated Django REST framework test client.
+    """
+    user = User.objects.create_user(username="testuser", password="testpassword")
+    token, _ = Token.objects.get_or_create(user=user)
+
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+@pytest.mark.django_db
+def test_batch_weather_view_returns_results_in_input_order(authenticated_client, upstream_stub):
+    """
+    Test case to check that the batch endpoint returns one result per input, in input order, including a partial
+    failure for an unknown location, with a single upstream weather request for all points.
+    """
+    locations = ['Chisinau', {'latitude': 40.71, 'longitude': -74.0}, 'Atlantis', 'chisinau', 'Tokyo']
+
+    response = authenticated_client.post(reverse('batch-weather'), {'locations': locations}, format='json')
+
+    assert response.status_code == 200
+    results = response.data['results']
+    assert [result['location'] for result in results] == locations
+    assert [result['status'] for result in results] == ['ok', 'ok', 'error', 'ok', 'ok']
+    assert results[1]['country'] == 'us'
+    assert results[0]['coordinates'] == results[3]['coordinates']
+    assert upstream_stub.calls['meteomatics'] == 1
+    assert upstream_stub.calls['nominatim'] == 3
+
+
+@pytest.mark.django_db
+def test_batch_weather_view_chunks_upstream_requests(authenticated_client, upstream_stub, settings):
+    """
+    Test case to check that points missing from the weather cache are fetched in chunks of
+    WEATHER_BATCH_CHUNK_SIZE, and that points already cached are not requested again.
+    """
+    settings.WEATHER_BATCH_CHUNK_SIZE = 2
+    locations = [{'latitude': latitude, 'longitude': 10} for latitude in range(5)]
+
+    authenticated_client.post(reverse('batch-weather'), {'locations': locations}, format='json')
+    assert upstream_stub.calls['meteomatics'] == 3
+
+    authenticated_client.post(reverse('batch-weather'), {'locations': locations}, format='json')
+    assert upstream_stub.calls['meteomatics'] == 3
+
+
+@pytest.mark.django_db(transaction=True)
+def test_batch_results_yielded_as_chunks_complete(upstream_stub, settings, monkeypatch):
+    """
+    Test case to check that the results of a chunk are yielded as soon as its upstream request completes, before
+    those of a slower chunk sent earlier, and that a failed chunk only fails its own locations.
+    """
+    settings.WEATHER_BATCH_CHUNK_SIZE = 1
+    fetch_chunk = batch._fetch_chunk
+    release = threading.Event()
+
+    def fetch_chunk_in_order(points, parameters):
+        if points[0][0] == 0:
+            release.wait(5)
+        if points[0][0] == 2:
+            raise ValueError('upstream response not understood')
+        return fetch_chunk(points, parameters)
+
+    monkeypatch.setattr(batch, '_fetch_chunk', fetch_chunk_in_order)
+    results = iter_batch_weather([{'latitude': latitude, 'longitude': 10} for latitude in range(3)])
+
+    first, second = next(results), next(results)
+    assert {first[0], second[0]} == {1, 2}
+    assert {first[1]['status'], second[1]['status']} == {'ok', 'error'}
+    release.set()
+    assert [(index, result['status']) for index, result in results] == [(0, 'ok')]
+
+
+@pytest.mark.django_db
+def test_batch_weather_view_rejects_invalid_locations(authenticated_client):
+    """
+    Test case to check that malformed locations are rejected with a 400 status code.
+    """
+    url = reverse('batch-weather')
+
+    assert authenticated_client.post(url, {'locations': []}, format='json').status_code == 400
+    assert authenticated_client.post(url, {'locations': [{'latitude': 91, 'longitude': 0}]},
+                                     format='json').status_code == 400
+    assert authenticated_client.post(url, {'locations': [42]}, format='json').status_code == 400
@@ -0,0 +1,138 @@
+import json
+import math
+import struct
+
+from decimal import Decimal
+
+import msgpack
+import pytest
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from weather_api.columnar import columnar_weather, pack_float32
+from weather_api.renderers import MessagePackRenderer
+
+
+@pytest.fixture
+def authenticated_client():
+    """
+    Fixture to create an authenticated client for testing, it creates a user, obtains their authentication token and
+    configures the client with the token for authentication.
+
+        Returns:
+            APIClient: An authenticated Django REST framework test client.
+    """
+    user = User.objects.create_user(username="testuser", password="testpassword")
+    token, _ = Token.objects.get_or_create(user=user)
+
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+def entry(parameter, dates, **statistics):
+    return {'parameter': parameter,
+            'coordinates': [{'lat': 47.0, 'lon': 28.8, 'dates': [
+                {'date': date, **{name: values[index] for name, values in statistics.items()}}
+                for index, date in enumerate(dates)]}]}
+
+
+def test_columnar_weather_describes_dates_by_start_and_step():
+    """
+    Test case to check that evenly spaced dates become a start and a step, with one array of values per parameter.
+    """
+    dates = ['2024-03-01T00:00:00Z', '2024-03-01T03:00:00Z', '2024-03-01T06:00:00Z']
+    weather_data = {'data': [entry('t_2m:C', dates, value=[1.0, 2.0, None]), entry('uv:idx', dates, value=[0, 1, 2])]}
+
+    assert columnar_weather(weather_data) == {
+        'start': '2024-03-01T00:00:00Z', 'step': 10800, 'count': 3, 'columns': ['t_2m:C', 'uv:idx'],
+        'coordinates': [{'lat': 47.0, 'lon': 28.8, 'values': [[1.0, 2.0, None], [0, 1, 2]]}],
+    }
+    assert columnar_weather(None) is None
+
+
+def test_columnar_weather_lists_uneven_dates_and_daily_statistics():
+    """
+    Test case to check that dates which are not evenly spaced are listed, and that a daily aggregate has one column
+    per statistic.
+    """
+    dates = ['2024-03-30', '2024-03-31', '2024-04-02']
+    weather_data = {'aggregate': 'daily',
+                    'data': [entry('t_2m:C', dates, min=[1, 2, 3], max=[4, 5, 6], mean=[2.5, 3.5, 4.5])]}
+
+    columnar = columnar_weather(weather_data)
+    daily = columnar_weather({'aggregate': 'daily', 'data': [entry('t_2m:C', dates[:2], min=[1, 2], max=[4, 5],
+                                                                   mean=[2.5, 3.5])]})
+
+    assert columnar['step'] is None
+    assert columnar['dates'] == dates
+    assert daily['step'] == 86400
+    assert columnar['columns'] == ['t_2m:C.min', 't_2m:C.max', 't_2m:C.mean']
+    assert columnar['coordinates'][0]['values'] == [[1, 2, 3], [4, 5, 6], [2.5, 3.5, 4.5]]
+
+
+def test_pack_float32_little_endian_with_nan():
+    """
+    Test case to check that values are packed as little-endian float32 with NaN for missing values.
+    """
+    packed = pack_float32([1.5, None, -2.25])
+
+    assert packed[:4] == struct.pack('<f', 1.5)
+    unpacked = struct.unpack('<3f', packed)
+    assert unpacked[0] == 1.5 and math.isnan(unpacked[1]) and unpacked[2] == -2.25
+
+
+def test_messagepack_renderer_round_trip():
+    """
+    Test case to check that the renderer produces standard MessagePack, binary values included, and encodes the types
+    DRF's JSON encoder knows (e.g. Decimal) the same way.
+    """
+    value = {'int': [0, -1, 2 ** 40], 'float': 1.5, 'none': None, 'bool': [True, False], 'bin': b'\x00' * 300,
+             'map': {str(key): key for key in range(20)}}
+    rendered = MessagePackRenderer().render(value)
+
+    assert MessagePackRenderer().render({'compact': True, 'schema': 0}) == bytes.fromhex(
+        '82a7636f6d70616374c3a6736368656d6100')
+    assert msgpack.unpackb(rendered) == value
+    assert msgpack.unpackb(MessagePackRenderer().render({'value': Decimal('1.5')})) == {'value': 1.5}
+
+
+@pytest.mark.django_db
+def test_forcast_weather_view_columnar_json(authenticated_client, upstream_stub):
+    """
+    Test case to check that 'Accept: application/vnd.weather.columnar+json' returns the forecast as a start, a step
+    and a packed array of values, a fraction of the size of the default JSON document.
+    """
+    query = {'location': 'Chisinau', 'days': 1, 'interval': 'PT3H'}
+    url = reverse('forcast-weather')
+    default = authenticated_client.get(url, query)
+    response = authenticated_client.get(url, query, HTTP_ACCEPT='application/vnd.weather.columnar+json')
+
+    assert response.status_code == 200
+    assert response['Content-Type'] == 'application/vnd.weather.columnar+json'
+    columnar = json.loads(response.content)
+    assert (columnar['step'], columnar['count'], columnar['columns']) == (10800, 9, ['t_2m:C'])
+    assert len(columnar['coordinates'][0]['values'][0]) == 9
+    assert len(response.content) < len(default.content) / 2
+    assert response['ETag'] != default['ETag']
+
+
+@pytest.mark.django_db
+def test_search_weather_view_messagepack(authenticated_client, upstream_stub):
+    """
+    Test case to check that 'Accept: application/x-msgpack' returns the columnar weather data as MessagePack, with
+    the values packed as float32.
+    """
+    response = authenticated_client.get(reverse('search-weather'), {'location': 'Chisinau'},
+                                        HTTP_ACCEPT='application/x-msgpack')
+
+    assert response.status_code == 200
+    assert response['Content-Type'] == 'application/x-msgpack'
+    columnar = msgpack.unpackb(response.content)
+    assert columnar['count'] == 1
+    assert len(columnar['coordinates'][0]['values'][0]) == 4
+
+    error = authenticated_client.get(reverse('search-weather'), HTTP_ACCEPT='application/x-msgpack')
+    assert msgpack.unpackb(error.content) == {'error': 'Please provide a location (city name or zip code)'}
@@ -0,0 +1,152 @@
+import pytest
+
+from django.contrib.auth.models import User
+from django.test import AsyncClient
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from weather_api import async_views, views, weather_request
+from weather_api.tests.test_async_weather_views import request
+
+
+@pytest.fixture
+def authenticated_client():
+    """
+    Fixture to create an authenticated client for testing, it creates a user, obtains their authentication token and
+    configures the client with the token for authentication.
+
+        Returns:
+            APIClient: An authenticated Django REST framework test client.
+    """
+    user = User.objects.create_user(username="testuser", password="testpassword")
+    token, _ = Token.objects.get_or_create(user=user)
+
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+def forbid_serialization(monkeypatch, module):
+    """
+    Make serialize_weather_payload of a module fail, for requests that must be answered without serializing.
+    """
+    def serialize(*args, **kwargs):
+        raise AssertionError('the weather data was serialized')
+
+    monkeypatch.setattr(module, 'serialize_weather_payload', serialize)
+
+
+@pytest.mark.django_db
+def test_search_weather_view_revalidated_without_serialization(authenticated_client, upstream_stub, monkeypatch):
+    """
+    Test case to check that a GET search response has an ETag, Last-Modified and headers letting a shared cache
+    store it, and that a request with a matching If-None-Match gets an empty 304 without serializing the data.
+    """
+    url = reverse('search-weather')
+    response = authenticated_client.get(url, {'location': 'Chisinau'})
+
+    assert response.status_code == 200
+    assert response['ETag'].startswith('"')
+    assert response.has_header('Last-Modified')
+    cache_control = response['Cache-Control'].split(', ')
+    assert {'public', 'must-revalidate', 's-maxage=0'} <= set(cache_control)
+    assert 0 < int(next(value for value in cache_control if value.startswith('max-age='))[8:]) <= 600
+    assert response['Vary'] == 'Accept'
+
+    forbid_serialization(monkeypatch, weather_request)
+    not_modified = authenticated_client.get(url, {'location': 'Chisinau'}, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    assert not_modified.status_code == 304
+    assert not_modified.content == b''
+    assert not_modified['ETag'] == response['ETag']
+    assert not_modified['Cache-Control'] == response['Cache-Control']
+    assert upstream_stub.calls['meteomatics'] == 1
+
+
+@pytest.mark.django_db
+def test_etag_differs_per_representation_and_parameters(authenticated_client, upstream_stub):
+    """
+    Test case to check that the ETag changes with the parameters, the forecast aggregation and the response format.
+    """
+    def etag(url, accept='application/json', **query):
+        response = authenticated_client.get(url, {'location': 'Chisinau', **query}, HTTP_ACCEPT=accept)
+        assert response.status_code == 200
+        return response['ETag']
+
+    search, forcast = reverse('search-weather'), reverse('forcast-weather')
+    etags = [
+        etag(search),
+        etag(search, parameters='t_2m:C,t_2m:F'),
+        etag(search, 'application/x-ndjson'),
+        etag(forcast, days=1),
+        etag(forcast, days=1, aggregate='daily'),
+    ]
+
+    assert len(set(etags)) == len(etags)
+    assert etag(search) == etags[0]
+
+
+@pytest.mark.django_db
+def test_streamed_forcast_revalidated(authenticated_client, upstream_stub):
+    """
+    Test case to check that a streamed NDJSON forecast has an ETag and is answered with 304 when it matches.
+    """
+    url = reverse('forcast-weather')
+    query = {'location': 'Chisinau', 'days': 1}
+    response = authenticated_client.get(url, query, HTTP_ACCEPT='application/x-ndjson')
+
+    assert response.streaming
+    not_modified = authenticated_client.get(url, query, HTTP_ACCEPT='application/x-ndjson',
+                                            HTTP_IF_NONE_MATCH=response['ETag'])
+    assert not_modified.status_code == 304
+
+
+@pytest.mark.django_db
+def test_post_responses_not_cacheable(authenticated_client, upstream_stub):
+    """
+    Test case to check that POST responses have no validators and are never answered with 304.
+    """
+    response = authenticated_client.post(reverse('search-weather'), {'location': 'Chisinau'}, format='json')
+
+    assert response.status_code == 200
+    assert not response.has_header('ETag')
+    assert not response.has_header('Cache-Control')
+
+
+@pytest.mark.django_db
+def test_current_weather_view_private(authenticated_client, upstream_stub, monkeypatch):
+    """
+    Test case to check that the current weather, located from the client IP address, may only be cached by the
+    client.
+    """
+    monkeypatch.setattr(views, 'get_user_geolocation',
+                        lambda client_ip: {'latitude': 47.0, 'longitude': 28.8, 'country': 'Moldova'})
+    url = reverse('current-weather')
+    response = authenticated_client.get(url)
+
+    assert response.status_code == 200
+    assert 'private' in response['Cache-Control']
+    assert 'public' not in response['Cache-Control']
+
+    forbid_serialization(monkeypatch, views)
+    assert authenticated_client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code == 304
+
+
+@pytest.mark.django_db
+def test_async_search_weather_view_revalidated(upstream_stub, monkeypatch):
+    """
+    Test case to check that the async search view has its own ETag and answers a matching If-None-Match with 304.
+    """
+    user = User.objects.create_user(username="testuser", password="testpassword")
+    headers = {'Authorization': f'Token {Token.objects.create(user=user).key}'}
+    url = reverse('async-search-weather')
+
+    response = request(AsyncClient(), 'get', url, {'location': 'Chisinau'}, headers=headers)
+    assert response.status_code == 200
+    assert 'public' in response['Cache-Control']
+
+    forbid_serialization(monkeypatch, async_views)
+    not_modified = request(AsyncClient(), 'get', url, {'location': 'Chisinau'},
+                           headers={**headers, 'If-None-Match': response['ETag']})
+    assert not_modified.status_code == 304
@@ -0,0 +1,78 @@
+import psycopg2
+import pytest
+
+from django.db.utils import ConnectionHandler
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from weather_api.metrics import render_metrics
+
+
+@pytest.fixture
+def probe_connection():
+    """
+    Fixture that creates a connection of the weather_api PostgreSQL backend, with a persistent connection and health
+    checks, to a local port nothing listens on.
+
+        Returns:
+            DatabaseWrapper: The connection, not connected.
+    """
+    handler = ConnectionHandler({'default': {'ENGINE': 'django.db.backends.dummy'}, 'probe': {
+        'ENGINE': 'weather_api.db.postgresql',
+        'NAME': 'postgres',
+        'HOST': '127.0.0.1',
+        'PORT': '1',
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {'connect_timeout': 1},
+    }})
+    connection = handler['probe']
+    yield connection
+    connection.connection = None
+
+
+def metric_value(name: str) -> float:
+    for line in render_metrics().splitlines():
+        if line.startswith(name + ' '):
+            return float(line.rsplit(' ', 1)[1])
+    return 0.0
+
+
+def test_failed_connection_counted_and_timed(probe_connection):
+    """
+    Test case to check that the time taken by a connection attempt is recorded in the connection wait histogram
+    and a failed attempt is counted.
+    """
+    waits = metric_value('weather_db_connection_wait_seconds_count{database="probe"}')
+    failures = metric_value('weather_db_connections_total{database="probe",event="failed"}')
+
+    with pytest.raises(psycopg2.OperationalError):
+        probe_connection.connect()
+
+    assert metric_value('weather_db_connection_wait_seconds_count{database="probe"}') == waits + 1
+    assert metric_value('weather_db_connections_total{database="probe",event="failed"}') == failures + 1
+
+
+def test_unusable_connection_counted(probe_connection):
+    """
+    Test case to check that a persistent connection failing its health check is counted as unusable.
+    """
+    class BrokenConnection:
+        def cursor(self):
+            raise psycopg2.InterfaceError('connection already closed')
+
+    unusable = metric_value('weather_db_connections_total{database="probe",event="unusable"}')
+    probe_connection.connection = BrokenConnection()
+
+    assert not probe_connection.is_usable()
+    assert metric_value('weather_db_connections_total{database="probe",event="unusable"}') == unusable + 1
+
+
+def test_metrics_expose_connection_waits():
+    """
+    Test case to check that the /metrics endpoint documents the database connection metrics.
+    """
+    body = APIClient().get(reverse('metrics')).content.decode()
+
+    assert '# TYPE weather_db_connection_wait_seconds histogram' in body
+    assert '# TYPE weather_db_connections_total counter' in body
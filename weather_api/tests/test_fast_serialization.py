@@ -0,0 +1,36 @@
+import json
+from decimal import Decimal
+
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+
+from weather_api.renderers import FastJSONRenderer, NDJSONRenderer
+from weather_api.serializers import WeatherFastSerializer, WeatherSerializer
+
+
+WEATHER_DATA = [
+    {'parameter': 't_2m:C',
+     'coordinates': [{'lat': 47.0, 'lon': 28.8, 'dates': [{'date': '2024-05-01T12:00:00Z', 'value': 21.4},
+                                                          {'date': '2024-05-01T13:00:00Z', 'value': None}]}]},
+    {'parameter': 'uv:idx', 'coordinates': []},
+]
+
+
+def test_fast_serializer_matches_weather_serializer():
+    """
+    Test case to check that the read-only fast path returns the same data as WeatherSerializer.
+    """
+    assert WeatherFastSerializer(WEATHER_DATA[0]).data == WeatherSerializer(WEATHER_DATA[0]).data
+    assert WeatherFastSerializer(WEATHER_DATA, many=True).data == WeatherSerializer(WEATHER_DATA, many=True).data
+
+
+def test_fast_json_renderer_matches_json_renderer():
+    """
+    Test case to check that FastJSONRenderer renders the same document as DRF's JSONRenderer, including values
+    orjson does not support natively, and that NDJSON renders one line.
+    """
+    data = {'data': WEATHER_DATA, 'error': gettext_lazy('Failed'), 'amount': Decimal('1.5'), 'name': 'Chișinău'}
+
+    assert json.loads(FastJSONRenderer().render(data)) == json.loads(JSONRenderer().render(data))
+    assert FastJSONRenderer().render(None) == b''
+    assert NDJSONRenderer().render({'a': 1}) == b'{"a":1}\n'
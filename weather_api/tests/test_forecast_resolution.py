@@ -0,0 +1,95 @@
+import pytest
+import pytz
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from weather_api.forecast import DEFAULT_FORECAST_OPTIONS, ForecastOptions, aggregate_daily, parse_forecast_options
+
+
+@pytest.fixture
+def authenticated_client():
+    """
+    Fixture to create an authenticated client for testing, it creates a user, obtains their authentication token and
+    configures the client with the token for authentication.
+
+        Returns:
+            APIClient: An authenticated Django REST framework test client.
+    """
+    user = User.objects.create_user(username="testuser", password="testpassword")
+    token, _ = Token.objects.get_or_create(user=user)
+
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+def test_parse_forecast_options():
+    """
+    Test case to check the defaults, the validation of 'days', 'interval' and 'aggregate', and that daily
+    aggregation defaults to an hourly upstream step.
+    """
+    assert parse_forecast_options({}) == DEFAULT_FORECAST_OPTIONS
+    assert parse_forecast_options({'days': '3', 'interval': 'pt3h'}) == ForecastOptions(3, 'PT3H', None)
+    assert parse_forecast_options({'aggregate': 'daily'}) == ForecastOptions(7, 'PT1H', 'daily')
+
+    for options in ({'days': 0}, {'days': 'week'}, {'days': 99}, {'interval': 'PT7H'}, {'aggregate': 'weekly'}):
+        with pytest.raises(ValueError):
+            parse_forecast_options(options)
+
+
+def test_aggregate_daily_groups_by_local_day():
+    """
+    Test case to check that values are summarized per local day of the given time zone (not per UTC day), that
+    missing values are ignored and that every parameter and coordinate is aggregated.
+    """
+    dates = ['2024-03-09T21:00:00Z', '2024-03-09T22:00:00Z', '2024-03-10T00:00:00Z', '2024-03-10T12:00:00Z']
+
+    def entry(parameter, values):
+        return {'parameter': parameter,
+                'coordinates': [{'lat': 47.0, 'lon': 28.8,
+                                 'dates': [{'date': date, 'value': value} for date, value in zip(dates, values)]}]}
+
+    weather_data = {'data': [entry('t_2m:C', [1.0, 2.0, 3.0, 10.0]), entry('uv:idx', [0.0, None, 0.0, 4.0])]}
+
+    data = aggregate_daily(weather_data, pytz.timezone('Europe/Chisinau'))['data']
+
+    assert data[0]['coordinates'][0]['dates'] == [
+        {'date': '2024-03-09', 'min': 1.0, 'max': 1.0, 'mean': 1.0},
+        {'date': '2024-03-10', 'min': 2.0, 'max': 10.0, 'mean': 5.0},
+    ]
+    assert data[1]['coordinates'][0]['dates'][1] == {'date': '2024-03-10', 'min': 0.0, 'max': 4.0, 'mean': 2.0}
+
+
+@pytest.mark.django_db
+def test_forcast_weather_view_returns_daily_summaries(authenticated_client, upstream_stub):
+    """
+    Test case to check that 'aggregate=daily' returns one summary per local day of the requested number of days,
+    and that other resolutions are cached separately from it.
+    """
+    url = reverse('forcast-weather')
+
+    response = authenticated_client.get(url, {'location': 'Chisinau', 'days': 3, 'aggregate': 'daily'})
+
+    assert response.status_code == 200
+    dates = response.data['coordinates'][0]['dates']
+    assert len(dates) in (3, 4)
+    assert all(day['min'] <= day['mean'] <= day['max'] for day in dates)
+
+    response = authenticated_client.get(url, {'location': 'Chisinau', 'days': 1, 'interval': 'PT6H'})
+
+    assert response.status_code == 200
+    assert len(response.data['coordinates'][0]['dates']) == 5
+    assert upstream_stub.calls['meteomatics'] == 2
+
+
+@pytest.mark.django_db
+def test_forcast_weather_view_rejects_invalid_options(authenticated_client, upstream_stub):
+    """
+    Test case to check that an unsupported interval is rejected with 400 before any upstream call.
+    """
+    response = authenticated_client.get(reverse('forcast-weather'), {'location': 'Chisinau', 'interval': 'PT7H'})
+
+    assert response.status_code == 400
+    assert sum(upstream_stub.calls.values()) == 0
@@ -0,0 +1,181 @@
+import pytest
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from weather_api.gazetteer import Gazetteer, get_gazetteer
+from weather_api.weather_request import get_geolocation_based_on_input
+
+
+CITIES = [
+    ('618426', 'Chişinău', 'Chisinau', 'Kishinev', '47.00556', '28.8575', 'P', 'PPLC', 'MD', '', '57', '', '', '',
+     '635994'),
+    ('2988507', 'Paris', 'Paris', '', '48.85341', '2.3488', 'P', 'PPLC', 'FR', '', '11', '75', '751', '75056',
+     '2138551'),
+    ('4717560', 'Paris', 'Paris', '', '33.66094', '-95.55551', 'P', 'PPLA2', 'US', '', 'TX', '277', '', '', '24171'),
+    ('2643743', 'London', 'London', 'Londres,Lundun,Paris', '51.50853', '-0.12574', 'P', 'PPLC', 'GB', '', 'ENG',
+     'GLA', '', '', '8961989'),
+    ('6058560', 'London', 'London', '', '42.98339', '-81.23304', 'P', 'PPL', 'CA', '', '08', '', '', '', '346765'),
+    ('2639545', 'Londonderry', 'Londonderry', '', '54.9981', '-7.30934', 'P', 'PPL', 'GB', '', 'NIR', '', '', '',
+     '83652'),
+]
+POSTCODES = [
+    ('DE', '10115', 'Berlin', 'Berlin', 'BE', '', '', '', '', '52.5323', '13.3846', '4'),
+    ('GB', 'SW1A', 'London', 'England', 'ENG', '', '', '', '', '51.5', '-0.1419', '4'),
+    ('FR', '75001', 'Paris 01', 'Ile-de-France', '11', '', '', '', '', '48.8592', '2.3417', '5'),
+    ('US', '75001', 'Addison', 'Texas', 'TX', '', '', '', '', '32.9601', '-96.8385', '4'),
+]
+
+
+@pytest.fixture
+def gazetteer_files(tmp_path, settings):
+    """
+    Fixture writing small GeoNames cities and postal codes dumps and pointing the gazetteer settings at them.
+
+        Returns:
+            tuple: The paths of the cities and postal codes files.
+    """
+    cities_path = tmp_path / 'cities.txt'
+    cities_path.write_text(''.join('\t'.join(row) + '\n' for row in CITIES), encoding='utf-8')
+    postcodes_path = tmp_path / 'postcodes.txt'
+    postcodes_path.write_text(''.join('\t'.join(row) + '\n' for row in POSTCODES), encoding='utf-8')
+
+    settings.GAZETTEER_CITIES_FILE = str(cities_path)
+    settings.GAZETTEER_POSTCODES_FILE = str(postcodes_path)
+    return cities_path, postcodes_path
+
+
+@pytest.fixture
+def authenticated_client():
+    """
+    Fixture to create an authenticated client for testing, it creates a user, obtains their authentication token and
+    configures the client with the token for authentication.
+
+        Returns:
+            APIClient: An authenticated Django REST framework test client.
+    """
+    user = User.objects.create_user(username="testuser", password="testpassword")
+    token, _ = Token.objects.get_or_create(user=user)
+
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+def test_gazetteer_lookup(gazetteer_files):
+    """
+    Test case to check exact name lookups (native and ASCII spelling, most populated place first, narrowed down by a
+    country suffix) and postcode lookups, where a postcode shared by several countries needs the country.
+    """
+    gazetteer = Gazetteer.from_geonames(*gazetteer_files)
+
+    assert gazetteer.lookup('  CHIŞINĂU ') == (47.00556, 28.8575, 'md')
+    assert gazetteer.lookup('chisinau') == (47.00556, 28.8575, 'md')
+    assert gazetteer.lookup('Paris') == (48.85341, 2.3488, 'fr')
+    assert gazetteer.lookup('Paris, US') == (33.66094, -95.55551, 'us')
+    assert gazetteer.lookup('sw1a') == (51.5, -0.1419, 'gb')
+    assert gazetteer.lookup('10115') == (52.5323, 13.3846, 'de')
+    assert gazetteer.lookup('75001') is None
+    assert gazetteer.lookup('75001, fr') == (48.8592, 2.3417, 'fr')
+    assert gazetteer.lookup('Atlantis') is None
+
+
+def test_gazetteer_lookup_alternate_names_and_full_postcodes(gazetteer_files):
+    """
+    Test case to check that alternate names are found, that a place's own name wins over the alternate name of a
+    more populated place, that alternate names stay out of the suggestions, and that full postcodes are found by
+    their outward code.
+    """
+    gazetteer = Gazetteer.from_geonames(*gazetteer_files)
+
+    assert gazetteer.lookup('kishinev') == (47.00556, 28.8575, 'md')
+    assert gazetteer.lookup('Londres') == (51.50853, -0.12574, 'gb')
+    assert gazetteer.lookup('Paris') == (48.85341, 2.3488, 'fr')
+    assert gazetteer.suggest('londr') == []
+    assert gazetteer.lookup('SW1A 1AA') == (51.5, -0.1419, 'gb')
+
+
+def test_gazetteer_suggest_ranks_by_population(gazetteer_files):
+    """
+    Test case to check that suggestions are the places starting with the prefix, most populated first, limited.
+    """
+    gazetteer = Gazetteer.from_geonames(*gazetteer_files, suggest_limit=2)
+
+    assert [(place['name'], place['country']) for place in gazetteer.suggest('lon')] == [('London', 'GB'),
+                                                                                         ('London', 'CA')]
+    assert [place['name'] for place in gazetteer.suggest('LONDON', limit=1)] == ['London']
+    assert [place['name'] for place in gazetteer.suggest('chis')] == ['Chişinău']
+    assert gazetteer.suggest('xyz') == []
+
+
+def test_gazetteer_without_files_is_empty(tmp_path):
+    """
+    Test case to check that missing data files give an empty gazetteer instead of an error.
+    """
+    gazetteer = Gazetteer.from_geonames(tmp_path / 'missing.txt', tmp_path / 'missing.txt.gz')
+
+    assert len(gazetteer) == 0
+    assert gazetteer.lookup('Paris') is None
+
+
+@pytest.mark.django_db
+def test_gazetteer_places_skip_nominatim(upstream_stub, gazetteer_files):
+    """
+    Test case to check that places of the gazetteer are geocoded without calling Nominatim, and other places still
+    are.
+    """
+    assert get_geolocation_based_on_input('Chisinau') == (47.00556, 28.8575, 'md')
+    assert upstream_stub.calls['nominatim'] == 0
+
+    get_geolocation_based_on_input('Atlantis')
+    assert upstream_stub.calls['nominatim'] == 1
+
+
+@pytest.mark.django_db
+def test_location_suggest_view(authenticated_client, gazetteer_files):
+    """
+    Test case to check the autocomplete endpoint results and its validation of the query.
+    """
+    url = reverse('suggest-locations')
+
+    response = authenticated_client.get(url, {'q': 'par', 'limit': 5})
+
+    assert response.status_code == 200
+    assert [place['country'] for place in response.data['results']] == ['FR', 'US']
+    assert response.data['results'][0]['population'] == 2138551
+    assert authenticated_client.get(url).status_code == 400
+    assert authenticated_client.get(url, {'q': 'par', 'limit': 50}).status_code == 400
+    assert APIClient().get(url, {'q': 'par'}).status_code == 401
+
+
+@pytest.mark.django_db
+def test_location_suggest_view_with_shipped_cities(authenticated_client):
+    """
+    Test case to check that the GeoNames cities shipped in data/ are loaded by default and served by the autocomplete
+    endpoint, most populated first.
+    """
+    response = authenticated_client.get(reverse('suggest-locations'), {'q': 'chisin'})
+
+    assert response.status_code == 200
+    assert response.data['results'][0]['name'] == 'Chisinau'
+    assert response.data['results'][0]['country'] == 'MD'
+
+    results = authenticated_client.get(reverse('suggest-locations'), {'q': 'paris'}).data['results']
+    assert (results[0]['name'], results[0]['country']) == ('Paris', 'FR')
+    assert get_gazetteer().lookup('Paris, US')[2] == 'us'
+
+
+def test_shipped_gazetteer_alternate_names_and_postcodes():
+    """
+    Test case to check that the shipped cities are found by their common alternate names and that the shipped US ZIP
+    codes and Canadian postcode areas are resolved offline.
+    """
+    gazetteer = get_gazetteer()
+
+    assert gazetteer.lookup('New York')[2] == 'us'
+    assert gazetteer.lookup('Cologne')[:2] == pytest.approx((50.93, 6.95), abs=0.01)
+    assert gazetteer.lookup('Frankfurt')[:2] == pytest.approx((50.11, 8.68), abs=0.01)
+    assert gazetteer.lookup('10001')[:2] == pytest.approx((40.75, -74.0), abs=0.01)
+    assert gazetteer.lookup('10001-1234') == gazetteer.lookup('10001')
+    assert gazetteer.lookup('M5V 3L9')[2] == 'ca'
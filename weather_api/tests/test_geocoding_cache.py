@@ -0,0 +1,84 @@
+import pytest
+
+from weather_api.geocoding_cache import GeocodingCache, normalize_query
+from weather_api.models import GeocodingCacheEntry
+
+
+@pytest.fixture
+def geocoding_cache():
+    return GeocodingCache(ttl=3600, negative_ttl=60, lru_size=16)
+
+
+@pytest.fixture
+def fake_geocoder():
+    """
+    Fixture with a fake fetch function that records its calls and knows a single location ('Chisinau').
+
+        Returns:
+            function: The fake fetch function, with the list of received queries in its 'calls' attribute.
+    """
+    calls = []
+
+    def fetch(city_or_zip):
+        calls.append(city_or_zip)
+        if normalize_query(city_or_zip) == 'chisinau':
+            return 47.02, 28.83, 'md'
+        return None
+
+    fetch.calls = calls
+    return fetch
+
+
+def test_normalize_query():
+    """
+    Test case to check that spelling variants of the same city name or zip code share one cache key.
+    """
+    assert normalize_query('  New   York ') == normalize_query('new york')
+    assert normalize_query('Paris ,France') == 'paris, france'
+    assert normalize_query('SW1A 1AA') == normalize_query('sw1a-1aa') == 'sw1a1aa'
+
+
+@pytest.mark.django_db
+def test_repeat_lookup_skips_fetch(geocoding_cache, fake_geocoder):
+    """
+    Test case to check that a repeated lookup is answered from the in-process tier and then, once that tier is
+    cleared, from the database tier, without calling the geocoder again.
+    """
+    assert geocoding_cache.get_or_fetch('Chisinau', fake_geocoder) == (47.02, 28.83, 'md')
+    assert geocoding_cache.get_or_fetch(' CHISINAU', fake_geocoder) == (47.02, 28.83, 'md')
+
+    geocoding_cache.lru.clear()
+    assert geocoding_cache.get_or_fetch('chisinau', fake_geocoder) == (47.02, 28.83, 'md')
+
+    assert fake_geocoder.calls == ['Chisinau']
+    assert geocoding_cache.stats() == {'memory_hits': 1, 'database_hits': 1, 'misses': 1, 'hits': 2}
+
+
+@pytest.mark.django_db
+def test_negative_result_is_cached_with_short_ttl(geocoding_cache, fake_geocoder):
+    """
+    Test case to check that a location the geocoder does not know is cached as a negative result with the
+    negative TTL.
+    """
+    assert geocoding_cache.get_or_fetch('Atlantis', fake_geocoder) is None
+    assert geocoding_cache.get_or_fetch('atlantis', fake_geocoder) is None
+
+    assert fake_geocoder.calls == ['Atlantis']
+
+    entry = GeocodingCacheEntry.objects.get(query='atlantis')
+    assert entry.found is False
+    assert (entry.expires_at - entry.updated_at).total_seconds() < 120
+
+
+@pytest.mark.django_db
+def test_fetch_errors_are_not_cached(geocoding_cache):
+    """
+    Test case to check that an exception raised by the geocoder propagates and is not stored as a negative result.
+    """
+    def failing_fetch(city_or_zip):
+        raise ConnectionError('geocoder unavailable')
+
+    with pytest.raises(ConnectionError):
+        geocoding_cache.get_or_fetch('Chisinau', failing_fetch)
+
+    assert not GeocodingCacheEntry.objects.exists()
@@ -0,0 +1,165 @@
+import gzip
+
+import pytest
+from django.contrib.auth.models import User
+from django.test import RequestFactory
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from weather_api.ip_geolocation import IPLocationTable, get_client_ip
+from weather_api.weather_request import get_user_geolocation
+
+
+IP_TABLE = '''"1.0.0.0","1.0.0.255","OC","AU","Queensland","South Brisbane","-27.4748","153.017"
+"5.2.64.0","5.2.95.255","EU","MD","Chisinau","Chisinau","47.0105","28.8638"
+"8.8.8.0","8.8.8.255","NA","US","California","Mountain View","37.422","-122.085"
+"2001:4860::","2001:4860:ffff:ffff:ffff:ffff:ffff:ffff","NA","US","California","Mountain View","37.422","-122.085"
+"not an address","1.1.1.1","NA","US","","","0","0"
+'''
+
+
+@pytest.fixture
+def ip_table_path(tmp_path):
+    """
+    Fixture writing a small gzipped IP range table in the DB-IP "IP to City Lite" CSV format.
+
+        Returns:
+            Path: The path of the table.
+    """
+    path = tmp_path / 'ip-city.csv.gz'
+    with gzip.open(path, 'wt', encoding='utf-8') as file:
+        file.write(IP_TABLE)
+    return path
+
+
+@pytest.fixture
+def authenticated_client():
+    """
+    Fixture to create an authenticated client for testing, it creates a user, obtains their authentication token and
+    configures the client with the token for authentication.
+
+        Returns:
+            APIClient: An authenticated Django REST framework test client.
+    """
+    user = User.objects.create_user(username="testuser", password="testpassword")
+    token, _ = Token.objects.get_or_create(user=user)
+
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+def test_ip_location_table_lookup(ip_table_path):
+    """
+    Test case to check IPv4, IPv6 and IPv4-mapped lookups, range boundaries, misses and that invalid rows and
+    duplicate locations are not kept twice.
+    """
+    table = IPLocationTable.from_csv(ip_table_path)
+
+    assert len(table) == 4
+    assert len(table.locations) == 3
+    assert table.lookup('5.2.64.0') == {'latitude': 47.0105, 'longitude': 28.8638, 'country': 'MD'}
+    assert table.lookup('5.2.95.255')['country'] == 'MD'
+    assert table.lookup('::ffff:8.8.8.8')['country'] == 'US'
+    assert table.lookup('2001:4860:4860::8888')['latitude'] == 37.422
+    assert table.lookup('5.2.96.0') is None
+    assert table.lookup('0.0.0.1') is None
+    assert table.lookup('garbage') is None
+
+
+def test_get_client_ip_only_trusts_forwarded_for_from_trusted_proxies(settings):
+    """
+    Test case to check that X-Forwarded-For is ignored from untrusted peers, and that behind trusted proxies the
+    right-most untrusted hop is the client, so a spoofed left-most entry is not believed.
+    """
+    factory = RequestFactory()
+    settings.IP_GEOLOCATION_TRUSTED_PROXIES = ['10.0.0.0/8']
+
+    direct = factory.get('/', REMOTE_ADDR='5.2.64.1', HTTP_X_FORWARDED_FOR='8.8.8.8')
+    proxied = factory.get('/', REMOTE_ADDR='10.0.0.2', HTTP_X_FORWARDED_FOR='8.8.8.8, 5.2.64.1, 10.0.0.7')
+
+    assert get_client_ip(direct) == '5.2.64.1'
+    assert get_client_ip(proxied) == '5.2.64.1'
+
+
+@pytest.mark.django_db
+def test_current_weather_view_geolocates_the_client(authenticated_client, upstream_stub, ip_table_path, settings):
+    """
+    Test case to check that the current weather is fetched for the location of the client address, without
+    calling an online geolocation service.
+    """
+    settings.IP_GEOLOCATION_DATABASE = str(ip_table_path)
+    settings.IP_GEOLOCATION_FALLBACK = False
+
+    response = authenticated_client.get(reverse('current-weather'), REMOTE_ADDR='5.2.70.1')
+
+    assert response.status_code == 200
+    assert response.data['coordinates'][0]['lat'] == 47.0
+    assert upstream_stub.calls['meteomatics'] == 1
+
+    response = authenticated_client.get(reverse('current-weather'), REMOTE_ADDR='192.0.2.1')
+
+    assert response.status_code == 422
+    assert response.data == {'error': 'Client location unknown'}
+    assert upstream_stub.calls['meteomatics'] == 1
+
+
+def test_bundled_ip_table_locates_public_addresses(settings):
+    """
+    Test case to check that the IP range table shipped with the API is loaded by default and locates public IPv4 and
+    IPv6 addresses, while private addresses stay unknown.
+    """
+    assert get_user_geolocation('77.88.8.8')['country'] == 'RU'
+    assert get_user_geolocation('2001:4860:4860::8888')['country'] == 'US'
+    assert get_user_geolocation('192.168.1.10') is None
+
+
+@pytest.mark.django_db
+def test_forecast_without_location_for_unknown_client(authenticated_client, upstream_stub, settings):
+    """
+    Test case to check that a forecast request without a location from a client missing from the IP table gets a 422
+    response asking for a location instead of an error, and that an unknown location query gets a 404 response.
+    """
+    response = authenticated_client.get(reverse('forcast-weather'), REMOTE_ADDR='10.1.2.3')
+
+    assert response.status_code == 422
+    assert 'location' in response.data['error']
+
+    response = authenticated_client.get(reverse('search-weather'), {'location': 'Atlantis'})
+
+    assert response.status_code == 404
+    assert upstream_stub.calls['meteomatics'] == 0
+
+
+def test_fallback_geolocation_cached_per_address(settings, monkeypatch):
+    """
+    Test case to check that the online fallback is off by default, and that once enabled every address missing from
+    the table is looked up online only once, including the addresses the service cannot locate.
+    """
+    import geocoder
+
+    lookups = []
+
+    class Location:
+        def __init__(self, address):
+            self.ok = address != '1.1.1.1'
+            self.latlng = [47.0, 28.8]
+            self.country = 'MD'
+
+    def ip(address):
+        lookups.append(address)
+        return Location(address)
+
+    monkeypatch.setattr(geocoder, 'ip', ip)
+    settings.IP_GEOLOCATION_DATABASE = ''
+
+    assert get_user_geolocation('8.8.8.8') is None
+    assert lookups == []
+
+    settings.IP_GEOLOCATION_FALLBACK = True
+    for _ in range(3):
+        assert get_user_geolocation('8.8.8.8') == {'latitude': 47.0, 'longitude': 28.8, 'country': 'MD'}
+        assert get_user_geolocation('1.1.1.1') is None
+
+    assert lookups == ['8.8.8.8', '1.1.1.1']
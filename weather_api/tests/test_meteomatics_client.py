@@ -0,0 +1,69 @@
+import pytz
+import pytest
+from django.core.exceptions import ImproperlyConfigured
+
+from weather_api.meteomatics import MeteomaticsClient, get_meteomatics_client
+
+
+class FakeResponse:
+    status_code = 200
+    text = ''
+
+    def json(self):
+        return {'data': []}
+
+
+@pytest.fixture
+def client():
+    return MeteomaticsClient('user', 'secret', base_url='https://meteomatics.test/', connect_timeout=1,
+                             read_timeout=5, pool_size=32, max_retries=3, backoff_factor=0.5)
+
+
+def test_session_is_pooled_and_retried(client):
+    """
+    Test case to check that the client mounts one pooled adapter with bounded retries and pre-encoded credentials.
+    """
+    adapter = client.session.get_adapter('https://meteomatics.test/')
+
+    assert adapter._pool_maxsize == 32
+    assert adapter.max_retries.total == 3
+    assert adapter.max_retries.backoff_factor == 0.5
+    assert client.session.headers['Authorization'] == 'Basic dXNlcjpzZWNyZXQ='
+
+
+def test_requests_reuse_session_with_timeouts(client, monkeypatch):
+    """
+    Test case to check that current and forecast requests go through the shared session, with timeouts and the
+    expected URL layout.
+    """
+    calls = []
+
+    def fake_get(url, timeout):
+        calls.append((url, timeout))
+        return FakeResponse()
+
+    monkeypatch.setattr(client.session, 'get', fake_get)
+
+    assert client.current(47.0, 28.8, pytz.timezone('Europe/Chisinau')) == {'data': []}
+    assert client.forecast(47.0, 28.8, pytz.timezone('Europe/Chisinau')) == {'data': []}
+
+    current_url, forecast_url = (url for url, _ in calls)
+    assert current_url.startswith('https://meteomatics.test/20')
+    assert current_url.endswith('/t_2m:C/47.0,28.8/json')
+    assert '--' in forecast_url
+    assert all(timeout == (1, 5) for _, timeout in calls)
+
+
+def test_client_needs_credentials_from_the_environment(settings):
+    """
+    Test case to check that the shared client is not created without Meteomatics credentials.
+    """
+    settings.METEOMATICS_USERNAME = ''
+    settings.METEOMATICS_PASSWORD = ''
+
+    with pytest.raises(ImproperlyConfigured, match='METEOMATICS_USERNAME'):
+        get_meteomatics_client()
+
+    settings.METEOMATICS_USERNAME = 'user'
+    settings.METEOMATICS_PASSWORD = 'secret'
+    assert get_meteomatics_client().session.headers['Authorization'] == 'Basic dXNlcjpzZWNyZXQ='
@@ -0,0 +1,98 @@
+import json
+
+import pytest
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from weather_api.streaming import iter_weather_records
+
+
+@pytest.fixture
+def authenticated_client():
+    """
+    Fixture to create an authenticated client for testing, it creates a user, obtains their authentication token and
+    configures the client with the token for authentication.
+
+        Returns:
+            APIClient: An authenticated Django REST framework test client.
+    """
+    user = User.objects.create_user(username="testuser", password="testpassword")
+    token, _ = Token.objects.get_or_create(user=user)
+
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+def read_ndjson(response):
+    """
+    Consume a streaming response and return its decoded NDJSON records.
+    """
+    assert response.streaming
+    return [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+
+def test_iter_weather_records_merges_parameters_per_timestamp():
+    """
+    Test case to check that one record is yielded per coordinate and timestamp, holding every parameter.
+    """
+    def entry(parameter, values):
+        return {'parameter': parameter,
+                'coordinates': [{'lat': 1, 'lon': 2, 'dates': [{'date': f'd{index}', 'value': value}
+                                                               for index, value in enumerate(values)]}]}
+
+    records = list(iter_weather_records({'data': [entry('t_2m:C', [1.0, 2.0]), entry('uv:idx', [3.0, 4.0])]}))
+
+    assert records == [
+        {'lat': 1, 'lon': 2, 'date': 'd0', 't_2m:C': 1.0, 'uv:idx': 3.0},
+        {'lat': 1, 'lon': 2, 'date': 'd1', 't_2m:C': 2.0, 'uv:idx': 4.0},
+    ]
+    assert list(iter_weather_records(None)) == []
+
+
+@pytest.mark.django_db
+def test_forcast_weather_view_streams_one_record_per_timestamp(authenticated_client, upstream_stub):
+    """
+    Test case to check that 'Accept: application/x-ndjson' streams the forecast as one JSON record per timestamp.
+    """
+    response = authenticated_client.get(reverse('forcast-weather'),
+                                        {'location': 'Chisinau', 'days': 1, 'interval': 'PT3H'},
+                                        HTTP_ACCEPT='application/x-ndjson')
+
+    assert response.status_code == 200
+    assert response['Content-Type'] == 'application/x-ndjson'
+    records = read_ndjson(response)
+    assert len(records) == 9
+    assert all('t_2m:C' in record and record['date'] for record in records)
+
+
+@pytest.mark.django_db
+def test_batch_weather_view_streams_one_record_per_location(authenticated_client, upstream_stub):
+    """
+    Test case to check that the batch endpoint streams one record per location with its input index, the locations
+    not found and the cached ones before those waiting for an upstream request.
+    """
+    authenticated_client.post(reverse('batch-weather'), {'locations': [{'latitude': 40.71, 'longitude': -74.0}]},
+                              format='json')
+    locations = ['Chisinau', 'Atlantis', {'latitude': 40.71, 'longitude': -74.0}]
+
+    response = authenticated_client.post(reverse('batch-weather'), {'locations': locations}, format='json',
+                                         HTTP_ACCEPT='application/x-ndjson')
+
+    assert response.status_code == 200
+    assert response.streaming
+    assert [(record['index'], record['status']) for record in read_ndjson(response)] == [
+        (1, 'error'), (2, 'ok'), (0, 'ok')]
+
+
+@pytest.mark.django_db
+def test_ndjson_errors_are_rendered_as_one_line(authenticated_client):
+    """
+    Test case to check that non-streamed responses, like validation errors, are rendered as a single NDJSON line.
+    """
+    response = authenticated_client.get(reverse('search-weather'), HTTP_ACCEPT='application/x-ndjson')
+
+    assert response.status_code == 400
+    assert json.loads(response.content) == {'error': 'Please provide a location (city name or zip code)'}
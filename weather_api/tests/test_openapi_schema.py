@@ -0,0 +1,92 @@
+import io
+import json
+
+import pytest
+
+from django.core.management import call_command
+from django.urls import reverse
+
+from weather_api import schema
+from weather_api.schema import SchemaArtifact, artifact_paths, get_schema_artifact, schema_version
+
+
+@pytest.fixture(autouse=True)
+def schema_artifact_dir(settings, tmp_path):
+    """
+    Fixture that writes the schema documents to a temporary directory, which also drops the in-memory schema.
+
+        Returns:
+            Path: The schema artifact directory.
+    """
+    settings.SCHEMA_ARTIFACT_DIR = str(tmp_path)
+    return tmp_path
+
+
+def test_schema_served_with_etag_and_304(client):
+    """
+    Test case to check that the schema document lists the API endpoints, has an ETag and that a request with a
+    matching If-None-Match gets an empty 304 response.
+    """
+    url = reverse('schema-json', kwargs={'format': '.json'})
+    response = client.get(url)
+
+    assert response.status_code == 200
+    assert response['Content-Type'] == 'application/json; charset=utf-8'
+    assert '/api/weather/search/' in json.loads(response.content)['paths']
+    assert 'no-cache' in response['Cache-Control']
+
+    not_modified = client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+    assert not_modified.status_code == 304
+    assert not_modified.content == b''
+
+    yaml_response = client.get(reverse('schema-json', kwargs={'format': '.yaml'}))
+    assert yaml_response.status_code == 200
+    assert yaml_response.content.startswith(b'swagger:')
+    assert yaml_response['ETag'] != response['ETag']
+
+
+def test_schema_generated_once_and_written(client, schema_artifact_dir, monkeypatch):
+    """
+    Test case to check that the schema is generated by the first request only, saved as a versioned artifact and
+    loaded from it by a new process instead of being generated again.
+    """
+    calls = []
+    generate = schema.generate_schema_documents
+    monkeypatch.setattr(schema, 'generate_schema_documents', lambda: calls.append(1) or generate())
+
+    url = reverse('schema-json', kwargs={'format': '.json'})
+    first = client.get(url)
+    client.get(url)
+    assert len(calls) == 1
+    assert all(path.exists() for path in artifact_paths(schema_artifact_dir, schema_version()).values())
+
+    monkeypatch.setattr(schema, '_artifact', None)
+    assert client.get(url)['ETag'] == first['ETag']
+    assert len(calls) == 1
+
+
+def test_generate_schema_command_replaces_old_versions(schema_artifact_dir):
+    """
+    Test case to check that the generate_schema command writes the documents of the current version and removes
+    those of other versions, which the running processes then load.
+    """
+    stale = schema_artifact_dir / 'openapi-0000000000000000.json'
+    stale.write_bytes(b'{}')
+
+    out = io.StringIO()
+    call_command('generate_schema', stdout=out)
+
+    paths = artifact_paths(schema_artifact_dir, schema_version())
+    assert sorted(schema_artifact_dir.iterdir()) == sorted(paths.values())
+    assert out.getvalue().count('Wrote') == 2
+    assert get_schema_artifact().documents == SchemaArtifact.load(schema_artifact_dir, schema_version()).documents
+
+
+def test_swagger_ui_loads_the_served_schema(client):
+    """
+    Test case to check that the Swagger UI page points at the cached schema document.
+    """
+    response = client.get(reverse('schema-swagger-ui'))
+
+    assert response.status_code == 200
+    assert reverse('schema-json', kwargs={'format': '.json'}).encode() in response.content
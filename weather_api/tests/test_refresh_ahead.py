@@ -0,0 +1,176 @@
+import threading
+import time
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from weather_api import refresh_ahead
+from weather_api.refresh_ahead import (PopularityTracker, RefreshAheadWorker, RefreshTarget,
+                                       get_refresh_ahead_worker)
+from weather_api.weather_cache import WeatherCache
+
+
+@pytest.fixture
+def authenticated_client():
+    """
+    Fixture to create an authenticated client for testing, it creates a user, obtains their authentication token and
+    configures the client with the token for authentication.
+
+        Returns:
+            APIClient: An authenticated Django REST framework test client.
+    """
+    user = User.objects.create_user(username="testuser", password="testpassword")
+    token, _ = Token.objects.get_or_create(user=user)
+
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+def test_stale_entry_is_served_while_a_refresh_is_in_flight():
+    """
+    Test case to check that an expired entry is served, without another upstream call, while the refresh of its
+    key is in flight, and that the refreshed entry is served afterwards.
+    """
+    caches['default'].clear()
+    weather_cache = WeatherCache(alias='default', grid_degrees=0.1, time_bucket=3600, ttls={'search': 600},
+                                 lru_size=8, stale_ttl=600)
+    key = weather_cache.make_key('search', 10, 20)
+    expired = ({'data': 'old'}, time.time() - 1)
+    weather_cache.lru.set(key, expired)
+    weather_cache.backend.set(key, expired, 600)
+
+    release = threading.Event()
+    calls = []
+
+    def slow_fetch(latitude, longitude):
+        calls.append((latitude, longitude))
+        release.wait(5)
+        return {'data': 'new'}
+
+    refresh = threading.Thread(target=weather_cache.refresh, args=('search', 10, 20, slow_fetch))
+    refresh.start()
+    while not weather_cache.single_flight.in_flight(key):
+        time.sleep(0.001)
+
+    assert weather_cache.get_or_fetch('search', 10, 20, slow_fetch) == {'data': 'old'}
+    assert weather_cache.stats()['stale_hits'] == 1
+
+    release.set()
+    refresh.join()
+
+    assert weather_cache.get('search', 10, 20) == {'data': 'new'}
+    assert weather_cache.expires_in('search', 10, 20) > 0
+    assert len(calls) == 1
+
+
+@pytest.mark.django_db
+def test_popular_locations_are_refreshed_before_expiry(authenticated_client, upstream_stub, settings):
+    """
+    Test case to check that search requests are tracked, that an entry is refreshed only once it is due, and
+    that a cycle never exceeds its upstream budget.
+    """
+    settings.REFRESH_AHEAD_ENABLED = True
+    settings.REFRESH_AHEAD_FLUSH_INTERVAL = 0
+
+    for _ in range(3):
+        assert authenticated_client.get(reverse('search-weather'), {'location': 'Chisinau'}).status_code == 200
+    assert upstream_stub.calls['meteomatics'] == 1
+
+    worker = get_refresh_ahead_worker()
+    assert [target.endpoint for target in worker.tracker.popular(10)] == ['search']
+    assert worker.run_cycle() == 0
+
+    settings.REFRESH_AHEAD_BUDGET = 0
+    assert get_refresh_ahead_worker().run_cycle() == 0
+
+    settings.REFRESH_AHEAD_BUDGET = 10
+    settings.REFRESH_AHEAD_MARGIN = 10 ** 6
+    assert get_refresh_ahead_worker().run_cycle() == 1
+    assert upstream_stub.calls['meteomatics'] == 2
+
+
+def test_popularity_counts_of_all_processes_add_up_and_decay(monkeypatch):
+    """
+    Test case to check that the counts flushed by several trackers (one per worker process) add up in the backend,
+    and that targets no longer requested lose their rank over the next window and are then forgotten.
+    """
+    now = [36000.0]
+    monkeypatch.setattr(refresh_ahead.time, 'time', lambda: now[0])
+    paris = RefreshTarget('search', 48.9, 2.4, 'fr', ('t_2m:C',))
+    berlin = RefreshTarget('search', 52.5, 13.4, 'de', ('t_2m:C',))
+    trackers = [PopularityTracker('default', window=3600, max_tracked=10, flush_interval=3600) for _ in range(2)]
+
+    for tracker, requests in zip(trackers, ({paris: 2, berlin: 3}, {paris: 2})):
+        for target, count in requests.items():
+            for _ in range(count):
+                tracker.record(target)
+        tracker.flush()
+
+    assert trackers[0].popular(10) == [paris, berlin]
+
+    now[0] += 3600 * 1.5
+    trackers[1].record(berlin)
+    trackers[1].flush()
+    assert trackers[0].popular(10) == [berlin, paris]
+
+    now[0] += 3600
+    assert trackers[0].popular(10) == [berlin]
+    now[0] += 3600
+    assert trackers[0].popular(10) == []
+
+
+def test_refresh_cycles_take_a_cross_process_lease():
+    """
+    Test case to check that only one of the refresh threads of several processes runs the cycle of an interval.
+    """
+    workers = [RefreshAheadWorker(PopularityTracker('default', 3600, 10, 10), interval=60, margin=120, top_n=5,
+                                  concurrency=1, budget=5) for _ in range(3)]
+
+    assert [worker.acquire_lease() for worker in workers] == [True, False, False]
+
+
+def test_refresh_in_another_process_serves_stale_entries(tmp_path, settings):
+    """
+    Test case to check that a refresh running in one process is seen by the weather cache of another process sharing
+    the backend, which serves the expired entry instead of fetching it again.
+    """
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                                   'LOCATION': str(tmp_path)}}
+    refreshing, serving = (WeatherCache(alias='default', grid_degrees=0.1, time_bucket=3600, ttls={'search': 600},
+                                        lru_size=8, stale_ttl=600) for _ in range(2))
+    key = refreshing.make_key('search', 10, 20)
+    refreshing.backend.set(key, ({'data': 'old'}, time.time() - 1), 600)
+
+    def fetch_elsewhere(latitude, longitude):
+        assert serving.get_or_fetch('search', 10, 20, pytest.fail) == {'data': 'old'}
+        return {'data': 'new'}
+
+    assert refreshing.refresh('search', 10, 20, fetch_elsewhere) == {'data': 'new'}
+    assert not serving.refreshing(key)
+    assert serving.get('search', 10, 20) == {'data': 'new'}
+
+
+def test_refresh_ahead_refuses_a_per_process_backend(settings, tmp_path):
+    """
+    Test case to check that the refresh-ahead thread and command do not start on the local-memory backend, where
+    every process would count and refresh on its own, and that the thread starts on a shared backend.
+    """
+    worker = RefreshAheadWorker(PopularityTracker('default', 3600, 10, 10), interval=60, margin=120, top_n=5,
+                                concurrency=1, budget=5)
+
+    with pytest.raises(ImproperlyConfigured):
+        worker.start()
+    with pytest.raises(CommandError, match='shared between processes'):
+        call_command('refresh_ahead', '--once')
+
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                                   'LOCATION': str(tmp_path)}}
+    worker.start()
+    worker.stop()
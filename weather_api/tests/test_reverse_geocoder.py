@@ -0,0 +1,57 @@
+import pytest
+
+from weather_api.reverse_geocoder import get_local_timezone, resolve_country_and_timezone
+
+
+@pytest.mark.parametrize('latitude, longitude, country, expected_timezone', [
+    (40.71, -74.01, 'us', 'America/New_York'),
+    (34.05, -118.24, 'us', 'America/Los_Angeles'),
+    (43.12, 131.89, 'RU', 'Asia/Vladivostok'),
+    (55.76, 37.62, 'ru', 'Europe/Moscow'),
+    (47.02, 28.83, 'md', 'Europe/Chisinau'),
+    (31.76, -106.49, 'us', 'America/Denver'),
+    (33.45, -112.07, 'us', 'America/Phoenix'),
+])
+def test_local_timezone_within_country(latitude, longitude, country, expected_timezone):
+    """
+    Test case to check that the offline resolver picks the zone of the point rather than the first zone of the
+    country, for countries that span several timezones.
+    """
+    assert get_local_timezone(latitude, longitude, country).zone == expected_timezone
+
+
+def test_resolve_country_and_timezone_without_country():
+    """
+    Test case to check that the country code and timezone are resolved from coordinates alone.
+    """
+    assert resolve_country_and_timezone(47.02, 28.83) == ('MD', 'Europe/Chisinau')
+    assert resolve_country_and_timezone(-33.87, 151.21) == ('AU', 'Australia/Sydney')
+    assert resolve_country_and_timezone(64.84, -147.72) == ('US', 'America/Anchorage')
+
+
+@pytest.mark.parametrize('latitude, longitude, expected', [
+    (48.58, 7.75, ('FR', 'Europe/Paris')),
+    (47.70, 8.68, ('DE', 'Europe/Busingen')),
+    (25.77, -80.19, ('US', 'America/New_York')),
+    (31.76, -106.49, ('US', 'America/Denver')),
+    (31.69, -106.42, ('MX', 'America/Ciudad_Juarez')),
+])
+def test_resolve_near_borders(latitude, longitude, expected):
+    """
+    Test case to check that points close to a border or to the principal city of another zone are resolved to the
+    zone whose boundary contains them.
+    """
+    assert resolve_country_and_timezone(latitude, longitude) == expected
+
+
+def test_points_outside_boundaries_use_the_closest_place(settings):
+    """
+    Test case to check that points outside every time zone boundary get the zone of the closest place, restricted to
+    the country when it is known, and that without a boundaries file every point does.
+    """
+    assert resolve_country_and_timezone(0.0, -30.0) == ('BR', 'America/Fortaleza')
+
+    settings.REVERSE_GEOCODER_BOUNDARIES_FILE = ''
+    assert resolve_country_and_timezone(47.02, 28.83) == ('MD', 'Europe/Chisinau')
+    assert get_local_timezone(40.71, -74.01, 'us').zone == 'America/New_York'
+    assert get_local_timezone(40.71, -74.01, 'ca').zone == 'America/Toronto'
@@ -0,0 +1,130 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from weather_api.metrics import render_metrics, server_timing_header
+
+
+@pytest.fixture
+def authenticated_client():
+    """
+    Fixture to create an authenticated client for testing, it creates a user, obtains their authentication token and
+    configures the client with the token for authentication.
+
+        Returns:
+            APIClient: An authenticated Django REST framework test client.
+    """
+    user = User.objects.create_user(username="testuser", password="testpassword")
+    token, _ = Token.objects.get_or_create(user=user)
+
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+def server_timing_stages(response) -> dict:
+    return {
+        entry.split(';')[0]: float(entry.split('dur=')[1])
+        for entry in response['Server-Timing'].split(', ')
+    }
+
+
+def test_server_timing_header_sums_repeated_stages():
+    """
+    Test case to check that the durations of a stage timed several times are summed in the Server-Timing header.
+    """
+    assert server_timing_header([('geocode', 0.002), ('geocode', 0.001)], 0.01) == 'geocode;dur=3.0, total;dur=10.0'
+
+
+def test_metrics_summed_over_worker_processes(tmp_path, monkeypatch):
+    """
+    Test case to check that with PROMETHEUS_MULTIPROC_DIR set, /metrics sums the metrics written by every worker
+    process, cache hit ratios included.
+    """
+    script = (
+        'from weather_api.metrics import CACHE_LOOKUPS, STAGE_DURATION\n'
+        'STAGE_DURATION.labels("meteomatics").observe(0.2)\n'
+        'CACHE_LOOKUPS.labels("weather", "memory_hits").inc()\n'
+        'CACHE_LOOKUPS.labels("weather", "misses").inc()\n'
+    )
+    environment = {**os.environ, 'PROMETHEUS_MULTIPROC_DIR': str(tmp_path), 'PYTHONPATH': os.pathsep.join(sys.path)}
+    for _ in range(2):
+        subprocess.run([sys.executable, '-c', script], env=environment, check=True)
+
+    monkeypatch.setenv('PROMETHEUS_MULTIPROC_DIR', str(tmp_path))
+    body = render_metrics()
+
+    assert 'weather_stage_duration_seconds_count{stage="meteomatics"} 2.0' in body
+    assert 'weather_stage_duration_seconds_bucket{le="0.25",stage="meteomatics"} 2.0' in body
+    assert 'weather_cache_lookups_total{cache="weather",result="misses"} 2.0' in body
+    assert 'weather_cache_hit_ratio{cache="weather"} 0.5' in body
+
+
+@pytest.mark.django_db
+def test_search_response_has_server_timing(authenticated_client, upstream_stub):
+    """
+    Test case to check that a search response reports the time of its stages in the Server-Timing header.
+    """
+    response = authenticated_client.get(reverse('search-weather'), {'location': 'Chisinau'})
+
+    assert response.status_code == 200
+    stages = server_timing_stages(response)
+    assert {'auth', 'geocode', 'nominatim', 'weather', 'reverse_geocode', 'meteomatics', 'serialize', 'render',
+            'total'} <= set(stages)
+    assert stages['weather'] >= stages['meteomatics']
+    assert stages['total'] >= stages['weather']
+
+
+@pytest.mark.django_db
+def test_async_search_response_has_server_timing(authenticated_client, upstream_stub):
+    """
+    Test case to check that the stages of the async views are reported too.
+    """
+    response = authenticated_client.get(reverse('async-search-weather'), {'location': 'Chisinau'})
+
+    assert response.status_code == 200
+    assert {'auth', 'geocode', 'nominatim', 'weather', 'meteomatics', 'total'} <= set(server_timing_stages(response))
+
+
+@pytest.mark.django_db
+def test_server_timing_can_be_disabled(authenticated_client, upstream_stub, settings):
+    """
+    Test case to check that SERVER_TIMING_ENABLED turns the header off.
+    """
+    settings.SERVER_TIMING_ENABLED = False
+
+    response = authenticated_client.get(reverse('search-weather'), {'location': 'Chisinau'})
+
+    assert not response.has_header('Server-Timing')
+
+
+@pytest.mark.django_db
+def test_metrics_endpoint(authenticated_client, upstream_stub, settings):
+    """
+    Test case to check that /metrics exposes stage histograms, cache hit ratios and upstream errors, and that it is
+    only served to the allowed networks.
+    """
+    authenticated_client.get(reverse('search-weather'), {'location': 'Chisinau'})
+    authenticated_client.get(reverse('search-weather'), {'location': 'Chisinau'})
+    upstream_stub.error_rate = 1.0
+    authenticated_client.get(reverse('search-weather'), {'location': 'Tokyo'})
+
+    response = APIClient().get(reverse('metrics'))
+
+    assert response.status_code == 200
+    assert response['Content-Type'].startswith('text/plain; version=0.0.4')
+    body = response.content.decode()
+    assert 'weather_stage_duration_seconds_count{stage="meteomatics"}' in body
+    assert 'weather_request_duration_seconds_count{method="GET",status="200",view="search-weather"}' in body
+    assert 'weather_cache_lookups_total{cache="weather",result="memory_hits"}' in body
+    assert 'weather_cache_hit_ratio{cache="weather"}' in body
+    assert 'weather_upstream_errors_total{upstream="nominatim"}' in body
+
+    settings.METRICS_ALLOWED_NETWORKS = ['10.0.0.0/8']
+    assert APIClient().get(reverse('metrics')).status_code == 403
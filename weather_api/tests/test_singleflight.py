@@ -0,0 +1,196 @@
+import asyncio
+import threading
+import time
+
+from contextlib import contextmanager
+
+import pytest
+
+from asgiref.sync import async_to_sync
+from django.core.cache import caches
+from django.db import connection
+
+from weather_api import singleflight
+from weather_api.singleflight import AsyncSingleFlight, SingleFlight, advisory_lock, coalesce
+from weather_api.weather_cache import WeatherCache
+
+
+def run_concurrently(function, count=8):
+    """
+    Call function() from 'count' threads released at the same moment and return the results.
+    """
+    barrier = threading.Barrier(count)
+    results = [None] * count
+
+    def worker(index):
+        barrier.wait()
+        try:
+            results[index] = function()
+        except Exception as e:
+            results[index] = e
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_callers_share_one_call():
+    """
+    Test case to check that concurrent callers of the same key wait for one execution and share its result.
+    """
+    single_flight = SingleFlight()
+    calls = []
+
+    def slow_fetch():
+        calls.append(1)
+        time.sleep(0.2)
+        return 'weather'
+
+    assert run_concurrently(lambda: single_flight.do('chisinau', slow_fetch)) == ['weather'] * 8
+    assert len(calls) == 1
+    assert not single_flight.in_flight('chisinau')
+
+
+def test_concurrent_callers_share_the_exception():
+    """
+    Test case to check that a failing execution raises the same exception in every waiting caller, and that the
+    next call after it runs again.
+    """
+    single_flight = SingleFlight()
+
+    def failing_fetch():
+        time.sleep(0.2)
+        raise ConnectionError('upstream unavailable')
+
+    results = run_concurrently(lambda: single_flight.do('chisinau', failing_fetch))
+
+    assert all(isinstance(result, ConnectionError) for result in results)
+    assert single_flight.do('chisinau', lambda: 'weather') == 'weather'
+
+
+def test_weather_cache_coalesces_concurrent_misses():
+    """
+    Test case to check that concurrent weather cache misses for points in the same grid cell cause a single
+    upstream call.
+    """
+    caches['default'].clear()
+    weather_cache = WeatherCache(alias='default', grid_degrees=0.1, time_bucket=3600, ttls={}, lru_size=16)
+    calls = []
+
+    def slow_fetch(latitude, longitude):
+        calls.append((latitude, longitude))
+        time.sleep(0.2)
+        return {'data': []}
+
+    results = run_concurrently(lambda: weather_cache.get_or_fetch('search', 47.02, 28.83, slow_fetch))
+
+    assert results == [{'data': []}] * 8
+    assert calls == [(47.0, 28.8)]
+
+
+def test_async_concurrent_callers_share_one_call():
+    """
+    Test case to check that coroutines awaiting the same key on one event loop share one execution.
+    """
+    single_flight = AsyncSingleFlight()
+    calls = []
+
+    async def slow_fetch():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return 'weather'
+
+    async def fetch_all():
+        return await asyncio.gather(*(single_flight.do('chisinau', slow_fetch) for _ in range(8)))
+
+    assert async_to_sync(fetch_all)() == ['weather'] * 8
+    assert len(calls) == 1
+
+
+@pytest.mark.django_db
+def test_coalesce_rechecks_cache_under_advisory_lock(settings):
+    """
+    Test case to check that, with cross-process locking enabled, a fill already done by another worker while this
+    one waited for the lock is served from the cache instead of being fetched again.
+    """
+    settings.SINGLE_FLIGHT_ADVISORY_LOCKS = True
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return 'fetched'
+
+    assert coalesce(SingleFlight(), 'weather:chisinau', lambda: (True, 'cached'), fetch) == 'cached'
+    assert coalesce(SingleFlight(), 'weather:chisinau', lambda: (False, None), fetch) == 'fetched'
+    assert calls == [1]
+
+
+def test_advisory_lock_held_on_its_own_connection(settings, monkeypatch):
+    """
+    Test case to check that the advisory lock is taken in a transaction of a separate connection, released after
+    the block, while the block itself runs on the request connection outside of any transaction.
+    """
+    statements = []
+
+    class LockConnection:
+        def set_autocommit(self, autocommit):
+            statements.append(f'autocommit={autocommit}')
+
+        def cursor(self):
+            return self
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc_info):
+            return False
+
+        def execute(self, sql, params):
+            statements.append(sql)
+
+        def rollback(self):
+            statements.append('rollback')
+
+    settings.SINGLE_FLIGHT_ADVISORY_LOCKS = True
+    monkeypatch.setattr(connection, 'vendor', 'postgresql')
+    monkeypatch.setattr(singleflight, '_lock_connection', LockConnection)
+
+    with advisory_lock('weather:chisinau'):
+        assert statements == ['autocommit=False', 'SELECT pg_advisory_xact_lock(%s)']
+        assert not connection.in_atomic_block
+
+    assert statements[2:] == ['rollback', 'autocommit=True']
+
+
+@pytest.mark.django_db
+def test_weather_cache_locks_only_a_shared_backend(settings, monkeypatch, tmp_path):
+    """
+    Test case to check that a miss of a weather cache kept in process memory is fetched without an advisory lock (no
+    other process could have filled it), that a miss of a shared backend is locked and re-checked, and that the
+    re-check is not counted as a second miss.
+    """
+    locked = []
+
+    @contextmanager
+    def lock(key):
+        locked.append(key)
+        yield
+
+    settings.SINGLE_FLIGHT_ADVISORY_LOCKS = True
+    monkeypatch.setattr(singleflight, 'advisory_lock', lock)
+    weather_cache = WeatherCache(alias='default', grid_degrees=0.1, time_bucket=3600, ttls={}, lru_size=16)
+    weather_cache.backend.clear()
+
+    assert weather_cache.get_or_fetch('search', 47.02, 28.83, lambda latitude, longitude: {'data': []})
+    assert locked == []
+
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                                   'LOCATION': str(tmp_path)}}
+    weather_cache.clear()
+
+    assert weather_cache.get_or_fetch('search', 47.02, 28.83, lambda latitude, longitude: {'data': []})
+    assert len(locked) == 1
+    assert weather_cache.stats()['misses'] == 1
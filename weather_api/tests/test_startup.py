@@ -0,0 +1,43 @@
+import io
+import os
+
+from django.core.management import call_command
+
+from weather_api.startup import DEFERRED_MODULES, profile_startup
+
+
+# Set up Django and load the URLconf in under a second; slower CI machines can raise it with STARTUP_BUDGET_SECONDS.
+STARTUP_BUDGET_SECONDS = float(os.getenv('STARTUP_BUDGET_SECONDS', 1.0))
+
+
+def test_startup_does_not_import_deferred_modules():
+    """
+    Test case to check that starting a worker leaves the heavy geocoding, HTTP, NumPy and schema modules for their
+    first use.
+    """
+    profile = profile_startup(importtime=False)
+
+    assert [module for module in DEFERRED_MODULES if module in profile.modules] == []
+
+
+def test_startup_time_within_budget():
+    """
+    Test case to check that a worker starts within the budget, the best of three runs is kept to ignore noise.
+    """
+    seconds = min(profile_startup(importtime=False).seconds for _ in range(3))
+
+    assert seconds < STARTUP_BUDGET_SECONDS, f'start-up took {seconds:.3f}s, budget {STARTUP_BUDGET_SECONDS}s'
+
+
+def test_profile_imports_command_reports_slowest_modules():
+    """
+    Test case to check that the profile_imports command lists the import times of the start-up modules.
+    """
+    out = io.StringIO()
+    call_command('profile_imports', '--limit', '5', stdout=out)
+
+    lines = out.getvalue().splitlines()
+    assert lines[0].startswith('Start-up took')
+    assert lines[1].split() == ['total', 'ms', 'self', 'ms', 'module']
+    assert len(lines) == 7
+    assert 'Deferred modules' not in out.getvalue()
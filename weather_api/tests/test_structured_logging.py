@@ -0,0 +1,111 @@
+import io
+import json
+import logging
+import os
+
+from weather_api.metrics import render_metrics
+from weather_api.structured_logging import BackgroundQueueHandler, JSONFormatter, SamplingFilter
+
+
+def dropped_records() -> float:
+    for line in render_metrics().splitlines():
+        if line.startswith('weather_log_records_dropped_total '):
+            return float(line.rsplit(' ', 1)[1])
+    return 0.0
+
+
+def make_record(level=logging.INFO, message='Geocoding %s', args=('Chisinau',), exc_info=None, **extra):
+    record = logging.LogRecord('weather_api.test', level, __file__, 1, message, args, exc_info)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_formatter_writes_extra_fields_and_exceptions():
+    """
+    Test case to check that a record is formatted as one JSON object with its 'extra' fields and traceback.
+    """
+    try:
+        raise ValueError('boom')
+    except ValueError as e:
+        record = make_record(logging.ERROR, exc_info=(type(e), e, e.__traceback__), query='Chisinau', latitude=47.0)
+
+    entry = json.loads(JSONFormatter().format(record))
+
+    assert entry['level'] == 'ERROR'
+    assert entry['logger'] == 'weather_api.test'
+    assert entry['message'] == 'Geocoding Chisinau'
+    assert entry['query'] == 'Chisinau'
+    assert entry['latitude'] == 47.0
+    assert 'ValueError: boom' in entry['exception']
+
+
+def test_sampling_filter_only_samples_debug_records():
+    """
+    Test case to check that debug records are sampled and records of higher levels always pass.
+    """
+    drop_all = SamplingFilter(rate=0)
+    keep_all = SamplingFilter(rate=1)
+
+    assert not drop_all.filter(make_record(logging.DEBUG))
+    assert drop_all.filter(make_record(logging.INFO))
+    assert keep_all.filter(make_record(logging.DEBUG))
+    assert SamplingFilter(rate=0, level='info').filter(make_record(logging.WARNING))
+
+
+def test_background_queue_handler_writes_from_the_listener_thread():
+    """
+    Test case to check that records are written by the listener, formatted as JSON, after the arguments were
+    merged on the logging thread.
+    """
+    stream = io.StringIO()
+    handler = BackgroundQueueHandler(stream=stream)
+    handler.handle(make_record(query='Chisinau'))
+    handler.handle(make_record(logging.WARNING, 'Upstream error', ()))
+    handler.close()
+
+    entries = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [(entry['level'], entry['message']) for entry in entries] == [('INFO', 'Geocoding Chisinau'),
+                                                                        ('WARNING', 'Upstream error')]
+    assert entries[0]['query'] == 'Chisinau'
+
+
+def test_background_queue_handler_drops_records_when_the_queue_is_full():
+    """
+    Test case to check that logging never waits for a full queue, the records that do not fit are dropped and
+    counted on the /metrics endpoint.
+    """
+    stream = io.StringIO()
+    handler = BackgroundQueueHandler(stream=stream, queue_size=1)
+    handler.listener.stop()
+    dropped = dropped_records()
+
+    for _ in range(3):
+        handler.handle(make_record())
+
+    assert handler.dropped == 2
+    assert dropped_records() == dropped + 2
+    assert handler.queue.qsize() == 1
+    handler.close()
+
+
+def test_background_queue_handler_restarts_its_listener_after_fork():
+    """
+    Test case to check that a forked child writes its records with a listener thread of its own.
+    """
+    read_end, write_end = os.pipe()
+    handler = BackgroundQueueHandler(stream=io.StringIO())
+
+    pid = os.fork()
+    if pid == 0:
+        stream = io.StringIO()
+        handler.stream_handler.setStream(stream)
+        handler.handle(make_record())
+        handler.stop()
+        os.write(write_end, stream.getvalue().encode())
+        os._exit(0)
+
+    os.close(write_end)
+    os.waitpid(pid, 0)
+    with os.fdopen(read_end) as pipe:
+        assert json.loads(pipe.read())['message'] == 'Geocoding Chisinau'
+    handler.close()
@@ -0,0 +1,118 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from weather_api.models import WeatherObservation
+from weather_api.observations import get_observation_archiver
+from weather_api.tests.stub_servers import stub_parameter_value
+from weather_api.tile_cache import GridTile, get_tile_cache
+from weather_api.weather_request import get_weather
+
+
+@pytest.fixture
+def tiles(settings, upstream_stub):
+    """
+    Fixture that enables the tile cache with 1 degree tiles sampled every 0.1 degree, fetched from the upstream
+    stand-ins.
+
+        Returns:
+            StubUpstreamServer: The running stub server, with per-upstream call counters in 'calls'.
+    """
+    settings.WEATHER_TILES_ENABLED = True
+    settings.WEATHER_TILE_DEGREES = 1.0
+    settings.WEATHER_TILE_RESOLUTION = 0.1
+    settings.WEATHER_TILE_REGIONS = []
+    settings.WEATHER_TILE_CACHE_SIZE = 4
+    return upstream_stub
+
+
+def test_bilinear_interpolation_of_a_linear_field():
+    """
+    Test case to check that a field varying linearly with latitude and longitude is interpolated exactly between
+    the grid points, and that a missing grid point is left out of the interpolation.
+    """
+    latitudes, longitudes = np.meshgrid(np.arange(3) * 0.5 + 10, np.arange(3) * 0.5 + 20, indexing='ij')
+    field = 2 * latitudes + 4 * longitudes
+    tile = GridTile(10.0, 20.0, 0.5, {'t_2m:C': field.copy()}, '2024-03-01T12:00:00Z', None)
+
+    assert tile.interpolate(10.25, 20.75) == {'t_2m:C': 2 * 10.25 + 4 * 20.75}
+    assert tile.interpolate(11.0, 21.0) == {'t_2m:C': 2 * 11.0 + 4 * 21.0}
+
+    field[0, 1] = np.nan
+    tile.values['t_2m:C'] = field
+    assert tile.interpolate(10.25, 20.5) == {'t_2m:C': 2 * 10.5 + 4 * 20.5}
+    assert tile.interpolate(10.0, 20.5) == {'t_2m:C': round((field[0, 2] + field[1, 1] + field[1, 2]) / 3, 1)}
+
+
+def test_grid_tile_from_response_places_points():
+    """
+    Test case to check that the points of a Meteomatics grid response are placed on the rows and columns of the tile.
+    """
+    response = {'dateGenerated': '2024-03-01T11:58:00Z', 'data': [{'parameter': 't_2m:C', 'coordinates': [
+        {'lat': 47.0, 'lon': 28.0, 'dates': [{'date': '2024-03-01T12:00:00Z', 'value': 1.0}]},
+        {'lat': 47.5, 'lon': 28.5, 'dates': [{'date': '2024-03-01T12:00:00Z', 'value': 4.0}]},
+    ]}]}
+
+    tile = GridTile.from_response(response, 47.0, 28.0, 0.5, 2, 2)
+
+    assert tile.values['t_2m:C'][0, 0] == 1.0 and tile.values['t_2m:C'][1, 1] == 4.0
+    assert tile.interpolate(47.25, 28.25) == {'t_2m:C': 2.5}
+    assert tile.point_response(47.25, 28.25)['data'][0]['coordinates'][0]['dates'] == [
+        {'date': '2024-03-01T12:00:00Z', 'value': 2.5}]
+    assert GridTile.from_response(None, 47.0, 28.0, 0.5, 2, 2) is None
+
+
+@pytest.mark.django_db(transaction=True)
+def test_points_in_one_tile_share_one_upstream_call(tiles, settings):
+    """
+    Test case to check that the current weather of points in different weather cache cells of the same tile is
+    interpolated from one grid request, close to the value of a direct point request, and is not archived.
+    """
+    settings.OBSERVATION_ARCHIVE_ENABLED = True
+    points = [(47.02, 28.83), (47.51, 28.21), (47.93, 28.91)]
+    for latitude, longitude in points:
+        weather_data = get_weather('search', latitude, longitude, 'md')
+        value = weather_data['data'][0]['coordinates'][0]['dates'][0]['value']
+        moment = datetime.fromisoformat(weather_data['data'][0]['coordinates'][0]['dates'][0]['date'])
+        latitude, longitude = round(latitude, 1), round(longitude, 1)
+        assert value == pytest.approx(stub_parameter_value('t_2m:C', latitude, longitude, moment), abs=0.15)
+
+    assert tiles.calls['meteomatics'] == 1
+    assert get_tile_cache().stats() == {'memory_hits': 2, 'misses': 1, 'hits': 2}
+    get_observation_archiver().flush()
+    assert not WeatherObservation.objects.exists()
+
+
+def test_tiles_are_not_served_longer_than_the_current_weather(tiles, settings):
+    """
+    Test case to check that a tile is refetched once the current weather interpolated from it expires, even when the
+    upstream model time bucket is longer.
+    """
+    settings.WEATHER_CACHE_TIME_BUCKET = 3600
+    settings.WEATHER_CACHE_TTL = {'current': 600, 'search': 900, 'forcast': 3600}
+
+    assert get_tile_cache().time_bucket == 600
+
+
+@pytest.mark.django_db
+def test_points_outside_regions_requested_directly(tiles, settings):
+    """
+    Test case to check that locations outside WEATHER_TILE_REGIONS are requested point by point.
+    """
+    settings.WEATHER_TILE_REGIONS = [(46.0, 28.0, 48.0, 30.0)]
+
+    get_weather('search', 47.02, 28.83, 'md')
+    get_weather('search', 47.51, 28.21, 'md')
+    get_weather('search', 51.5, -0.12, 'gb')
+    get_weather('search', 51.9, -0.52, 'gb')
+
+    assert tiles.calls['meteomatics'] == 3
+    assert get_tile_cache().stats()['misses'] == 1
+
+
+def test_tile_cache_disabled_by_default():
+    """
+    Test case to check that no tile cache is used unless WEATHER_TILES_ENABLED is set.
+    """
+    assert get_tile_cache() is None
@@ -0,0 +1,72 @@
+import pytest
+
+from django.core.cache import caches
+
+from weather_api.weather_cache import WeatherCache
+
+
+@pytest.fixture
+def weather_cache():
+    caches['default'].clear()
+    return WeatherCache(alias='default', grid_degrees=0.1, time_bucket=3600,
+                        ttls={'current': 600, 'forcast': 3600}, lru_size=2)
+
+
+@pytest.fixture
+def fake_upstream():
+    """
+    Fixture with a fake fetch function that records the (snapped) coordinates it is called with.
+
+        Returns:
+            function: The fake fetch function, with the list of received coordinates in its 'calls' attribute.
+    """
+    calls = []
+
+    def fetch(latitude, longitude):
+        calls.append((latitude, longitude))
+        return {'data': [{'parameter': 't_2m:C', 'coordinates': [{'lat': latitude, 'lon': longitude}]}]}
+
+    fetch.calls = calls
+    return fetch
+
+
+def test_points_in_same_cell_share_one_fetch(weather_cache, fake_upstream):
+    """
+    Test case to check that two points inside the same grid cell are served by a single upstream call made with
+    the snapped coordinates, while a point in another cell or another endpoint gets its own call.
+    """
+    first = weather_cache.get_or_fetch('current', 47.0213, 28.8321, fake_upstream)
+    second = weather_cache.get_or_fetch('current', 46.9876, 28.8499, fake_upstream)
+    weather_cache.get_or_fetch('current', 47.2, 28.8, fake_upstream)
+    weather_cache.get_or_fetch('forcast', 47.0213, 28.8321, fake_upstream)
+
+    assert first == second
+    assert fake_upstream.calls == [(47.0, 28.8), (47.2, 28.8), (47.0, 28.8)]
+    assert weather_cache.stats()['hits'] == 1
+
+
+def test_shared_tier_serves_after_lru_eviction(weather_cache, fake_upstream):
+    """
+    Test case to check that entries evicted from the size-bounded in-process tier are still served from the
+    Django cache backend.
+    """
+    for latitude in (10, 20, 30):
+        weather_cache.get_or_fetch('current', latitude, 0, fake_upstream)
+
+    assert len(weather_cache.lru) == 2
+
+    weather_cache.get_or_fetch('current', 10, 0, fake_upstream)
+
+    assert len(fake_upstream.calls) == 3
+    assert weather_cache.stats()['shared_hits'] == 1
+
+
+def test_failed_fetch_is_not_cached(weather_cache, fake_upstream):
+    """
+    Test case to check that an empty upstream result is not cached.
+    """
+    assert weather_cache.get_or_fetch('current', 10, 0, lambda latitude, longitude: None) is None
+
+    weather_cache.get_or_fetch('current', 10, 0, fake_upstream)
+
+    assert fake_upstream.calls == [(10.0, 0.0)]
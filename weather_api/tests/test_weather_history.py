@@ -0,0 +1,174 @@
+import threading
+import time
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from weather_api import observations
+from weather_api.models import WeatherObservation
+from weather_api.observations import (ObservationArchiver, archive_weather_data, get_observation_archiver,
+                                      observations_from_response, query_observations, write_observations)
+
+
+START = datetime(2024, 5, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def authenticated_client():
+    """
+    Fixture to create an authenticated client for testing, it creates a user, obtains their authentication token and
+    configures the client with the token for authentication.
+
+        Returns:
+            APIClient: An authenticated Django REST framework test client.
+    """
+    user = User.objects.create_user(username="testuser", password="testpassword")
+    token, _ = Token.objects.get_or_create(user=user)
+
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+def hourly_response(values, latitude=47.02, longitude=28.83):
+    """
+    Build a Meteomatics response with one hourly 't_2m:C' value per item of values, starting at START.
+    """
+    return {'data': [{'parameter': 't_2m:C', 'coordinates': [{
+        'lat': latitude, 'lon': longitude,
+        'dates': [{'date': (START + timedelta(hours=hour)).strftime('%Y-%m-%dT%H:%M:%SZ'), 'value': value}
+                  for hour, value in enumerate(values)],
+    }]}]}
+
+
+@pytest.mark.django_db
+def test_archive_weather_data_upserts_in_batches(settings):
+    """
+    Test case to check that archived values are written in batches, keyed on the quantized location, and that a
+    later fetch of the same reading overwrites it instead of duplicating it.
+    """
+    settings.OBSERVATION_ARCHIVE_BATCH_SIZE = 7
+
+    assert write_observations(observations_from_response(hourly_response([float(hour) for hour in range(48)]))) == 48
+    assert write_observations(observations_from_response(hourly_response([100.0], latitude=47.0, longitude=28.8))) == 1
+
+    assert WeatherObservation.objects.count() == 48
+    assert query_observations(47.01, 28.79, 't_2m:C', START, START + timedelta(hours=2)) == [
+        {'date': '2024-05-01T00:00:00Z', 'value': 100.0},
+        {'date': '2024-05-01T01:00:00Z', 'value': 1.0},
+    ]
+
+
+@pytest.mark.django_db
+def test_query_observations_downsamples_per_day():
+    """
+    Test case to check that the database summarizes the readings per day.
+    """
+    write_observations(observations_from_response(hourly_response([float(hour) for hour in range(48)])))
+
+    assert query_observations(47.0, 28.8, 't_2m:C', START, START + timedelta(days=2), 'day') == [
+        {'date': '2024-05-01T00:00:00Z', 'min': 0.0, 'max': 23.0, 'mean': 11.5},
+        {'date': '2024-05-02T00:00:00Z', 'min': 24.0, 'max': 47.0, 'mean': 35.5},
+    ]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_history_view_serves_fetched_forecasts_from_the_archive(authenticated_client, upstream_stub, settings):
+    """
+    Test case to check that values fetched by the forcast endpoint are archived in the background as forecasts and
+    served by the history endpoint without any further upstream weather request, apart from the current values.
+    """
+    settings.OBSERVATION_ARCHIVE_ENABLED = True
+    authenticated_client.get(reverse('forcast-weather'), {'location': 'Chisinau', 'days': 1})
+    assert upstream_stub.calls['meteomatics'] == 1
+    get_observation_archiver().flush()
+
+    now = datetime.now(timezone.utc)
+    query = {'location': 'Chisinau', 'start': now.isoformat(), 'end': (now + timedelta(days=2)).isoformat(),
+             'resolution': 'hour'}
+    response = authenticated_client.get(reverse('history-weather'), {**query, 'kind': 'forecast'})
+
+    assert response.status_code == 200
+    assert response.data['parameter'] == 't_2m:C'
+    assert len(response.data['coordinates'][0]['dates']) >= 24
+    assert upstream_stub.calls['meteomatics'] == 1
+
+    response = authenticated_client.get(reverse('history-weather'), query)
+    assert response.data['coordinates'][0]['dates'] == []
+
+
+@pytest.mark.django_db(transaction=True)
+def test_archive_keeps_current_values_and_forecasts_apart():
+    """
+    Test case to check that archiving only queues the response, written by the background thread, and that a
+    forecast does not overwrite the current value of the same time.
+    """
+    assert archive_weather_data(hourly_response([1.0]))
+    assert archive_weather_data(hourly_response([2.0]), WeatherObservation.FORECAST)
+    get_observation_archiver().flush()
+
+    end = START + timedelta(hours=1)
+    assert query_observations(47.0, 28.8, 't_2m:C', START, end) == [{'date': '2024-05-01T00:00:00Z', 'value': 1.0}]
+    assert query_observations(47.0, 28.8, 't_2m:C', START, end, kind=WeatherObservation.FORECAST) == [
+        {'date': '2024-05-01T00:00:00Z', 'value': 2.0}]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_archiver_drops_responses_when_the_queue_is_full(monkeypatch):
+    """
+    Test case to check that a request never waits for a busy archive thread: once the queue is full the response is
+    dropped and counted.
+    """
+    release = threading.Event()
+    written = []
+
+    def slow_write(observations):
+        release.wait(5)
+        written.append(len(observations))
+        return len(observations)
+
+    monkeypatch.setattr(observations, 'write_observations', slow_write)
+    monkeypatch.setattr(observations, 'quantize_location', lambda latitude, longitude: (latitude, longitude))
+    archiver = ObservationArchiver(queue_size=1, batch_size=100)
+
+    assert archiver.submit(hourly_response([1.0]))
+    while archiver._queue.qsize():
+        time.sleep(0.001)
+    assert archiver.submit(hourly_response([2.0]))
+    assert not archiver.submit(hourly_response([3.0]))
+    assert archiver.dropped == 1
+
+    release.set()
+    archiver.stop()
+    assert written == [1, 1]
+
+
+@pytest.mark.django_db
+def test_history_view_validates_the_query(authenticated_client):
+    """
+    Test case to check that a query without a location, or with an inverted time range, is rejected with 400.
+    """
+    url = reverse('history-weather')
+
+    assert authenticated_client.get(url, {'start': START.isoformat()}).status_code == 400
+    assert authenticated_client.get(url, {'latitude': 1, 'longitude': 2, 'start': START.isoformat(),
+                                          'end': (START - timedelta(days=1)).isoformat()}).status_code == 400
+
+
+@pytest.mark.django_db
+def test_history_view_does_not_offer_columnar_formats(authenticated_client):
+    """
+    Test case to check that the history endpoint, which only serves JSON records and NDJSON, answers a request for
+    the columnar or MessagePack formats with 406 instead of rendering the records in another layout.
+    """
+    query = {'latitude': 1, 'longitude': 2, 'start': START.isoformat()}
+    url = reverse('history-weather')
+
+    assert authenticated_client.get(url, query, HTTP_ACCEPT='application/x-msgpack').status_code == 406
+    assert authenticated_client.get(
+        url, query, HTTP_ACCEPT='application/vnd.weather.columnar+json').status_code == 406
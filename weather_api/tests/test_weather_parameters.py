@@ -0,0 +1,160 @@
+import pytest
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from weather_api.parameters import (DEFAULT_PARAMETERS, apply_parameters, cache_variant, parse_parameters,
+                                    upstream_parameters_for)
+from weather_api.serializers import WeatherBatchInputSerializer
+
+
+@pytest.fixture
+def authenticated_client():
+    """
+    Fixture to create an authenticated client for testing, it creates a user, obtains their authentication token and
+    configures the client with the token for authentication.
+
+        Returns:
+            APIClient: An authenticated Django REST framework test client.
+    """
+    user = User.objects.create_user(username="testuser", password="testpassword")
+    token, _ = Token.objects.get_or_create(user=user)
+
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+def test_parse_parameters_validates_against_the_allow_list():
+    """
+    Test case to check that parameters are parsed from strings and lists, deduplicated in request order, default to
+    the temperature, and that unknown parameters are rejected.
+    """
+    assert parse_parameters(None) == DEFAULT_PARAMETERS
+    assert parse_parameters('') == DEFAULT_PARAMETERS
+    assert parse_parameters(' t_2m:F , uv:idx,t_2m:F') == ('t_2m:F', 'uv:idx')
+    assert parse_parameters(['precip_1h:mm', 't_2m:C']) == ('precip_1h:mm', 't_2m:C')
+
+    with pytest.raises(ValueError, match='t_2m:K'):
+        parse_parameters('t_2m:C,t_2m:K')
+    for value in (5, 0, False, {'t_2m:C': 1}):
+        with pytest.raises(ValueError, match='comma-separated string or a list'):
+            parse_parameters(value)
+
+
+def test_upstream_parameters_and_cache_variant():
+    """
+    Test case to check that derived parameters are replaced by their upstream dependencies without duplicates, and
+    that the default parameters share the cache variant of requests without parameters, and the same parameters in
+    any order share one variant.
+    """
+    assert upstream_parameters_for(('t_2m:F', 'feels_like:C', 'uv:idx')) == (
+        't_2m:C', 'relative_humidity_2m:p', 'wind_speed_10m:ms', 'uv:idx')
+    assert cache_variant(DEFAULT_PARAMETERS) == ''
+    assert cache_variant(('t_2m:C', 'uv:idx')) == 't_2m:C,uv:idx'
+    assert cache_variant(('uv:idx', 't_2m:C')) == 't_2m:C,uv:idx'
+
+
+def test_apply_parameters_derives_values_per_date():
+    """
+    Test case to check that derived parameters are computed per coordinate and date and that only the requested
+    parameters are kept, in request order.
+    """
+    def entry(parameter, value):
+        return {'parameter': parameter,
+                'coordinates': [{'lat': 1, 'lon': 2, 'dates': [{'date': 'd', 'value': value}]}]}
+
+    weather_data = {'data': [entry('t_2m:C', 20.0), entry('relative_humidity_2m:p', 50.0),
+                             entry('wind_speed_10m:ms', 2.0)]}
+
+    data = apply_parameters(weather_data, ('feels_like:C', 't_2m:F'))['data']
+
+    assert [item['parameter'] for item in data] == ['feels_like:C', 't_2m:F']
+    assert data[0]['coordinates'][0]['dates'][0]['value'] == 18.4
+    assert data[1]['coordinates'][0]['dates'][0]['value'] == 68.0
+
+
+def test_apply_parameters_skips_missing_parameters_and_values():
+    """
+    Test case to check that parameters missing from the upstream response are left out instead of failing, that the
+    -999 missing value sentinel is returned as None and never used in a derived value, and that applying the
+    parameters again to a cached response only restores the request order.
+    """
+    def entry(parameter, *values):
+        return {'parameter': parameter,
+                'coordinates': [{'lat': 1, 'lon': 2, 'dates': [{'date': f'd{index}', 'value': value}
+                                                               for index, value in enumerate(values)]}]}
+
+    weather_data = {'data': [entry('t_2m:C', 20.0, -999), entry('uv:idx', -999, 3)]}
+
+    data = apply_parameters(weather_data, ('t_2m:F', 'wind_speed_10m:ms', 'feels_like:C', 'uv:idx'))['data']
+
+    assert [item['parameter'] for item in data] == ['t_2m:F', 'uv:idx']
+    assert [date['value'] for date in data[0]['coordinates'][0]['dates']] == [68.0, None]
+    assert [date['value'] for date in data[1]['coordinates'][0]['dates']] == [None, 3]
+    assert weather_data['data'][1]['coordinates'][0]['dates'][0]['value'] == -999
+
+    reordered = apply_parameters({'data': data}, ('uv:idx', 't_2m:F'))['data']
+    assert [item['parameter'] for item in reordered] == ['uv:idx', 't_2m:F']
+
+
+@pytest.mark.django_db
+def test_search_weather_view_fetches_all_parameters_in_one_request(authenticated_client, upstream_stub):
+    """
+    Test case to check that several parameters, derived ones included, are answered with a single upstream request
+    and returned together in a 'data' list.
+    """
+    response = authenticated_client.get(reverse('search-weather'),
+                                        {'location': 'Chisinau', 'parameters': 't_2m:C,t_2m:F,feels_like:C'})
+
+    assert response.status_code == 200
+    assert [item['parameter'] for item in response.data['data']] == ['t_2m:C', 't_2m:F', 'feels_like:C']
+    celsius = response.data['data'][0]['coordinates'][0]['dates'][0]['value']
+    fahrenheit = response.data['data'][1]['coordinates'][0]['dates'][0]['value']
+    assert fahrenheit == round(celsius * 9 / 5 + 32, 1)
+    assert upstream_stub.calls['meteomatics'] == 1
+
+
+@pytest.mark.django_db
+def test_search_weather_view_rejects_unknown_parameters(authenticated_client, upstream_stub):
+    """
+    Test case to check that a parameter outside the allow-list is rejected with 400 before any upstream call.
+    """
+    response = authenticated_client.get(reverse('search-weather'), {'location': 'Chisinau', 'parameters': 'foo:x'})
+
+    assert response.status_code == 400
+    assert 'foo:x' in response.data['error']
+    assert sum(upstream_stub.calls.values()) == 0
+
+
+@pytest.mark.django_db
+def test_batch_weather_view_rejects_parameters_of_the_wrong_type(authenticated_client, upstream_stub):
+    """
+    Test case to check that batch 'parameters' which are neither a string nor a list are rejected with 400.
+    """
+    assert not WeatherBatchInputSerializer(data={'locations': ['Paris'], 'parameters': 5}).is_valid()
+
+    response = authenticated_client.post(reverse('batch-weather'), {'locations': ['Paris'], 'parameters': 5},
+                                         format='json')
+
+    assert response.status_code == 400
+    assert sum(upstream_stub.calls.values()) == 0
+
+
+@pytest.mark.django_db
+def test_batch_weather_view_returns_every_parameter_per_location(authenticated_client, upstream_stub):
+    """
+    Test case to check that a batch with several parameters returns a 'data' list per location from a single
+    multi-coordinate, multi-parameter upstream request.
+    """
+    locations = [{'latitude': 10, 'longitude': 10}, {'latitude': 20, 'longitude': 20}]
+
+    response = authenticated_client.post(reverse('batch-weather'),
+                                         {'locations': locations, 'parameters': ['t_2m:C', 'uv:idx']}, format='json')
+
+    assert response.status_code == 200
+    for result in response.data['results']:
+        assert [item['parameter'] for item in result['data']] == ['t_2m:C', 'uv:idx']
+        assert len(result['data'][0]['coordinates']) == 1
+    assert upstream_stub.calls['meteomatics'] == 1
@@ -0,0 +1,262 @@
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .lru_cache import LRUCache
+from .metrics import CACHE_LOOKUPS
+from .meteomatics import get_meteomatics_client
+from .singleflight import SingleFlight
+
+
+class GridTile:
+    """
+    The current values of weather parameters on a regular latitude/longitude grid, held as NumPy arrays, from which
+    the value at any point inside the grid is interpolated bilinearly between the four surrounding grid points.
+
+        Attributes:
+            south (float): The latitude of the southernmost row of the grid.
+            west (float): The longitude of the westernmost column of the grid.
+            resolution (float): The spacing of the grid points in degrees.
+            values (dict): A mapping of parameters to (rows, columns) arrays, from south to north and west to east,
+             NaN where the upstream response has no value.
+            date (str): The valid time of the values.
+            generated (str): The upstream 'dateGenerated' of the grid.
+
+        Methods:
+            from_response(cls, weather_data, south, west, resolution, rows, columns): Build the tile from the
+             Meteomatics response of a grid request, or return None if it holds no data.
+            interpolate(self, latitude, longitude): Return the interpolated value of every parameter at the point.
+            point_response(self, latitude, longitude): Return the interpolated values shaped like the Meteomatics
+             response of a single point request.
+     """
+
+    def __init__(self, south: float, west: float, resolution: float, values: dict, date: str, generated: str):
+        self.south = south
+        self.west = west
+        self.resolution = resolution
+        self.values = values
+        self.date = date
+        self.generated = generated
+
+    @classmethod
+    def from_response(cls, weather_data: dict, south: float, west: float, resolution: float, rows: int,
+                      columns: int):
+        # NumPy is only needed once a tile is fetched, it is imported on the first one, see weather_api.startup.
+        import numpy as np
+
+        if not weather_data or not weather_data.get('data'):
+            return None
+
+        values = {}
+        date = None
+        for entry in weather_data['data']:
+            grid = np.full((rows, columns), np.nan)
+            for coordinate in entry.get('coordinates', []):
+                dates = coordinate.get('dates') or [{}]
+                row = round((coordinate['lat'] - south) / resolution)
+                column = round((coordinate['lon'] - west) / resolution)
+                if 0 <= row < rows and 0 <= column < columns and dates[0].get('value') is not None:
+                    grid[row, column] = dates[0]['value']
+                    date = date or dates[0].get('date')
+            values[entry.get('parameter')] = grid
+
+        if date is None:
+            return None
+        return cls(south, west, resolution, values, date, weather_data.get('dateGenerated'))
+
+    def interpolate(self, latitude, longitude) -> dict:
+        import numpy as np
+
+        interpolated = {}
+        for parameter, grid in self.values.items():
+            rows, columns = grid.shape
+            y = (float(latitude) - self.south) / self.resolution
+            x = (float(longitude) - self.west) / self.resolution
+            row = min(max(math.floor(y), 0), rows - 2)
+            column = min(max(math.floor(x), 0), columns - 2)
+            dy = min(max(y - row, 0.0), 1.0)
+            dx = min(max(x - column, 0.0), 1.0)
+
+            corners = grid[row:row + 2, column:column + 2].ravel()
+            weights = np.array([(1 - dy) * (1 - dx), (1 - dy) * dx, dy * (1 - dx), dy * dx])
+            # Missing grid points are left out and the weights of the others renormalized, a point on a missing
+            # grid point gets the mean of the others.
+            present = ~np.isnan(corners)
+            total = weights[present].sum()
+            if total > 0:
+                interpolated[parameter] = round(float((weights[present] * corners[present]).sum() / total), 1)
+            else:
+                interpolated[parameter] = round(float(corners[present].mean()), 1) if present.any() else None
+        return interpolated
+
+    def point_response(self, latitude, longitude) -> dict:
+        return {
+            'version': '3.0',
+            'dateGenerated': self.generated,
+            'status': 'OK',
+            'data': [
+                {'parameter': parameter,
+                 'coordinates': [{'lat': latitude, 'lon': longitude, 'dates': [{'date': self.date, 'value': value}]}]}
+                for parameter, value in self.interpolate(latitude, longitude).items()
+            ],
+        }
+
+
+class TileCache:
+    """
+    In-process cache of GridTile objects covering regions with many users: the current weather of a point is
+    interpolated from the tile around it, which is requested from Meteomatics once per time bucket (the update
+    cadence of the upstream model, or the lifetime of the current weather when it is shorter) instead of requesting
+    every point. Tiles are squares of tile_degrees aligned on multiples of tile_degrees, sampled every resolution
+    degrees, and the lru_size most recently used ones are kept.
+
+        Attributes:
+            tile_degrees (float): The size of the tiles in degrees.
+            resolution (float): The spacing of the grid points of a tile in degrees.
+            regions (list): The (south, west, north, east) boxes served from tiles, every location when empty.
+            time_bucket (int): The length in seconds of the time buckets a tile is valid for.
+            lru (LRUCache): The tiles, by parameters, position and time bucket.
+            single_flight (SingleFlight): Coalesces concurrent fetches of the same tile.
+
+        Methods:
+            covers(self, latitude, longitude): Return True if the point is served from tiles.
+            tile_bounds(self, latitude, longitude): Return the (south, west, north, east) bounds of the tile of the
+             point.
+            get_tile(self, latitude, longitude, parameters): Return the tile of the point, fetching it on a miss, or
+             None if the request failed.
+            point(self, latitude, longitude, parameters): Return the interpolated current weather of the point
+             shaped like a Meteomatics response, or None if its tile could not be fetched.
+            stats(self): Return the hit and miss counters.
+     """
+
+    def __init__(self, tile_degrees: float, resolution: float, regions: list, time_bucket: int, lru_size: int):
+        self.tile_degrees = tile_degrees
+        self.resolution = resolution
+        self.regions = regions
+        self.time_bucket = time_bucket
+        self.lru = LRUCache(lru_size)
+        self.single_flight = SingleFlight()
+        self._counters = {'memory_hits': 0, 'misses': 0}
+        self._counters_lock = threading.Lock()
+
+    def _count(self, name):
+        CACHE_LOOKUPS.labels('tile', name).inc()
+        with self._counters_lock:
+            self._counters[name] += 1
+
+    def stats(self) -> dict:
+        with self._counters_lock:
+            counters = dict(self._counters)
+        counters['hits'] = counters['memory_hits']
+        return counters
+
+    def clear(self):
+        self.lru.clear()
+        with self._counters_lock:
+            for name in self._counters:
+                self._counters[name] = 0
+
+    def covers(self, latitude, longitude) -> bool:
+        south, west, north, east = self.tile_bounds(latitude, longitude)
+        if south < -90 or north > 90 or west < -180 or east > 180:
+            return False
+        return not self.regions or any(region_south <= float(latitude) <= region_north
+                                       and region_west <= float(longitude) <= region_east
+                                       for region_south, region_west, region_north, region_east in self.regions)
+
+    def tile_bounds(self, latitude, longitude) -> tuple:
+        south = round(math.floor(float(latitude) / self.tile_degrees) * self.tile_degrees, 6)
+        west = round(math.floor(float(longitude) / self.tile_degrees) * self.tile_degrees, 6)
+        return south, west, round(south + self.tile_degrees, 6), round(west + self.tile_degrees, 6)
+
+    def get_tile(self, latitude, longitude, parameters):
+        south, west, north, east = self.tile_bounds(latitude, longitude)
+        bucket = int(time.time() // self.time_bucket)
+        key = f'tile:{",".join(parameters)}:{south}:{west}:{bucket}'
+
+        tile = self.lru.get(key)
+        if tile is not None:
+            self._count('memory_hits')
+            return tile
+
+        def fetch_and_store():
+            tile = self.lru.get(key)
+            if tile is not None:
+                return tile
+
+            self._count('misses')
+            # The resolution is adjusted to divide the tile evenly, so the grid has points on all four edges.
+            steps = max(1, round(self.tile_degrees / self.resolution))
+            resolution = round(self.tile_degrees / steps, 6)
+            weather_data = get_meteomatics_client().current_grid(south, west, north, east, resolution,
+                                                                 parameters=parameters)
+            tile = GridTile.from_response(weather_data, south, west, resolution, steps + 1, steps + 1)
+            if tile is not None:
+                self.lru.set(key, tile)
+            return tile
+
+        return self.single_flight.do(key, fetch_and_store)
+
+    def point(self, latitude, longitude, parameters):
+        tile = self.get_tile(latitude, longitude, parameters)
+        return tile.point_response(latitude, longitude) if tile is not None else None
+
+
+_tile_cache = None
+_tile_cache_lock = threading.Lock()
+
+
+def get_tile_cache():
+    """
+    Return the process-wide TileCache, it is created on first use from the WEATHER_TILE_* settings.
+
+        Returns:
+            TileCache or None: The shared tile cache, or None when WEATHER_TILES_ENABLED is off.
+     """
+    global _tile_cache
+
+    if not settings.WEATHER_TILES_ENABLED:
+        return None
+
+    if _tile_cache is None:
+        with _tile_cache_lock:
+            if _tile_cache is None:
+                _tile_cache = TileCache(
+                    tile_degrees=settings.WEATHER_TILE_DEGREES,
+                    resolution=settings.WEATHER_TILE_RESOLUTION,
+                    regions=settings.WEATHER_TILE_REGIONS,
+                    # A tile is not served for longer than the current weather interpolated from it is cached.
+                    time_bucket=min(settings.WEATHER_CACHE_TIME_BUCKET, settings.WEATHER_CACHE_TTL['current'],
+                                    settings.WEATHER_CACHE_TTL['search']),
+                    lru_size=settings.WEATHER_TILE_CACHE_SIZE,
+                )
+    return _tile_cache
+
+
+def interpolated_weather(latitude, longitude, parameters):
+    """
+    Return the current weather of a point interpolated from the tile cache, shaped like the Meteomatics response of a
+    point request, or None when tiles are disabled, do not cover the point or could not be fetched: the caller then
+    requests the point itself.
+
+        Args:
+            latitude (float): The latitude of the point.
+            longitude (float): The longitude of the point.
+            parameters (tuple): The upstream parameters to fetch.
+     """
+    tile_cache = get_tile_cache()
+    if tile_cache is None or not tile_cache.covers(latitude, longitude):
+        return None
+    return tile_cache.point(latitude, longitude, parameters)
+
+
+@receiver(setting_changed)
+def _reset_tile_cache(setting, **kwargs):
+    global _tile_cache
+
+    if setting.startswith('WEATHER_TILE') or setting in ('WEATHER_CACHE_TIME_BUCKET', 'WEATHER_CACHE_TTL'):
+        _tile_cache = None
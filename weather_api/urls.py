@@ -1,5 +1,7 @@
 from django.urls import path
-from .views import RegistrationView, LoginView, CurrentWeatherView, SearchWeatherView, ForcastWeatherView
+from .async_views import AsyncCurrentWeatherView, AsyncSearchWeatherView, AsyncForcastWeatherView
+from .views import (RegistrationView, LoginView, CurrentWeatherView, SearchWeatherView, ForcastWeatherView,
+                    WeatherBatchView, WeatherHistoryView, LocationSuggestView)
 
 urlpatterns = [
     path('register/', RegistrationView.as_view(), name='register'),
@@ -7,4 +9,10 @@ urlpatterns = [
     path('weather/current/', CurrentWeatherView.as_view(), name='current-weather'),
     path('weather/search/', SearchWeatherView.as_view(), name='search-weather'),
     path('weather/forcast/', ForcastWeatherView.as_view(), name='forcast-weather'),
+    path('weather/batch/', WeatherBatchView.as_view(), name='batch-weather'),
+    path('weather/history/', WeatherHistoryView.as_view(), name='history-weather'),
+    path('locations/suggest/', LocationSuggestView.as_view(), name='suggest-locations'),
+    path('weather/async/current/', AsyncCurrentWeatherView.as_view(), name='async-current-weather'),
+    path('weather/async/search/', AsyncSearchWeatherView.as_view(), name='async-search-weather'),
+    path('weather/async/forcast/', AsyncForcastWeatherView.as_view(), name='async-forcast-weather'),
 ]
@@ -1,5 +1,12 @@
+import ipaddress
+import logging
+
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views import View
 
 from rest_framework import generics, permissions
 from rest_framework.authentication import TokenAuthentication, SessionAuthentication, BasicAuthentication
@@ -7,10 +14,39 @@ from rest_framework.authtoken.models import Token
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.settings import api_settings
+
+from .serializers import (UserSerializer, WeatherSerializer, UserLoginSerializer, WeatherInputSerializer,
+                          WeatherBatchInputSerializer, WeatherFastSerializer, WeatherHistoryInputSerializer,
+                          LocationSuggestInputSerializer)
+
+from .batch import fetch_batch_weather, iter_batch_weather
+from .columnar import columnar_format
+from .forecast import parse_forecast_options
+from .gazetteer import get_gazetteer
+from .http_caching import weather_validator
+from .ip_geolocation import get_client_ip
+from .metrics import render_metrics, timing
+from .observations import query_observations
+from .parameters import DEFAULT_PARAMETERS, parse_parameters
+from .renderers import ColumnarJSONRenderer, MessagePackRenderer, NDJSONRenderer
+from .schema import SCHEMA_FORMATS, get_schema_artifact
+from .streaming import iter_weather_records, ndjson_response, wants_ndjson
+from .weather_request import (get_weather, get_geolocation_based_on_input, get_user_geolocation, response_format,
+                              search_weather_logic, serialize_weather_payload, weather_variant)
+
+
+logger = logging.getLogger(__name__)
+
 
-from .serializers import UserSerializer, WeatherSerializer, UserLoginSerializer, WeatherInputSerializer
+class TimedAuthenticationMixin:
+    """
+    Mixin for API views that reports the authentication of the request as the 'auth' timing stage.
+     """
 
-from .weather_request import weather_request_api, get_user_geolocation, search_weather_logic
+    def perform_authentication(self, request):
+        with timing('auth'):
+            super().perform_authentication(request)
 
 
 class LoginView(APIView):
@@ -76,7 +112,7 @@ class RegistrationView(generics.CreateAPIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class CurrentWeatherView(generics.ListAPIView):
+class CurrentWeatherView(TimedAuthenticationMixin, generics.ListAPIView):
     """
     View for retrieving current weather information, it requires authentication and permission for authenticated users.
     It retrieves the current geolocation of the user, fetches weather data based
@@ -97,32 +133,38 @@ class CurrentWeatherView(generics.ListAPIView):
     serializer_class = WeatherSerializer
 
     def get(self, request, *args, **kwargs):
-        current_location = get_user_geolocation()
+        try:
+            parameters = parse_parameters(self.request.query_params.get('parameters'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+
+        current_location = get_user_geolocation(get_client_ip(request))
+        if not current_location:
+            return Response({'error': 'Client location unknown'}, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+
         latitude = current_location['latitude']
         longitude = current_location['longitude']
         country = current_location['country']
 
-        weather_data = weather_request_api(latitude, longitude, country)
-        if weather_data and 'data' in weather_data:
-            data = weather_data['data']
-            if data and len(data) > 0:
-                weather_data_to_serialize = data[0]
-
-                coordinates_data = weather_data_to_serialize.get('coordinates', [])
+        weather_data = get_weather('current', latitude, longitude, country, parameters)
 
-                serializer_data = {
-                    "parameter": weather_data_to_serialize.get('parameter', ''),
-                    "coordinates": coordinates_data,
-                }
+        # Located from the client IP address: only the client may cache the response.
+        validator = weather_validator(request, 'current', latitude, longitude, weather_variant('current', parameters),
+                                      weather_data, response_format(request), shared=False)
+        if validator is not None:
+            not_modified = validator.not_modified()
+            if not_modified is not None:
+                return not_modified
 
-                serializer = WeatherSerializer(serializer_data)
-
-                return Response(serializer.data, status=200)
+        serialized_weather_data = serialize_weather_payload(weather_data, parameters)
+        if serialized_weather_data is not None:
+            response = Response(serialized_weather_data, status=200)
+            return validator.patch(response) if validator is not None else response
 
         return Response({'error': 'Failed to fetch weather data'}, status=500)
 
 
-class SearchWeatherView(generics.ListAPIView):
+class SearchWeatherView(TimedAuthenticationMixin, generics.ListAPIView):
     """
     View for searching and retrieving current weather information based on provided location, requires authentication and
     permission for authenticated users.It allows users to search for weather information by providing a location query
@@ -144,6 +186,8 @@ class SearchWeatherView(generics.ListAPIView):
     authentication_classes = [TokenAuthentication, SessionAuthentication, BasicAuthentication]
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = WeatherInputSerializer
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, NDJSONRenderer, ColumnarJSONRenderer,
+                        MessagePackRenderer]
 
     def get(self, request, *args, **kwargs):
         location_query = self.request.query_params.get('location')
@@ -152,9 +196,15 @@ class SearchWeatherView(generics.ListAPIView):
             return Response({'error': 'Please provide a location (city name or zip code)'}, status=400)
 
         try:
-            return search_weather_logic(location_query, True, False)
-        except Exception as e:
-            print(f"Error: {e}")
+            parameters = parse_parameters(self.request.query_params.get('parameters'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+
+        try:
+            return search_weather_logic(location_query, True, False, parameters, stream=wants_ndjson(request),
+                                        request=request, columnar=columnar_format(request))
+        except Exception:
+            logger.exception('Failed to fetch weather data', extra={'location': location_query})
             return Response({'error': 'Failed to fetch weather data'}, status=500)
 
         return Response({'error': 'Failed to fetch weather data'}, status=500)
@@ -162,17 +212,23 @@ class SearchWeatherView(generics.ListAPIView):
     def post(self, request, *args, **kwargs):
         location_query = request.data.get('location') or request.POST.get('location') or request.data.get('parameter')
 
+        try:
+            parameters = parse_parameters(request.data.get('parameters'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+
         if location_query:
             try:
-                return search_weather_logic(location_query, True, False)
-            except Exception as e:
-                print(f"Error: {e}")
+                return search_weather_logic(location_query, True, False, parameters, stream=wants_ndjson(request),
+                                            columnar=columnar_format(request))
+            except Exception:
+                logger.exception('Failed to fetch weather data', extra={'location': location_query})
                 return Response({'error': 'Failed to fetch weather data'}, status=500)
 
         return Response({'error': 'Failed to fetch weather data'}, status=500)
 
 
-class ForcastWeatherView(generics.ListAPIView):
+class ForcastWeatherView(TimedAuthenticationMixin, generics.ListAPIView):
     """
     View for retrieving weather forecasts for 7 days, it requires authentication and permission for authenticated users.
     It allows users to retrieve weather forecasts based on a location query
@@ -186,7 +242,9 @@ class ForcastWeatherView(generics.ListAPIView):
 
         Methods:
             get(self, request, *args, **kwargs): Handles HTTP GET requests for weather forecast retrieval for 7 days.
-            Users can provide a location query via the 'location' query parameter to retrieve forecasts.
+            Users can provide a location query via the 'location' query parameter to retrieve forecasts, and
+            choose the number of 'days', the time step ('interval', e.g. PT1H, PT3H, P1D) and a daily summary
+            ('aggregate=daily', min/max/mean per local day).
 
             post(self, request, *args, **kwargs): Handles HTTP POST requests for weather forecast retrieval for 7 days.
             Users can provide a location query via the request data to retrieve forecasts.
@@ -194,22 +252,33 @@ class ForcastWeatherView(generics.ListAPIView):
     authentication_classes = [TokenAuthentication, SessionAuthentication, BasicAuthentication]
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = WeatherInputSerializer
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, NDJSONRenderer, ColumnarJSONRenderer,
+                        MessagePackRenderer]
 
     def get(self, request, *args, **kwargs):
         location_query = self.request.query_params.get('location')
         # print('testing loc:', location_query, type(location_query))
 
+        try:
+            parameters = parse_parameters(self.request.query_params.get('parameters'))
+            forecast = parse_forecast_options(self.request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+
         if not location_query:
             try:
-                return search_weather_logic(location_query, False, True)
-            except Exception as e:
-                print(f"Error: {e}")
+                return search_weather_logic(location_query, False, True, parameters, forecast, wants_ndjson(request),
+                                            get_client_ip(request), request=request,
+                                            columnar=columnar_format(request))
+            except Exception:
+                logger.exception('Failed to fetch weather data', extra={'location': location_query})
                 return Response({'error': 'Failed to fetch weather data'}, status=500)
         else:
             try:
-                return search_weather_logic(location_query, False, False)
-            except Exception as e:
-                print(f"Error: {e}")
+                return search_weather_logic(location_query, False, False, parameters, forecast, wants_ndjson(request),
+                                            request=request, columnar=columnar_format(request))
+            except Exception:
+                logger.exception('Failed to fetch weather data', extra={'location': location_query})
                 return Response({'error': 'Failed to fetch weather data'}, status=500)
 
         return Response({'error': 'Failed to fetch weather data'}, status=500)
@@ -218,11 +287,183 @@ class ForcastWeatherView(generics.ListAPIView):
         location_query = request.data.get('location') or request.POST.get('parameter') or request.data.get('parameter')
         # print('testing loc:', location_query, type(location_query))
 
+        try:
+            parameters = parse_parameters(request.data.get('parameters'))
+            forecast = parse_forecast_options(request.data)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+
         if location_query:
             try:
-                return search_weather_logic(location_query, False, False)
-            except Exception as e:
-                print(f"Error: {e}")
+                return search_weather_logic(location_query, False, False, parameters, forecast, wants_ndjson(request),
+                                            columnar=columnar_format(request))
+            except Exception:
+                logger.exception('Failed to fetch weather data', extra={'location': location_query})
                 return Response({'error': 'Failed to fetch weather data'}, status=500)
 
         return Response({'error': 'Failed to fetch weather data'}, status=500)
+
+
+class WeatherBatchView(TimedAuthenticationMixin, generics.GenericAPIView):
+    """
+    View for retrieving current weather information for many locations at once, it requires authentication and
+    permission for authenticated users. Location queries are geocoded concurrently and the locations are fetched
+    from the upstream weather API in as few multi-coordinate requests as possible.
+
+        Attributes:
+            authentication_classes (list): A list of authentication classes required for this view.
+            permission_classes (list): A list of permissions that restrict access to authenticated users.
+            serializer_class (class): The serializer class used for validating the list of locations.
+
+        Methods:
+            post(self, request, *args, **kwargs): Handles HTTP POST requests with a 'locations' list of city names,
+            zip codes and/or {"latitude": ..., "longitude": ...} objects and optional weather 'parameters'.
+            Returns one result per location, in input
+            order, with 'status' set to 'ok' or 'error' so that partial failures do not fail the whole batch; NDJSON
+            records are streamed in completion order instead, each with the 'index' of its location.
+     """
+    authentication_classes = [TokenAuthentication, SessionAuthentication, BasicAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = WeatherBatchInputSerializer
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, NDJSONRenderer]
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        locations = serializer.validated_data['locations']
+        parameters = serializer.validated_data.get('parameters', DEFAULT_PARAMETERS)
+        try:
+            # NDJSON records are streamed as soon as their upstream request completes, with their input 'index'.
+            if wants_ndjson(request):
+                return ndjson_response({'index': index, **result}
+                                       for index, result in iter_batch_weather(locations, parameters))
+            results = fetch_batch_weather(locations, parameters)
+        except Exception:
+            logger.exception('Failed to fetch batch weather data')
+            return Response({'error': 'Failed to fetch weather data'}, status=500)
+
+        return Response({'results': results}, status=200)
+
+
+class WeatherHistoryView(TimedAuthenticationMixin, generics.GenericAPIView):
+    """
+    View for retrieving archived weather values for a time range, it requires authentication and permission for
+    authenticated users. The values fetched by the other weather endpoints are archived, so a historical query is
+    answered with one indexed database query instead of an upstream request.
+
+        Attributes:
+            authentication_classes (list): A list of authentication classes required for this view.
+            permission_classes (list): A list of permissions that restrict access to authenticated users.
+            serializer_class (class): The serializer class used for validating the history query.
+
+        Methods:
+            get(self, request, *args, **kwargs): Handles HTTP GET requests with a 'location' (or 'latitude' and
+            'longitude'), a 'parameter', an optional 'kind' ('current' or 'forecast'), a 'start' and an optional
+            'end', and an optional 'resolution' ('raw', 'hour' or 'day') to downsample the series in the database.
+     """
+    authentication_classes = [TokenAuthentication, SessionAuthentication, BasicAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = WeatherHistoryInputSerializer
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, NDJSONRenderer]
+
+    def get(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        query = serializer.validated_data
+
+        if query.get('location'):
+            location = get_geolocation_based_on_input(query['location'])
+            if location is None:
+                return Response({'error': 'Location not found'}, status=status.HTTP_404_NOT_FOUND)
+            latitude, longitude = location[0], location[1]
+        else:
+            latitude, longitude = query['latitude'], query['longitude']
+
+        dates = query_observations(latitude, longitude, query['parameter'], query['start'], query['end'],
+                                   query['resolution'], query['kind'])
+        weather_data = {
+            'parameter': query['parameter'],
+            'coordinates': [{'lat': latitude, 'lon': longitude, 'dates': dates}],
+        }
+
+        if wants_ndjson(request):
+            return ndjson_response(iter_weather_records({'data': [weather_data]}))
+
+        return Response(WeatherFastSerializer(weather_data).data, status=200)
+
+
+class LocationSuggestView(TimedAuthenticationMixin, generics.GenericAPIView):
+    """
+    View for location autocomplete, it requires authentication and permission for authenticated users. Suggestions
+    come from the prefix index of the offline gazetteer, most populated places first, without any upstream call.
+
+        Attributes:
+            authentication_classes (list): A list of authentication classes required for this view.
+            permission_classes (list): A list of permissions that restrict access to authenticated users.
+            serializer_class (class): The serializer class used for validating the autocomplete query.
+
+        Methods:
+            get(self, request, *args, **kwargs): Handles HTTP GET requests with the beginning 'q' of a city name and
+            an optional 'limit', and returns the matching places with their country, coordinates and population.
+     """
+    authentication_classes = [TokenAuthentication, SessionAuthentication, BasicAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = LocationSuggestInputSerializer
+
+    def get(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        query = serializer.validated_data
+
+        return Response({'results': get_gazetteer().suggest(query['q'], query.get('limit'))}, status=200)
+
+
+class MetricsView(APIView):
+    """
+    View exposing the metrics of the process in the Prometheus text format for scraping, it is only served to clients
+    from the METRICS_ALLOWED_NETWORKS.
+
+        Methods:
+            get(self, request, *args, **kwargs): Handles HTTP GET requests and returns the request and stage duration
+            histograms, the upstream error counters and the cache hit ratios.
+     """
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, *args, **kwargs):
+        try:
+            client_ip = ipaddress.ip_address(get_client_ip(request))
+        except ValueError:
+            client_ip = None
+        if client_ip is None or not any(client_ip in ipaddress.ip_network(network, strict=False)
+                                        for network in settings.METRICS_ALLOWED_NETWORKS):
+            return Response({'error': 'Forbidden'}, status=status.HTTP_403_FORBIDDEN)
+
+        return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class SchemaView(View):
+    """
+    View serving the OpenAPI schema document in JSON or YAML from memory (see schema.get_schema_artifact) instead of
+    introspecting every view again on each request. Responses carry an ETag and clients revalidate them, a request
+    with a matching If-None-Match gets an empty 304 response.
+
+        Methods:
+            get(self, request, format): Handles HTTP GET requests and returns the document of the format, '.json' or
+            '.yaml'.
+     """
+
+    def get(self, request, format):
+        artifact = get_schema_artifact()
+        etag = artifact.etags[format]
+
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(artifact.documents[format], content_type=SCHEMA_FORMATS[format])
+        response['ETag'] = etag
+        patch_cache_control(response, public=True, no_cache=True)
+        return response
@@ -0,0 +1,255 @@
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .lru_cache import LRUCache
+from .metrics import CACHE_LOOKUPS
+from .singleflight import SingleFlight, coalesce
+
+
+# Backends keeping their entries in the memory of each process, so a fill is never seen by the other processes.
+PROCESS_LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def is_shared_cache(alias: str) -> bool:
+    """
+    Return True if the Django cache backend of the alias is shared between worker processes (Redis, memcached,
+    database, file), False for the per-process local-memory and dummy backends.
+
+        Args:
+            alias (str): The alias of the cache backend in settings.CACHES.
+
+        Returns:
+            bool: Whether the backend is shared between processes.
+     """
+    return settings.CACHES[alias]['BACKEND'] not in PROCESS_LOCAL_CACHE_BACKENDS
+
+
+class WeatherCache:
+    """
+    Cache for upstream weather responses keyed on the location snapped to a grid plus a time bucket that follows
+    the update cadence of the upstream weather model. Every request that falls into the same grid cell during the
+    same time bucket shares one upstream call. Entries live in a Django cache backend (local-memory, file,
+    database, ...) so they can be shared between worker processes, with a size-bounded in-process LRU tier in
+    front of it. Expired entries are kept for stale_ttl more seconds and served while a refresh of the same key is
+    in flight, instead of making the request wait for the upstream call. Refreshes are marked in flight in the
+    backend, so with a shared backend every process serves the stale entry, not only the refreshing one.
+
+        Attributes:
+            alias (str): The alias of the Django cache backend from settings.CACHES.
+            grid_degrees (float): The size in degrees of the grid cells locations are snapped to.
+            time_bucket (int): The length in seconds of the time buckets, matching the upstream model updates.
+            ttls (dict): A mapping of endpoint names ('current', 'search', 'forcast') to lifetimes in seconds.
+            stale_ttl (int): How long in seconds an expired entry may still be served during a refresh.
+            lru (LRUCache): The in-process cache tier.
+            single_flight (SingleFlight): Coalesces concurrent fetches of the same cache key.
+
+        Methods:
+            snap(self, latitude, longitude): Return the coordinates of the centre of the grid cell of the point.
+            make_key(self, endpoint, latitude, longitude, variant='', bucket=None): Return the cache key of a point.
+            get(self, endpoint, latitude, longitude, variant=''): Return the cached weather data or None on a miss.
+            get_stale(self, endpoint, latitude, longitude, variant=''): Return the latest weather data of the point
+             even if expired (within stale_ttl, from the current or the previous time bucket), or None.
+            expires_in(self, endpoint, latitude, longitude, variant=''): Return the number of seconds the cached
+             weather data of the point is still served for, or None if it is not cached.
+            set(self, endpoint, latitude, longitude, data, variant='', bucket=None): Store the weather data for
+             the point, in the current time bucket by default.
+            get_or_fetch(self, endpoint, latitude, longitude, fetch, variant=''): Return the cached weather data
+             for the point, calling fetch(latitude, longitude) with the snapped coordinates on a miss. Concurrent
+             misses for the same key share one fetch, and get stale data instead when there is some.
+            refresh(self, endpoint, latitude, longitude, fetch, variant='', bucket=None): Fetch and store the
+             weather data of the point ahead of expiry, as the in-flight call of its key.
+            refreshing(self, key): Return True if the key is being fetched by this process or refreshed by any.
+            stats(self): Return the hit and miss counters.
+     """
+
+    def __init__(self, alias: str, grid_degrees: float, time_bucket: int, ttls: dict, lru_size: int,
+                 stale_ttl: int = 0):
+        self.alias = alias
+        self.grid_degrees = grid_degrees
+        self.time_bucket = time_bucket
+        self.ttls = ttls
+        self.stale_ttl = stale_ttl
+        self.lru = LRUCache(lru_size)
+        self.single_flight = SingleFlight()
+        self._counters = {'memory_hits': 0, 'shared_hits': 0, 'stale_hits': 0, 'misses': 0}
+        self._counters_lock = threading.Lock()
+
+    @property
+    def backend(self):
+        return caches[self.alias]
+
+    def _count(self, name):
+        CACHE_LOOKUPS.labels('weather', name).inc()
+        with self._counters_lock:
+            self._counters[name] += 1
+
+    def stats(self) -> dict:
+        with self._counters_lock:
+            counters = dict(self._counters)
+        counters['hits'] = counters['memory_hits'] + counters['shared_hits']
+        return counters
+
+    def clear(self):
+        self.lru.clear()
+        with self._counters_lock:
+            for name in self._counters:
+                self._counters[name] = 0
+
+    def snap(self, latitude, longitude) -> tuple:
+        latitude = round(round(float(latitude) / self.grid_degrees) * self.grid_degrees, 6)
+        longitude = round(round(float(longitude) / self.grid_degrees) * self.grid_degrees, 6)
+        return latitude, longitude
+
+    def current_bucket(self, now: float = None) -> int:
+        return int((time.time() if now is None else now) // self.time_bucket)
+
+    def make_key(self, endpoint: str, latitude, longitude, variant: str = '', bucket: int = None) -> str:
+        latitude, longitude = self.snap(latitude, longitude)
+        if bucket is None:
+            bucket = self.current_bucket()
+        return f'weather:{endpoint}:{variant}:{latitude}:{longitude}:{bucket}'
+
+    def _lookup(self, key: str, now: float) -> tuple:
+        cached = self.lru.get(key)
+        if cached is not None and cached[1] > now:
+            return cached, True
+
+        shared = self.backend.get(key)
+        if shared is not None:
+            self.lru.set(key, shared)
+            return shared, False
+        return cached, True
+
+    def _get(self, endpoint: str, latitude, longitude, variant: str = '') -> tuple:
+        now = time.time()
+        key = self.make_key(endpoint, latitude, longitude, variant, self.current_bucket(now))
+
+        cached, in_memory = self._lookup(key, now)
+        if cached is not None and cached[1] > now:
+            return cached[0], 'memory_hits' if in_memory else 'shared_hits'
+        return None, 'misses'
+
+    def get(self, endpoint: str, latitude, longitude, variant: str = ''):
+        data, counter = self._get(endpoint, latitude, longitude, variant)
+        self._count(counter)
+        return data
+
+    def get_stale(self, endpoint: str, latitude, longitude, variant: str = ''):
+        now = time.time()
+        bucket = self.current_bucket(now)
+
+        for candidate in (bucket, bucket - 1):
+            cached, _ = self._lookup(self.make_key(endpoint, latitude, longitude, variant, candidate), now)
+            if cached is not None and cached[1] + self.stale_ttl > now:
+                return cached[0]
+        return None
+
+    def expires_in(self, endpoint: str, latitude, longitude, variant: str = ''):
+        now = time.time()
+        bucket = self.current_bucket(now)
+
+        cached, _ = self._lookup(self.make_key(endpoint, latitude, longitude, variant, bucket), now)
+        if cached is None or cached[1] <= now:
+            return None
+        return min(cached[1], (bucket + 1) * self.time_bucket) - now
+
+    def set(self, endpoint: str, latitude, longitude, data, variant: str = '', bucket: int = None):
+        if data is None:
+            return
+
+        now = time.time()
+        if bucket is None:
+            bucket = self.current_bucket(now)
+        key = self.make_key(endpoint, latitude, longitude, variant, bucket)
+        ttl = self.ttls.get(endpoint, self.time_bucket)
+        entry = (data, now + ttl)
+        self.lru.set(key, entry)
+        self.backend.set(key, entry, ttl + self.stale_ttl)
+
+    def get_or_fetch(self, endpoint: str, latitude, longitude, fetch, variant: str = ''):
+        data = self.get(endpoint, latitude, longitude, variant)
+        if data is not None:
+            return data
+
+        key = self.make_key(endpoint, latitude, longitude, variant)
+        if self.stale_ttl and self.refreshing(key):
+            data = self.get_stale(endpoint, latitude, longitude, variant)
+            if data is not None:
+                self._count('stale_hits')
+                return data
+
+        def lookup():
+            # The re-check of a miss already counted.
+            data, _ = self._get(endpoint, latitude, longitude, variant)
+            return data is not None, data
+
+        def fetch_and_store():
+            data = fetch(*self.snap(latitude, longitude))
+            self.set(endpoint, latitude, longitude, data, variant)
+            return data
+
+        return coalesce(self.single_flight, key, lookup, fetch_and_store, is_shared_cache(self.alias))
+
+    def refresh(self, endpoint: str, latitude, longitude, fetch, variant: str = '', bucket: int = None):
+        def fetch_and_store():
+            data = fetch(*self.snap(latitude, longitude))
+            self.set(endpoint, latitude, longitude, data, variant, bucket)
+            return data
+
+        # The refresh runs as the in-flight call of the key being served, and is marked in the backend for the
+        # other processes, so requests missing it meanwhile get stale data instead of waiting. The marker expires
+        # with the stale entries if the process dies during the refresh.
+        key = self.make_key(endpoint, latitude, longitude, variant)
+        marked = self.stale_ttl and self.backend.add(f'{key}:refreshing', os.getpid(), self.stale_ttl)
+        try:
+            return self.single_flight.do(key, fetch_and_store)
+        finally:
+            if marked:
+                self.backend.delete(f'{key}:refreshing')
+
+    def refreshing(self, key: str) -> bool:
+        return self.single_flight.in_flight(key) or self.backend.get(f'{key}:refreshing') is not None
+
+
+_weather_cache = None
+_weather_cache_lock = threading.Lock()
+
+
+def get_weather_cache() -> WeatherCache:
+    """
+    Return the process-wide WeatherCache, it is created on first use from the WEATHER_CACHE_* settings.
+
+        Returns:
+            WeatherCache: The shared weather cache instance.
+     """
+    global _weather_cache
+
+    if _weather_cache is None:
+        with _weather_cache_lock:
+            if _weather_cache is None:
+                _weather_cache = WeatherCache(
+                    alias=settings.WEATHER_CACHE_ALIAS,
+                    grid_degrees=settings.WEATHER_CACHE_GRID_DEGREES,
+                    time_bucket=settings.WEATHER_CACHE_TIME_BUCKET,
+                    ttls=settings.WEATHER_CACHE_TTL,
+                    lru_size=settings.WEATHER_CACHE_LRU_SIZE,
+                    stale_ttl=settings.WEATHER_CACHE_STALE_TTL,
+                )
+    return _weather_cache
+
+
+@receiver(setting_changed)
+def _reset_weather_cache(setting, **kwargs):
+    global _weather_cache
+
+    if setting.startswith('WEATHER_CACHE_'):
+        _weather_cache = None
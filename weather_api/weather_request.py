@@ -1,128 +1,199 @@
+import ipaddress
 import json
-import base64
+import logging
 
-from datetime import datetime, timedelta
+from urllib.parse import urlsplit
 
-import requests
-import geocoder
-import pytz
-
-from geopy.geocoders import Nominatim
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
 from rest_framework.response import Response
 
-from .serializers import WeatherSerializer
+from .columnar import columnar_weather
+from .forecast import DEFAULT_FORECAST_OPTIONS, aggregate_daily, forecast_variant
+from .gazetteer import get_gazetteer
+from .geocoding_cache import get_geocoding_cache
+from .http_caching import weather_validator
+from .ip_geolocation import get_ip_fallback_cache, get_ip_location_table
+from .meteomatics import get_meteomatics_client
+from .metrics import UPSTREAM_ERRORS, timing
+from .models import WeatherObservation
+from .observations import archive_weather_data
+from .parameters import DEFAULT_PARAMETERS, apply_parameters, cache_variant, upstream_parameters_for
+from .refresh_ahead import track_request
+from .renderers import MessagePackRenderer
+from .reverse_geocoder import get_local_timezone, resolve_country_and_timezone
+from .serializers import WeatherFastSerializer
+from .streaming import iter_weather_records, ndjson_response
+from .tile_cache import interpolated_weather
+from .weather_cache import get_weather_cache
+
+
+logger = logging.getLogger(__name__)
 
+_geolocator = None
 
-def weather_request_api(latitude: str, longitude: str, country: str) -> json:
+
+def weather_request_api(latitude: str, longitude: str, country: str, parameters=DEFAULT_PARAMETERS) -> json:
     """
-    Send a weather data request to the Meteomatics API and retrieve weather information, it sends a GET request to the
-    Meteomatics API to retrieve weather data based on the provided latitude, longitude, and country. It uses Basic
-    Authentication with a username and password to authenticate with the API.
+    Send a weather data request to the Meteomatics API and retrieve weather information, it requests the current
+    values of the parameters at the provided latitude and longitude through the shared, connection-pooled
+    MeteomaticsClient. All parameters are fetched with one request, derived parameters are computed locally, and
+    the fetched values are archived for the history endpoint. Locations covered by the tile cache are interpolated
+    from its regional grids instead, interpolated values are not archived.
 
         Args:
             latitude (str): The latitude of the location for which weather data is requested.
             longitude (str): The longitude of the location for which weather data is requested.
-            country (str): The country associated with the location for time zone information.
+            country (str): The country associated with the location, narrows down the offline time zone lookup.
+            parameters (tuple): The validated weather parameters, temperature in °C by default.
 
         Returns:
             json: A JSON object containing weather information.
     """
-    username = 'none_basso_alexandr'
-    password = 'ZLvtK14iU1'
-
-    credentials = base64.b64encode(f"{username}:{password}".encode()).decode()
-
-    headers = {'Authorization': f'Basic {credentials}'}
-
-    local_timezone = pytz.timezone(pytz.country_timezones[country][0])
-    current_datetime = datetime.now(local_timezone)
-    formatted_datetime = current_datetime.strftime('%Y-%m-%dT%H:%M:%S.%f%z')
-
-    url = f'https://api.meteomatics.com/{formatted_datetime}/t_2m:C/{latitude},{longitude}/json'
-
-    response = requests.get(url, headers=headers)
-
-    if response.status_code == 200:
-        data = response.json()
-        # print('data', data, '\n\n\n\n', type(data))
-        return data
-    else:
-        print('something went wrong', response.text)
+    weather_data = interpolated_weather(latitude, longitude, upstream_parameters_for(parameters))
+    if weather_data is None:
+        local_timezone = get_local_timezone(latitude, longitude, country)
+        weather_data = get_meteomatics_client().current(
+            latitude, longitude, local_timezone, parameters=upstream_parameters_for(parameters))
+        archive_weather_data(weather_data)
+    return apply_parameters(weather_data, parameters)
 
 
-def weather_forcast_request_api(latitude: str, longitude: str, country: str) -> json:
+def weather_forcast_request_api(latitude: str, longitude: str, country: str, parameters=DEFAULT_PARAMETERS,
+                                forecast=DEFAULT_FORECAST_OPTIONS) -> json:
     """
-    Send a weather forecast data request to the Meteomatics API and retrieve forecasted weather information, it sends
-    a GET request to the Meteomatics API to retrieve forecasted weather data based on the provided latitude,
-    longitude, and country. It uses Basic Authentication with a username and password to authenticate with the API.
+    Send a weather forecast data request to the Meteomatics API and retrieve forecasted weather information, it
+    requests the parameters for the next 'days' days (7 by default) at the provided latitude and longitude through
+    the shared, connection-pooled MeteomaticsClient. All parameters are fetched with one request, derived parameters
+    are computed locally, and the fetched values are archived for the history endpoint.
 
         Args:
             latitude (str): The latitude of the location for which weather forecasts are requested.
             longitude (str): The longitude of the location for which weather forecasts are requested.
-            country (str): The country associated with the location for time zone information.
+            country (str): The country associated with the location, narrows down the offline time zone lookup.
+            parameters (tuple): The validated weather parameters, temperature in °C by default.
+            forecast (ForecastOptions): The number of days and the time step of the forecast.
 
         Returns:
             json: A JSON object containing forecasted weather information.
      """
-    username = 'none_basso_alexandr'
-    password = 'ZLvtK14iU1'
+    local_timezone = get_local_timezone(latitude, longitude, country)
+    weather_data = get_meteomatics_client().forecast(
+        latitude, longitude, local_timezone, days=forecast.days, parameters=upstream_parameters_for(parameters),
+        interval=forecast.interval)
+    archive_weather_data(weather_data, WeatherObservation.FORECAST)
+    return apply_parameters(weather_data, parameters)
 
-    credentials = base64.b64encode(f"{username}:{password}".encode()).decode()
 
-    headers = {'Authorization': f'Basic {credentials}'}
+@timing('geocode')
+def get_user_geolocation(client_ip: str = None) -> dict:
+    """
+    Get the geolocation information of the user based on their IP address, it looks the client address up in the
+    local IP range table. Addresses missing from the table are geolocated with the geocoder service when
+    IP_GEOLOCATION_FALLBACK is on, once per address and worker (see ip_geolocation.get_ip_fallback_cache); private
+    and loopback addresses (e.g. during development) then resolve to the public address of the server. It retrieves
+    information such as latitude, longitude, and country.
 
-    local_timezone = pytz.timezone(pytz.country_timezones[country][0])
-    current_datetime = datetime.now(local_timezone)
-    future_datetime = current_datetime + timedelta(days=7)
+        Args:
+            client_ip (str): The IP address of the client, see ip_geolocation.get_client_ip.
 
-    formatted_datetime_now = current_datetime.strftime('%Y-%m-%dT%H:%M:%S.%f%z')
-    formatted_datetime_future = future_datetime.strftime('%Y-%m-%dT%H:%M:%S.%f%z')
+        Returns:
+            dict or None: A dictionary containing geolocation information including 'latitude', 'longitude', and
+            'country', or None if the client location is unknown.
+     """
+    if client_ip:
+        location = get_ip_location_table().lookup(client_ip)
+        if location is not None:
+            return location
 
-    # print('printing formated formatted_datetime_now', formatted_datetime_now)
-    # print('printing formated future_datetime', formatted_datetime_future)
+    if not settings.IP_GEOLOCATION_FALLBACK:
+        return None
 
-    urlsss = f'https://api.meteomatics.com/{formatted_datetime_now}--{formatted_datetime_future}/t_2m:C/{latitude},{longitude}/json'
+    fallback_cache = get_ip_fallback_cache()
+    if client_ip in fallback_cache:
+        return fallback_cache.get(client_ip)
 
-    response = requests.get(urlsss, headers=headers)
+    # geocoder (and the requests stack below it) is imported on the first fallback lookup, see weather_api.startup.
+    import geocoder
 
-    if response.status_code == 200:
-        data = response.json()
-        # print('data', data, '\n\n\n\n', type(data))
-        return data
-    else:
-        print('something went wrong', response.text)
+    try:
+        g = geocoder.ip(client_ip if client_ip and ipaddress.ip_address(client_ip).is_global else 'me')
+
+        # Addresses the service cannot locate are cached as well, only errors are retried on the next request.
+        location = {'latitude': g.latlng[0], 'longitude': g.latlng[1], 'country': g.country} if g.ok else None
+        fallback_cache.set(client_ip, location)
+        return location
 
+    except Exception:
+        logger.warning('IP geolocation failed', extra={'client_ip': client_ip}, exc_info=True)
+        return None
 
-def get_user_geolocation() -> dict:
+
+def _get_geolocator():
     """
-    Get the geolocation information of the user based on their IP address, it uses a geocoder to automatically detect
-    the user's location based on their IP address. It retrieves information such as latitude, longitude, and country.
+    Return the process-wide Nominatim client, it is created (and geopy imported) once on first use instead of once per
+    request.
 
         Returns:
-            dict: A dictionary containing geolocation information including 'latitude', 'longitude', and 'country'.
+            Nominatim: The shared geopy Nominatim geocoder.
      """
-    try:
-        g = geocoder.ip('me')
+    global _geolocator
 
-        if g.ok:
+    if _geolocator is None:
+        from geopy.geocoders import Nominatim
 
-            return {
-                'latitude': g.latlng[0],
-                'longitude': g.latlng[1],
-                'country': g.country,
-            }
-        else:
-            return None
+        nominatim_url = urlsplit(settings.NOMINATIM_BASE_URL)
+        _geolocator = Nominatim(
+            user_agent=settings.NOMINATIM_USER_AGENT,
+            domain=f'{nominatim_url.netloc}{nominatim_url.path.rstrip("/")}',
+            scheme=nominatim_url.scheme,
+            timeout=settings.NOMINATIM_TIMEOUT,
+        )
+    return _geolocator
+
+
+def fetch_geolocation_from_nominatim(city_or_zip):
+    """
+    Geocode a city name or zip code with Nominatim, without any caching. Network errors are raised to the caller so
+    that they are not mistaken for (and cached as) a location that does not exist.
 
-    except Exception as e:
-        print(f"Error: {e}")
+        Args:
+            city_or_zip (str): The city name or zip code for which geolocation information is requested.
+
+        Returns:
+            tuple or None: A tuple containing latitude, longitude, and country code if the location is found,
+            or None if Nominatim does not know the location.
+     """
+    geolocator = _get_geolocator()
+
+    try:
+        with timing('nominatim'):
+            location = geolocator.geocode(city_or_zip, addressdetails=True)
+    except Exception:
+        UPSTREAM_ERRORS.labels('nominatim').inc()
+        raise
+    if location:
+        latitude = location.latitude
+        longitude = location.longitude
+        country = location.raw.get("address", {}).get("country_code")
+        if not country:
+            country = resolve_country_and_timezone(latitude, longitude)[0].lower()
+        logger.debug('Nominatim geocoded location', extra={'query': city_or_zip, 'latitude': latitude,
+                                                          'longitude': longitude, 'country': country})
+
+        return latitude, longitude, country
+    else:
         return None
 
 
+@timing('geocode')
 def get_geolocation_based_on_input(city_or_zip):
     """
     Get geolocation information based on a city name or zip code, it uses a geocoder to obtain geolocation information
-    (latitude, longitude, and country) based on a provided city name or zip code.
+    (latitude, longitude, and country) based on a provided city name or zip code. Places of the offline gazetteer
+    are resolved in memory, other results are served from the geocoding cache when possible, so repeat lookups of
+    the same normalized query skip Nominatim entirely.
 
         Args:
             city_or_zip (str): The city name or zip code for which geolocation information is requested.
@@ -131,27 +202,144 @@ def get_geolocation_based_on_input(city_or_zip):
             tuple or None: A tuple containing latitude, longitude, and country code if geocoding is successful,
             or None if geocoding fails.
      """
-    print('printing city or zip: ', city_or_zip, type(city_or_zip))
-    geolocator = Nominatim(user_agent="geolocation_app")
+    logger.debug('Geocoding location query', extra={'query': city_or_zip})
+
+    location = get_gazetteer().lookup(city_or_zip)
+    if location is not None:
+        return location
 
     try:
-        location = geolocator.geocode(city_or_zip)
-        if location:
-            latitude = location.latitude
-            longitude = location.longitude
-            country = geolocator.reverse((latitude, longitude), exactly_one=True).raw.get("address", {}).get(
-                "country_code")
-            print('\n\n\nprinting latitude, longitude, country: ', latitude, longitude, country)
-
-            return latitude, longitude, country
-        else:
-            return None
-    except Exception as e:
-        print(f"Error: {e}")
+        return get_geocoding_cache().get_or_fetch(city_or_zip, fetch_geolocation_from_nominatim)
+    except Exception:
+        logger.warning('Geocoding failed', extra={'query': city_or_zip}, exc_info=True)
         return None
 
 
-def search_weather_logic(location_query, search_or_forcast, forcast_get):
+def serialize_weather_data(weather_data):
+    """
+    Serialize the first parameter of a Meteomatics response with the read-only WeatherFastSerializer.
+
+        Args:
+            weather_data (dict): The decoded Meteomatics JSON response, or None.
+
+        Returns:
+            dict or None: The serialized 'parameter' and 'coordinates', or None if the response holds no data.
+     """
+    if weather_data and 'data' in weather_data:
+        data = weather_data['data']
+        if data:
+            weather_data_to_serialize = data[0]
+
+            serializer_data = {
+                "parameter": weather_data_to_serialize.get('parameter', ''),
+                "coordinates": weather_data_to_serialize.get('coordinates', []),
+            }
+
+            return WeatherFastSerializer(serializer_data).data
+
+
+@timing('serialize')
+def serialize_weather_payload(weather_data, parameters=DEFAULT_PARAMETERS):
+    """
+    Serialize a Meteomatics response for the requested parameters: a single parameter keeps the historical
+    'parameter' and 'coordinates' payload, several parameters are returned together in a 'data' list.
+
+        Args:
+            weather_data (dict): The decoded Meteomatics JSON response (after apply_parameters), or None.
+            parameters (tuple): The validated weather parameters.
+
+        Returns:
+            dict or None: The serialized weather data, or None if the response holds no data.
+     """
+    if len(parameters) == 1:
+        return serialize_weather_data(weather_data)
+
+    if weather_data and weather_data.get('data'):
+        serializer_data = [
+            {
+                "parameter": weather_data_to_serialize.get('parameter', ''),
+                "coordinates": weather_data_to_serialize.get('coordinates', []),
+            }
+            for weather_data_to_serialize in weather_data['data']
+        ]
+
+        return {'data': WeatherFastSerializer(serializer_data, many=True).data}
+
+
+def weather_variant(endpoint: str, parameters=DEFAULT_PARAMETERS, forecast=DEFAULT_FORECAST_OPTIONS) -> str:
+    """
+    Return the weather cache variant of a request: its parameters and, for 'forcast', the forecast resolution.
+     """
+    if endpoint == 'forcast':
+        return '|'.join(filter(None, (cache_variant(parameters), forecast_variant(forecast))))
+    return cache_variant(parameters)
+
+
+def weather_cache_request(endpoint: str, country, parameters=DEFAULT_PARAMETERS, forecast=DEFAULT_FORECAST_OPTIONS):
+    """
+    Return how a weather request is cached and fetched: the weather cache variant of the parameters and forecast
+    resolution, and the function requesting the weather data of snapped coordinates from Meteomatics.
+
+        Args:
+            endpoint (str): 'current', 'search' or 'forcast', selects the request type.
+            country (str): The country associated with the location, narrows down the offline time zone lookup.
+            parameters (tuple): The validated weather parameters.
+            forecast (ForecastOptions): The resolution of a 'forcast' request, ignored by the other endpoints.
+
+        Returns:
+            tuple: The cache variant (str) and the fetch function (latitude, longitude) -> weather data.
+     """
+    variant = weather_variant(endpoint, parameters, forecast)
+    if endpoint == 'forcast':
+        return variant, lambda latitude, longitude: weather_forcast_request_api(
+            latitude, longitude, country, parameters, forecast)
+
+    return variant, lambda latitude, longitude: weather_request_api(latitude, longitude, country, parameters)
+
+
+@timing('weather')
+def get_weather(endpoint: str, latitude, longitude, country, parameters=DEFAULT_PARAMETERS,
+                forecast=DEFAULT_FORECAST_OPTIONS):
+    """
+    Return the weather data of a location for an endpoint from the weather cache, requesting it from Meteomatics
+    on a miss. Forecasts are cached at the requested upstream resolution and aggregated per local day afterwards
+    when the options ask for it.
+
+        Args:
+            endpoint (str): 'current', 'search' or 'forcast', selects the request type and the cache lifetime.
+            latitude (float): The latitude of the location.
+            longitude (float): The longitude of the location.
+            country (str): The country associated with the location, narrows down the offline time zone lookup.
+            parameters (tuple): The validated weather parameters.
+            forecast (ForecastOptions): The resolution of a 'forcast' request, ignored by the other endpoints.
+
+        Returns:
+            dict or None: The decoded Meteomatics JSON response, or None if the request failed.
+     """
+    variant, fetch = weather_cache_request(endpoint, country, parameters, forecast)
+    weather_data = get_weather_cache().get_or_fetch(endpoint, latitude, longitude, fetch, variant=variant)
+    # The entry may have been cached for the same parameters in another order.
+    weather_data = apply_parameters(weather_data, parameters)
+
+    if endpoint == 'forcast' and forecast.aggregate == 'daily':
+        weather_data = aggregate_daily(weather_data, get_local_timezone(latitude, longitude, country))
+    return weather_data
+
+
+def response_format(request, stream=False) -> str:
+    """
+    Return the format of the response to a DRF request: 'ndjson' when it is streamed, otherwise the format of the
+    renderer selected by content negotiation ('json' or 'api' for the browsable API).
+     """
+    if stream:
+        return 'ndjson'
+    renderer = getattr(request, 'accepted_renderer', None)
+    return renderer.format if renderer is not None else 'json'
+
+
+def search_weather_logic(location_query, search_or_forcast, forcast_get, parameters=DEFAULT_PARAMETERS,
+                         forecast=DEFAULT_FORECAST_OPTIONS, stream=False, client_ip=None, request=None,
+                         columnar=None):
     """
     Logic for searching and forecasting weather based on a location, this function handles the logic for retrieving
     weather information based on a location query, whether it's for search or forecast purposes. It uses the provided
@@ -161,42 +349,81 @@ def search_weather_logic(location_query, search_or_forcast, forcast_get):
             location_query (str): The location query (city name or zip code) for weather information.
             search_or_forecast (bool): True for use in weather search, False for use in weather forecast.
             forecast_get (bool): True if user's geolocation should be used for forecast, False otherwise.
+            parameters (tuple): The validated weather parameters, temperature in °C by default.
+            forecast (ForecastOptions): The number of days, time step and aggregation of a forecast.
+            stream (bool): True to stream one NDJSON record per timestamp instead of a serialized JSON document.
+            client_ip (str): The IP address of the client, geolocated when forecast_get is True.
+            request (Request): The GET request being answered, to validate its If-None-Match header and add the
+             caching headers to the response. POST responses are not cached.
+            columnar (str): The columnar format selected by content negotiation ('columnar' or 'msgpack') to
+             respond with the columnar representation of the weather data, see columnar_weather.
 
         Returns:
-            Response: A response containing serialized weather information if successful, or None.
+            Response: A response containing serialized weather information if successful, 304 if the client's copy
+            is current, 404 if the location is not found, 422 if the client location is unknown, or 500 if the
+            weather data could not be fetched.
      """
     if not forcast_get:
         location_coordinates_tuple = get_geolocation_based_on_input(location_query)
+        if location_coordinates_tuple is None:
+            return Response({'error': 'Location not found'}, status=404)
         location_coordinates = {}
         location_coordinates['latitude'] = location_coordinates_tuple[0]
         location_coordinates['longitude'] = location_coordinates_tuple[1]
         location_coordinates['country'] = location_coordinates_tuple[2]
     else:
-        location_coordinates = get_user_geolocation()
+        location_coordinates = get_user_geolocation(client_ip)
+        if not location_coordinates:
+            return Response({'error': 'Client location unknown, please provide a location (city name or zip code)'},
+                            status=422)
+
+    latitude = location_coordinates['latitude']
+    longitude = location_coordinates['longitude']
+    country = location_coordinates['country']
+
+    endpoint = 'search' if search_or_forcast else 'forcast'
+    track_request(endpoint, latitude, longitude, country, parameters, forecast)
+    weather_data = get_weather(endpoint, latitude, longitude, country, parameters, forecast)
 
-    if location_coordinates:
-        latitude = location_coordinates['latitude']
-        longitude = location_coordinates['longitude']
-        country = location_coordinates['country']
+    validator = weather_validator(request, endpoint, latitude, longitude,
+                                  weather_variant(endpoint, parameters, forecast), weather_data,
+                                  response_format(request, stream), shared=not forcast_get)
+    if validator is None:
+        return weather_response(weather_data, parameters, stream, columnar)
+
+    # Checked before serialization, a client revalidating its copy costs no serialization at all.
+    not_modified = validator.not_modified()
+    if not_modified is not None:
+        return not_modified
+    return validator.patch(weather_response(weather_data, parameters, stream, columnar))
+
+
+def weather_response(weather_data, parameters=DEFAULT_PARAMETERS, stream=False, columnar=None):
+    """
+    Return the response of weather data: one NDJSON record per timestamp when streamed, the columnar representation
+    for a columnar format (its values packed as float32 for MessagePack), otherwise a Response of the serialized JSON
+    document, or a 500 response when the upstream request failed.
+     """
+    if stream and weather_data and weather_data.get('data'):
+        return ndjson_response(iter_weather_records(weather_data))
 
-        if search_or_forcast:
-            weather_data = weather_request_api(latitude, longitude, country)
-        else:
-            weather_data = weather_forcast_request_api(latitude, longitude, country)
+    if columnar and weather_data and weather_data.get('data'):
+        with timing('serialize'):
+            columnar_data = columnar_weather(weather_data, packed=columnar == MessagePackRenderer.format)
+        return Response(columnar_data, status=200)
 
-        if weather_data and 'data' in weather_data:
-            data = weather_data['data']
-            if data:
-                weather_data_to_serialize = data[0]
+    serialized_weather_data = serialize_weather_payload(weather_data, parameters)
+    if serialized_weather_data is not None:
+        return Response(serialized_weather_data, status=200)
+    return Response({'error': 'Failed to fetch weather data'}, status=500)
 
-                serializer_data = {
-                    "parameter": weather_data_to_serialize.get('parameter', ''),
-                    "coordinates": weather_data_to_serialize.get('coordinates', []),
-                }
 
-                serializer = WeatherSerializer(serializer_data)
+@receiver(setting_changed)
+def _reset_geolocator(setting, **kwargs):
+    global _geolocator
 
-                return Response(serializer.data, status=200)
+    if setting.startswith('NOMINATIM_'):
+        _geolocator = None
 
 
 if __name__ == '__main__':
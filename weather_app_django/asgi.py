@@ -13,4 +13,8 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'weather_app_django.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from weather_api.async_clients import AsyncClientsLifespan  # noqa: E402 (needs the apps loaded)
+
+application = AsyncClientsLifespan(django_application)
@@ -29,7 +29,6 @@ SECRET_KEY = getenv("SECRET_KEY", "django-insecure-50shyx*p%t#+3fo@4dt^zf#t=k*uv
 
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = getenv("DEBUG", "1") == "1"
-print(DEBUG)
 ALLOWED_HOSTS = [
     "127.0.0.1",
     "0.0.0.0",
@@ -53,7 +52,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'weather_api.metrics.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'weather_api.static_files.StaticFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -68,6 +69,10 @@ REST_FRAMEWORK = {
         'rest_framework.authentication.BasicAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'weather_api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
 }
 
 AUTHENTICATION_BACKENDS = [
@@ -97,21 +102,36 @@ TEMPLATES = [
 
 SWAGGER_SETTINGS = {
     'DEFAULT_INFO': 'your_project.urls.swagger_info',
+    'SPEC_URL': ('schema-json', {'format': '.json'}),
 }
 
 WSGI_APPLICATION = 'weather_app_django.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
+# Connections are kept open DB_CONN_MAX_AGE seconds (0 closes them after every request, None never) and checked
+# before they are reused, so every worker thread keeps one connection: a server opens up to workers x threads of them,
+# compared to DB_MAX_CONNECTIONS by gunicorn.conf.py. Under ASGI set DB_CONN_MAX_AGE=0 and pool with PgBouncer
+# instead (the 'pgbouncer' profile of docker-compose.yaml); its transaction pooling needs
+# DB_DISABLE_SERVER_SIDE_CURSORS=1. The weather_api backend adds connection wait times to the /metrics endpoint.
+
+DB_CONN_MAX_AGE = getenv('DB_CONN_MAX_AGE', '60')
+DB_MAX_CONNECTIONS = int(getenv('DB_MAX_CONNECTIONS', 100))
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'weather_api.db.postgresql',
         'NAME': getenv('DB_NAME', 'postgres'),
         'USER': getenv('DB_USER', 'postgres'),
         'PASSWORD': getenv('DB_PASSWORD', '1234'),
         'HOST': getenv('DB_HOST', 'localhost'),
         'PORT': getenv('DB_PORT', '5432'),
+        'CONN_MAX_AGE': None if DB_CONN_MAX_AGE.lower() == 'none' else int(DB_CONN_MAX_AGE),
+        'CONN_HEALTH_CHECKS': getenv('DB_CONN_HEALTH_CHECKS', '1') == '1',
+        'DISABLE_SERVER_SIDE_CURSORS': getenv('DB_DISABLE_SERVER_SIDE_CURSORS', '0') == '1',
+        'OPTIONS': {
+            'connect_timeout': int(getenv('DB_CONNECT_TIMEOUT', 5)),
+        },
     }
 }
 
@@ -148,8 +168,241 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/4.2/howto/static-files/
 
 STATIC_URL = 'static/'
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# Static files (the admin and Swagger UI assets) are served by WhiteNoise from the application server, compressed ahead
+# of time by collectstatic; outside DEBUG their names carry a content hash so browsers can cache them forever.
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {
+        'BACKEND': ('whitenoise.storage.CompressedStaticFilesStorage' if DEBUG
+                    else 'whitenoise.storage.CompressedManifestStaticFilesStorage'),
+    },
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Geocoding cache
+# Lifetimes are in seconds, negative results (location not found) expire sooner than successful lookups.
+
+GEOCODING_CACHE_TTL = int(getenv('GEOCODING_CACHE_TTL', 60 * 60 * 24 * 30))
+GEOCODING_CACHE_NEGATIVE_TTL = int(getenv('GEOCODING_CACHE_NEGATIVE_TTL', 60 * 60))
+GEOCODING_CACHE_LRU_SIZE = int(getenv('GEOCODING_CACHE_LRU_SIZE', 4096))
+
+# Gazetteer
+# City names and postcodes found in these GeoNames dumps (https://download.geonames.org/export/dump/ 'citiesNNNN.txt'
+# and https://download.geonames.org/export/zip/, optionally gzipped) are geocoded offline, Nominatim is only called
+# for the others. The places of more than 15000 inhabitants, with their alternate Latin-script names, ship in data/
+# (GeoNames, CC BY 4.0), as do the US ZIP codes and Canadian postcode areas (FSA) in the GeoNames postal codes layout.
+# An empty path loads nothing. GAZETTEER_SUGGEST_LIMIT is the maximum number of /api/locations/suggest/ results.
+
+GAZETTEER_CITIES_FILE = getenv('GAZETTEER_CITIES_FILE', str(BASE_DIR / 'data' / 'cities15000.txt.gz'))
+GAZETTEER_POSTCODES_FILE = getenv('GAZETTEER_POSTCODES_FILE', str(BASE_DIR / 'data' / 'postcodes.txt.gz'))
+GAZETTEER_SUGGEST_LIMIT = int(getenv('GAZETTEER_SUGGEST_LIMIT', 10))
+
+# Reverse geocoding
+# Coordinates are resolved to a country and IANA time zone offline, by a point-in-polygon test against the time zone
+# boundaries of REVERSE_GEOCODER_BOUNDARIES_FILE (timezone-boundary-builder, simplified to about 1 km, shipped in
+# data/). Points outside every boundary get the zone of the closest place of REVERSE_GEOCODER_CITIES_FILE, a GeoNames
+# cities dump.
+
+REVERSE_GEOCODER_BOUNDARIES_FILE = getenv('REVERSE_GEOCODER_BOUNDARIES_FILE', str(BASE_DIR / 'data' / 'timezones.npz'))
+REVERSE_GEOCODER_CITIES_FILE = getenv('REVERSE_GEOCODER_CITIES_FILE', str(BASE_DIR / 'data' / 'cities15000.txt.gz'))
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# The database backend needs "python manage.py createcachetable".
+
+CACHES = {
+    'default': {
+        'BACKEND': getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': getenv('CACHE_LOCATION', 'weather-app'),
+    }
+}
+
+# Weather cache
+# Locations are snapped to a grid of WEATHER_CACHE_GRID_DEGREES and upstream responses are shared per grid cell
+# and per WEATHER_CACHE_TIME_BUCKET seconds (the upstream model update cadence). Lifetimes are in seconds, expired
+# entries are still served for WEATHER_CACHE_STALE_TTL seconds while they are being refreshed.
+
+WEATHER_CACHE_ALIAS = getenv('WEATHER_CACHE_ALIAS', 'default')
+WEATHER_CACHE_GRID_DEGREES = float(getenv('WEATHER_CACHE_GRID_DEGREES', 0.1))
+WEATHER_CACHE_TIME_BUCKET = int(getenv('WEATHER_CACHE_TIME_BUCKET', 60 * 60))
+WEATHER_CACHE_TTL = {
+    'current': int(getenv('WEATHER_CACHE_TTL_CURRENT', 60 * 10)),
+    'search': int(getenv('WEATHER_CACHE_TTL_SEARCH', 60 * 10)),
+    'forcast': int(getenv('WEATHER_CACHE_TTL_FORCAST', 60 * 60)),
+}
+WEATHER_CACHE_LRU_SIZE = int(getenv('WEATHER_CACHE_LRU_SIZE', 1024))
+WEATHER_CACHE_STALE_TTL = int(getenv('WEATHER_CACHE_STALE_TTL', 60 * 10))
+
+# HTTP caching
+# GET weather responses have an ETag and a max-age of the remaining lifetime of their weather cache entry. Shared
+# caches (a CDN or reverse proxy) may store them per URL and Accept header, but revalidate them after
+# WEATHER_HTTP_SHARED_MAX_AGE seconds: with 0 every request is still authenticated by the API and answered with 304
+# when the cached copy is current. Raise it only when the shared cache authenticates the clients itself.
+
+WEATHER_HTTP_SHARED_MAX_AGE = int(getenv('WEATHER_HTTP_SHARED_MAX_AGE', 0))
+
+# Grid tiles
+# With WEATHER_TILES_ENABLED the current weather of locations inside WEATHER_TILE_REGIONS (semicolon-separated
+# "south,west,north,east" boxes, every location when empty) is interpolated from grids of WEATHER_TILE_DEGREES
+# square degrees sampled every WEATHER_TILE_RESOLUTION degrees. A grid is requested from Meteomatics once per
+# WEATHER_CACHE_TIME_BUCKET, or per WEATHER_CACHE_TTL_CURRENT/SEARCH when shorter, and the WEATHER_TILE_CACHE_SIZE
+# most recently used ones are kept in every process. As weather cache misses in a region then cost no upstream call,
+# WEATHER_CACHE_GRID_DEGREES can be lowered there. Interpolated values are not archived as observations.
+
+WEATHER_TILES_ENABLED = getenv('WEATHER_TILES_ENABLED', '0') == '1'
+WEATHER_TILE_REGIONS = [tuple(float(value) for value in box.split(','))
+                        for box in getenv('WEATHER_TILE_REGIONS', '').split(';') if box.strip()]
+WEATHER_TILE_DEGREES = float(getenv('WEATHER_TILE_DEGREES', 1.0))
+WEATHER_TILE_RESOLUTION = float(getenv('WEATHER_TILE_RESOLUTION', 0.1))
+WEATHER_TILE_CACHE_SIZE = int(getenv('WEATHER_TILE_CACHE_SIZE', 64))
+
+# Observation archive
+# Fetched current values and forecasts are kept apart, queued (up to OBSERVATION_ARCHIVE_QUEUE_SIZE responses, more
+# are dropped) and persisted by a background thread of every process, OBSERVATION_ARCHIVE_BATCH_SIZE rows per
+# INSERT, and served by the history endpoint for time ranges of up to OBSERVATION_HISTORY_MAX_DAYS days.
+
+OBSERVATION_ARCHIVE_ENABLED = getenv('OBSERVATION_ARCHIVE_ENABLED', '1') == '1'
+OBSERVATION_ARCHIVE_BATCH_SIZE = int(getenv('OBSERVATION_ARCHIVE_BATCH_SIZE', 500))
+OBSERVATION_ARCHIVE_QUEUE_SIZE = int(getenv('OBSERVATION_ARCHIVE_QUEUE_SIZE', 1000))
+OBSERVATION_HISTORY_MAX_DAYS = int(getenv('OBSERVATION_HISTORY_MAX_DAYS', 366))
+
+# Refresh-ahead
+# When enabled, the most requested search and forcast locations of the last REFRESH_AHEAD_WINDOW seconds are
+# tracked in the weather cache backend and refreshed REFRESH_AHEAD_MARGIN seconds before their cache entries
+# expire, every REFRESH_AHEAD_INTERVAL seconds, by "python manage.py refresh_ahead" or, with REFRESH_AHEAD_WORKER,
+# by a background thread of the web process holding the lease of the interval in the cache backend. A cycle makes at
+# most REFRESH_AHEAD_BUDGET upstream calls. The request counters need a backend shared between processes with atomic
+# incr() (Redis, memcached), the worker and the command refuse to run on LocMemCache.
+
+REFRESH_AHEAD_ENABLED = getenv('REFRESH_AHEAD_ENABLED', '0') == '1'
+REFRESH_AHEAD_WORKER = getenv('REFRESH_AHEAD_WORKER', '0') == '1'
+REFRESH_AHEAD_INTERVAL = int(getenv('REFRESH_AHEAD_INTERVAL', 60))
+REFRESH_AHEAD_MARGIN = int(getenv('REFRESH_AHEAD_MARGIN', 120))
+REFRESH_AHEAD_WINDOW = int(getenv('REFRESH_AHEAD_WINDOW', 60 * 60))
+REFRESH_AHEAD_TOP_N = int(getenv('REFRESH_AHEAD_TOP_N', 50))
+REFRESH_AHEAD_CONCURRENCY = int(getenv('REFRESH_AHEAD_CONCURRENCY', 4))
+REFRESH_AHEAD_BUDGET = int(getenv('REFRESH_AHEAD_BUDGET', 30))
+REFRESH_AHEAD_FLUSH_INTERVAL = int(getenv('REFRESH_AHEAD_FLUSH_INTERVAL', 10))
+
+# Forecasts
+# Longest forecast a client may request with the 'days' option.
+
+FORECAST_MAX_DAYS = int(getenv('FORECAST_MAX_DAYS', 10))
+
+# Meteomatics API
+# The credentials are only read from the environment (see .env.template), the client refuses to start without them.
+# Timeouts are in seconds, requests failing with a connection error or a 429/5xx status are retried with
+# exponential backoff (METEOMATICS_BACKOFF_FACTOR * 2 ** retry).
+
+METEOMATICS_USERNAME = getenv('METEOMATICS_USERNAME', '')
+METEOMATICS_PASSWORD = getenv('METEOMATICS_PASSWORD', '')
+METEOMATICS_BASE_URL = getenv('METEOMATICS_BASE_URL', 'https://api.meteomatics.com')
+METEOMATICS_CONNECT_TIMEOUT = float(getenv('METEOMATICS_CONNECT_TIMEOUT', 3.05))
+METEOMATICS_READ_TIMEOUT = float(getenv('METEOMATICS_READ_TIMEOUT', 10))
+METEOMATICS_POOL_SIZE = int(getenv('METEOMATICS_POOL_SIZE', 20))
+METEOMATICS_MAX_RETRIES = int(getenv('METEOMATICS_MAX_RETRIES', 2))
+METEOMATICS_BACKOFF_FACTOR = float(getenv('METEOMATICS_BACKOFF_FACTOR', 0.3))
+
+# Nominatim geocoder
+
+NOMINATIM_BASE_URL = getenv('NOMINATIM_BASE_URL', 'https://nominatim.openstreetmap.org')
+NOMINATIM_USER_AGENT = getenv('NOMINATIM_USER_AGENT', 'geolocation_app')
+NOMINATIM_TIMEOUT = float(getenv('NOMINATIM_TIMEOUT', 5))
+
+# Instrumentation
+# Request stages are timed into the histograms of the Prometheus /metrics endpoint, served to METRICS_ALLOWED_NETWORKS
+# (comma-separated networks, loopback only by default), and sent to clients in a Server-Timing header when
+# SERVER_TIMING_ENABLED is on. The metrics of all gunicorn workers are summed through the files of the
+# PROMETHEUS_MULTIPROC_DIR environment variable, set by gunicorn.conf.py.
+
+SERVER_TIMING_ENABLED = getenv('SERVER_TIMING_ENABLED', '1') == '1'
+METRICS_ALLOWED_NETWORKS = [
+    network.strip() for network in getenv('METRICS_ALLOWED_NETWORKS', '127.0.0.0/8,::1/128').split(',')
+    if network.strip()
+]
+
+# Logging
+# Records are written as JSON lines to stdout by a background thread, request threads only put them on a bounded queue
+# (LOG_QUEUE_SIZE records, further records are dropped). LOG_LEVELS sets per-logger levels as comma-separated
+# 'logger=LEVEL' pairs, e.g. 'weather_api.weather_request=DEBUG,django.db.backends=WARNING'; only a share
+# LOG_DEBUG_SAMPLE_RATE (0..1) of the debug records is kept.
+
+LOG_LEVEL = getenv('LOG_LEVEL', 'INFO')
+LOG_LEVELS = {name.strip(): level.strip().upper()
+              for name, level in (pair.split('=', 1) for pair in getenv('LOG_LEVELS', '').split(',') if '=' in pair)}
+LOG_DEBUG_SAMPLE_RATE = float(getenv('LOG_DEBUG_SAMPLE_RATE', 0.1))
+LOG_QUEUE_SIZE = int(getenv('LOG_QUEUE_SIZE', 10000))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'json': {'()': 'weather_api.structured_logging.JSONFormatter'},
+    },
+    'filters': {
+        'sample_debug': {'()': 'weather_api.structured_logging.SamplingFilter', 'rate': LOG_DEBUG_SAMPLE_RATE},
+    },
+    'handlers': {
+        'queue': {
+            '()': 'weather_api.structured_logging.BackgroundQueueHandler',
+            'queue_size': LOG_QUEUE_SIZE,
+            'formatter': 'json',
+            'filters': ['sample_debug'],
+        },
+    },
+    'root': {'handlers': ['queue'], 'level': LOG_LEVEL},
+    'loggers': {
+        # Django's own console and mail handlers are replaced by the queue of the root logger.
+        'django': {'handlers': [], 'level': LOG_LEVELS.get('django', 'INFO')},
+        **{name: {'level': level} for name, level in LOG_LEVELS.items() if name != 'django'},
+    },
+}
+
+# Client IP geolocation
+# The current weather of a client is looked up in a local IP range table: a DB-IP "IP to City Lite" style CSV file
+# (optionally gzipped). The bundled data/ip-city.csv.gz is built from MaxMind GeoLite2 City data, the adjacent ranges of
+# a country merged into one with the location of most of its addresses. X-Forwarded-For is only read on requests from
+# IP_GEOLOCATION_TRUSTED_PROXIES (comma-separated addresses or networks). Addresses missing from the table are
+# geolocated online when IP_GEOLOCATION_FALLBACK is on, the results of the last IP_GEOLOCATION_FALLBACK_CACHE_SIZE
+# addresses are kept.
+
+IP_GEOLOCATION_DATABASE = getenv('IP_GEOLOCATION_DATABASE', str(BASE_DIR / 'data' / 'ip-city.csv.gz'))
+IP_GEOLOCATION_TRUSTED_PROXIES = [proxy.strip() for proxy in getenv('IP_GEOLOCATION_TRUSTED_PROXIES', '').split(',')
+                                  if proxy.strip()]
+IP_GEOLOCATION_FALLBACK = getenv('IP_GEOLOCATION_FALLBACK', '0') == '1'
+IP_GEOLOCATION_FALLBACK_CACHE_SIZE = int(getenv('IP_GEOLOCATION_FALLBACK_CACHE_SIZE', 10000))
+
+# Async views
+# Size of the connection pool of each asynchronous upstream client, opened once per ASGI server process (see
+# weather_app_django.asgi). Under WSGI the async views call the pooled synchronous clients in threads instead.
+
+ASYNC_HTTP_POOL_SIZE = int(getenv('ASYNC_HTTP_POOL_SIZE', 200))
+
+# Batch weather endpoint
+# Locations missing from the weather cache are requested from Meteomatics WEATHER_BATCH_CHUNK_SIZE points at a time.
+
+WEATHER_BATCH_MAX_LOCATIONS = int(getenv('WEATHER_BATCH_MAX_LOCATIONS', 500))
+WEATHER_BATCH_CHUNK_SIZE = int(getenv('WEATHER_BATCH_CHUNK_SIZE', 100))
+WEATHER_BATCH_GEOCODING_CONCURRENCY = int(getenv('WEATHER_BATCH_GEOCODING_CONCURRENCY', 4))
+WEATHER_BATCH_UPSTREAM_CONCURRENCY = int(getenv('WEATHER_BATCH_UPSTREAM_CONCURRENCY', 4))
+
+# Request coalescing
+# Concurrent cache misses for the same key share one upstream call within a process. When enabled (PostgreSQL
+# only), misses are also serialized across worker processes with transaction-level advisory locks, taken on one more
+# database connection per worker thread (counted by gunicorn.conf.py against DB_MAX_CONNECTIONS). Weather cache
+# misses are only locked when WEATHER_CACHE_ALIAS is a backend shared between processes (not LocMemCache).
+
+SINGLE_FLIGHT_ADVISORY_LOCKS = getenv('SINGLE_FLIGHT_ADVISORY_LOCKS', '0') == '1'
+
+# OpenAPI schema
+# The schema is generated once per version of the code, by "python manage.py generate_schema" when the image is built
+# or else by the first process needing it, written to SCHEMA_ARTIFACT_DIR as openapi-<version>.json/.yaml and served
+# from memory with an ETag.
+
+SCHEMA_ARTIFACT_DIR = getenv('SCHEMA_ARTIFACT_DIR', str(BASE_DIR / 'schema'))
@@ -1,24 +1,33 @@
+from functools import cache
+
 from django.contrib import admin
 from django.urls import path, re_path, include
+from django.views.decorators.csrf import csrf_exempt
 from rest_framework import permissions
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
-
-schema_view = get_schema_view(
-    openapi.Info(
-        title="Weather app with API endpoints",
-        default_version='v1',
-        description="Weather app with API endpoints",
-        contact=openapi.Contact(email="alexandr.basso@gmail.com"),
-        license=openapi.License(name="MIT"),
-    ),
-    public=True,
-    permission_classes=(permissions.AllowAny,),
-)
+
+from weather_api.schema import api_info
+from weather_api.views import MetricsView, SchemaView
+
+
+@cache
+def _swagger_ui_view():
+    # drf_yasg is imported by the first Swagger UI request instead of at start-up, see weather_api.startup. The page
+    # loads the schema document from SchemaView (SWAGGER_SETTINGS['SPEC_URL']).
+    from drf_yasg.views import get_schema_view
+
+    schema_view = get_schema_view(api_info(), public=True, permission_classes=(permissions.AllowAny,))
+    return schema_view.with_ui('swagger', cache_timeout=0)
+
+
+@csrf_exempt
+def swagger_ui(request, *args, **kwargs):
+    return _swagger_ui_view()(request, *args, **kwargs)
+
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('weather_api.urls')),
-    re_path(r'^swagger(?P<format>\.json|\.yaml)$', schema_view.without_ui(cache_timeout=0), name='schema-json'),
-    path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
+    path('metrics', MetricsView.as_view(), name='metrics'),
+    re_path(r'^swagger(?P<format>\.json|\.yaml)$', SchemaView.as_view(), name='schema-json'),
+    path('swagger/', swagger_ui, name='schema-swagger-ui'),
 ]